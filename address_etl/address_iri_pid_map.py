@@ -8,8 +8,15 @@ from typing import Any
 import backoff
 import httpx
 
+from address_etl.crud import create_http_client
 from address_etl.esri_rest_api import get_count, get_esri_token
+from address_etl.fingerprint import StageFingerprints, get_layer_fingerprint
 from address_etl.geocode import get_layer_url, on_backoff_handler
+from address_etl.json_decode import (
+    decode_esri_feature_set,
+    decode_esri_layer_definition,
+)
+from address_etl.run_stats import run_stats
 from address_etl.settings import settings
 from address_etl.time_convert import datetime_to_esri_datetime_utc
 
@@ -22,6 +29,7 @@ class AddressIriPidLayerSchema:
     address_iri_field: str
     address_pid_field: str
     last_edited_field: str | None
+    fingerprint: str | None = None
 
     @property
     def supports_incremental_import(self) -> bool:
@@ -63,9 +71,37 @@ def get_address_iri_pid_layer_schema(
         last_edited_field="last_edited_date"
         if "last_edited_date" in field_names
         else None,
+        fingerprint=get_layer_fingerprint(layer_definition),
     )
 
 
+def fetch_address_iri_pid_layer_schema(
+    client: httpx.Client, access_token: str
+) -> AddressIriPidLayerSchema:
+    params = {"f": "json", "token": access_token}
+    response = client.get(
+        get_layer_url(settings.esri_address_iri_pid_map_query_url),
+        params=params,
+    )
+    response.raise_for_status()
+    payload = decode_esri_layer_definition(response.content)
+
+    if "error" in payload:
+        error = payload["error"]
+        raise RuntimeError(
+            "Error fetching address IRI to PID layer schema: "
+            f"ESRI error {error.get('code')}: {error.get('message')}"
+        )
+
+    if "fields" not in payload:
+        raise RuntimeError(
+            "Error fetching address IRI to PID layer schema: "
+            f"expected 'fields' in response, got: {response.text[:1000]}"
+        )
+
+    return get_address_iri_pid_layer_schema(payload)
+
+
 def build_address_iri_pid_where_clause(
     schema: AddressIriPidLayerSchema,
     esri_date: str | None,
@@ -142,18 +178,14 @@ class AddressIriPidImporter:
         self,
         cursor: sqlite3.Cursor,
         client: httpx.Client,
+        access_token: str,
+        schema: AddressIriPidLayerSchema,
         esri_date: str | None = None,
     ) -> None:
         self.cursor = cursor
         self.client = client
-        self.access_token = get_esri_token(
-            settings.esri_auth_url,
-            settings.esri_referer,
-            settings.esri_username,
-            settings.esri_password,
-            client,
-        )
-        self.schema = self.fetch_layer_schema()
+        self.access_token = access_token
+        self.schema = schema
         self.where_clause = build_address_iri_pid_where_clause(self.schema, esri_date)
         self.requires_full_refresh = bool(
             esri_date and not self.schema.supports_incremental_import
@@ -165,30 +197,6 @@ class AddressIriPidImporter:
             self.access_token,
         )
 
-    def fetch_layer_schema(self) -> AddressIriPidLayerSchema:
-        params = {"f": "json", "token": self.access_token}
-        response = self.client.get(
-            get_layer_url(settings.esri_address_iri_pid_map_query_url),
-            params=params,
-        )
-        response.raise_for_status()
-        payload = response.json()
-
-        if "error" in payload:
-            error = payload["error"]
-            raise RuntimeError(
-                "Error fetching address IRI to PID layer schema: "
-                f"ESRI error {error.get('code')}: {error.get('message')}"
-            )
-
-        if "fields" not in payload:
-            raise RuntimeError(
-                "Error fetching address IRI to PID layer schema: "
-                f"expected 'fields' in response, got: {response.text[:1000]}"
-            )
-
-        return get_address_iri_pid_layer_schema(payload)
-
     def import_mappings(self) -> None:
         logger.info(f"Fetching {self.mapping_count} address IRI to PID mappings")
         batch_size = 2000
@@ -229,7 +237,7 @@ class AddressIriPidImporter:
             params=params,
         )
         response.raise_for_status()
-        data = response.json()
+        data = decode_esri_feature_set(response.content)
 
         try:
             return [
@@ -256,15 +264,35 @@ class AddressIriPidImporter:
             raise error
 
 
+@run_stats.record_stage("address_pid_mappings")
 def import_address_pid_mappings(
     cursor: sqlite3.Cursor,
     from_datetime: datetime | None = None,
+    fingerprints: StageFingerprints | None = None,
 ) -> None:
     esri_date = datetime_to_esri_datetime_utc(from_datetime) if from_datetime else None
 
     start_time = time.time()
-    with httpx.Client(timeout=settings.http_timeout_in_seconds) as client:
-        importer = AddressIriPidImporter(cursor, client, esri_date)
+    with create_http_client() as client:
+        access_token = get_esri_token(
+            settings.esri_auth_url,
+            settings.esri_referer,
+            settings.esri_username,
+            settings.esri_password,
+            client,
+        )
+        # Decide on skipping before the importer queries the mapping count.
+        schema = fetch_address_iri_pid_layer_schema(client, access_token)
+        if fingerprints and fingerprints.is_unchanged(
+            "address_iri_pid_map", schema.fingerprint
+        ):
+            logger.info("Skipping address IRI to PID import, layer not edited")
+            return
+
+        importer = AddressIriPidImporter(
+            cursor, client, access_token, schema, esri_date
+        )
+
         if importer.requires_full_refresh:
             logger.info(
                 "Clearing address_iri_pid_map before full refresh because the live layer "
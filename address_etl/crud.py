@@ -3,12 +3,53 @@ import logging
 import backoff
 import httpx
 
+from address_etl.http_archive import create_http_transport
+from address_etl.run_stats import run_stats
 from address_etl.settings import settings
+from address_etl.sparql_profile import RequestTiming
+from address_etl.timeline import timeline
 
 logger = logging.getLogger(__name__)
 
 
+class CountingTransport(httpx.BaseTransport):
+    """Transport counting the requests waiting for a response in run_stats."""
+
+    def __init__(self, transport: httpx.BaseTransport) -> None:
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        run_stats.in_flight_requests += 1
+        try:
+            return self.transport.handle_request(request)
+        finally:
+            run_stats.in_flight_requests -= 1
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+def create_http_client() -> httpx.Client:
+    """HTTP client for the SPARQL and ESRI requests.
+
+    Its requests are counted in run_stats and traced in the timeline, and
+    recorded to or replayed from the HTTP archive if configured.
+    """
+    return httpx.Client(
+        timeout=settings.http_timeout_in_seconds,
+        transport=CountingTransport(create_http_transport()),
+        event_hooks={
+            "request": [timeline.http_request_started],
+            "response": [
+                run_stats.record_http_response,
+                timeline.http_response_received,
+            ],
+        },
+    )
+
+
 def on_backoff_handler(details):
+    run_stats.record_retry("sparql")
     logger.warning(
         f"Backing off {details['wait']} seconds after {details['tries']} tries"
         f" calling function {details['target']}"
@@ -23,8 +64,16 @@ def on_backoff_handler(details):
     on_backoff=on_backoff_handler,
 )
 def sparql_query(
-    sparql_endpoint: str, query: str, client: httpx.Client
+    sparql_endpoint: str,
+    query: str,
+    client: httpx.Client,
+    timing: RequestTiming | None = None,
 ) -> httpx.Response:
+    extensions = {}
+    if timing is not None:
+        timing.start_attempt()
+        extensions["trace"] = timing.trace
+
     response = client.post(
         sparql_endpoint,
         headers={
@@ -32,6 +81,7 @@ def sparql_query(
             "Accept": "application/sparql-results+json",
         },
         data=query,
+        extensions=extensions,
     )
     try:
         response.raise_for_status()
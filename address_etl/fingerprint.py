@@ -0,0 +1,79 @@
+import logging
+from collections.abc import Iterable
+from textwrap import dedent
+
+import httpx
+from jinja2 import Template
+
+from address_etl.crud import sparql_query
+from address_etl.json_decode import iter_sparql_records
+from address_etl.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StageFingerprints:
+    """Input fingerprints of the ETL stages for this run and the previous one.
+
+    A stage whose fingerprint matches the previous run's can copy its tables
+    forward from the previous database instead of querying its sources.
+    """
+
+    def __init__(self, previous: dict[str, str] | None = None) -> None:
+        self.previous = previous or {}
+        self.current: dict[str, str] = {}
+
+    def is_unchanged(self, stage: str, fingerprint: str | None) -> bool:
+        """Record a stage's fingerprint and return whether the stage can be skipped."""
+        if fingerprint is None:
+            return False
+
+        self.current[stage] = fingerprint
+        unchanged = self.previous.get(stage) == fingerprint
+        if unchanged:
+            logger.info(f"Input of stage {stage} unchanged since the previous run")
+        return settings.skip_unchanged_stages and unchanged
+
+    def carry_forward(self, stages: Iterable[str]) -> None:
+        """Keep the previous run's fingerprints of stages not fingerprinted now."""
+        for stage in stages:
+            if stage not in self.current and stage in self.previous:
+                self.current[stage] = self.previous[stage]
+
+
+def get_graph_triple_counts_query(graphs: list[str]) -> str:
+    return Template(
+        dedent(
+            """
+        SELECT ?graph (COUNT(*) AS ?count)
+        WHERE {
+            VALUES ?graph {
+                {% for graph in graphs %}
+                <{{ graph }}>
+                {% endfor %}
+            }
+
+            GRAPH ?graph {
+                ?s ?p ?o
+            }
+        }
+        GROUP BY ?graph
+        """
+        )
+    ).render(graphs=graphs)
+
+
+def get_graph_fingerprint(client: httpx.Client, graphs: list[str]) -> str:
+    """Fingerprint named graphs by their triple counts."""
+    query = get_graph_triple_counts_query(graphs)
+    response = sparql_query(settings.sparql_endpoint, query, client)
+    counts = {
+        row["graph"]: row["count"] for row in iter_sparql_records(response.content)
+    }
+    return ",".join(f"{graph}={counts.get(graph, '0')}" for graph in sorted(graphs))
+
+
+def get_layer_fingerprint(layer_definition: dict) -> str | None:
+    """Fingerprint an ESRI layer by the time of its last edit, if it tracks one."""
+    last_edit_date = layer_definition.get("editingInfo", {}).get("lastEditDate")
+    return str(last_edit_date) if last_edit_date is not None else None
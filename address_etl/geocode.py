@@ -10,7 +10,14 @@ import httpx
 from jinja2 import Template
 from rich.progress import track
 
+from address_etl.crud import create_http_client
 from address_etl.esri_rest_api import get_count, get_esri_token
+from address_etl.fingerprint import StageFingerprints, get_layer_fingerprint
+from address_etl.json_decode import (
+    decode_esri_feature_set,
+    decode_esri_layer_definition,
+)
+from address_etl.run_stats import run_stats
 from address_etl.settings import settings
 from address_etl.time_convert import datetime_to_esri_datetime_utc
 
@@ -27,6 +34,7 @@ class GeocodeLayerSchema:
     geocode_source_field: str | None
     geocode_status_field: str | None
     last_edited_field: str | None
+    fingerprint: str | None = None
 
     @property
     def supports_incremental_import(self) -> bool:
@@ -35,6 +43,10 @@ class GeocodeLayerSchema:
 
 def on_backoff_handler(details):
     """Handler for backoff errors"""
+    # The geocode type lookup also retries its SPARQL queries with this handler.
+    run_stats.record_retry(
+        "sparql" if "sparql" in details["target"].__name__ else "esri"
+    )
     logger.warning(
         "Backing off {wait:0.1f} seconds after {tries} tries "
         "calling function {target} with args {args} and kwargs "
@@ -184,6 +196,7 @@ def get_geocode_layer_schema(layer_definition: dict[str, Any]) -> GeocodeLayerSc
         last_edited_field="last_edited_date"
         if "last_edited_date" in field_names
         else None,
+        fingerprint=get_layer_fingerprint(layer_definition),
     )
 
 
@@ -228,6 +241,31 @@ def get_layer_url(query_url: str) -> str:
     return query_url
 
 
+def fetch_geocode_layer_schema(
+    client: httpx.Client, access_token: str
+) -> GeocodeLayerSchema:
+    params = {"f": "json", "token": access_token}
+    response = client.get(
+        get_layer_url(settings.esri_geocode_rest_api_query_url),
+        params=params,
+    )
+    response.raise_for_status()
+    payload = decode_esri_layer_definition(response.content)
+
+    if "error" in payload:
+        error = payload["error"]
+        raise RuntimeError(
+            f"Error fetching geocode layer schema: ESRI error {error.get('code')}: {error.get('message')}"
+        )
+
+    if "fields" not in payload:
+        raise RuntimeError(
+            f"Error fetching geocode layer schema: expected 'fields' in response, got: {response.text[:1000]}"
+        )
+
+    return get_geocode_layer_schema(payload)
+
+
 def insert_geocodes(cursor: sqlite3.Cursor, features: list[dict[str, Any]]):
     """Insert geocodes into the PLS database."""
     for feature in features:
@@ -240,14 +278,16 @@ def insert_geocodes(cursor: sqlite3.Cursor, features: list[dict[str, Any]]):
         )
 
         if cursor.fetchone():
+            # Keep the existing site_id link unless the geocode moved to a
+            # different address; update_geocode_site_id relinks the rest.
             cursor.execute(
                 """
-                UPDATE lf_geocode_sp_survey_point SET geocode_type = ?, address_pid = ?, site_id = ?, centoid_lat = ?, centoid_lon = ? WHERE geocode_id = ?
+                UPDATE lf_geocode_sp_survey_point SET geocode_type = ?, address_pid = ?, site_id = CASE WHEN address_pid = ? THEN site_id END, centoid_lat = ?, centoid_lon = ? WHERE geocode_id = ?
                 """,
                 (
                     attrs["geocode_type"],
                     attrs["address_pid"],
-                    None,
+                    attrs["address_pid"],
                     geom["y"],
                     geom["x"],
                     attrs["objectid"],
@@ -275,18 +315,14 @@ class GeocodeImporter:
         self,
         cursor: sqlite3.Cursor,
         client: httpx.Client,
+        access_token: str,
+        schema: GeocodeLayerSchema,
         esri_date: str | None = None,
     ) -> None:
         self.cursor = cursor
         self.client = client
-        self.access_token = get_esri_token(
-            settings.esri_auth_url,
-            settings.esri_referer,
-            settings.esri_username,
-            settings.esri_password,
-            client,
-        )
-        self.schema = self.fetch_layer_schema()
+        self.access_token = access_token
+        self.schema = schema
         self.where_clause = build_geocode_where_clause(self.schema, esri_date)
         self.requires_full_refresh = bool(
             esri_date and not self.schema.supports_incremental_import
@@ -300,28 +336,6 @@ class GeocodeImporter:
             self.access_token,
         )
 
-    def fetch_layer_schema(self) -> GeocodeLayerSchema:
-        params = {"f": "json", "token": self.access_token}
-        response = self.client.get(
-            get_layer_url(settings.esri_geocode_rest_api_query_url),
-            params=params,
-        )
-        response.raise_for_status()
-        payload = response.json()
-
-        if "error" in payload:
-            error = payload["error"]
-            raise RuntimeError(
-                f"Error fetching geocode layer schema: ESRI error {error.get('code')}: {error.get('message')}"
-            )
-
-        if "fields" not in payload:
-            raise RuntimeError(
-                f"Error fetching geocode layer schema: expected 'fields' in response, got: {response.text[:1000]}"
-            )
-
-        return get_geocode_layer_schema(payload)
-
     def fetch_geocode_type_codes(self) -> dict[str, str]:
         if self.schema.geocode_type_field == "geocode_type":
             return {}
@@ -341,7 +355,7 @@ class GeocodeImporter:
             params=params,
         )
         response.raise_for_status()
-        payload = response.json()
+        payload = decode_esri_feature_set(response.content)
 
         if "error" in payload:
             error = payload["error"]
@@ -438,7 +452,7 @@ class GeocodeImporter:
             settings.esri_geocode_rest_api_query_url, params=params
         )
         response.raise_for_status()
-        data = response.json()
+        data = decode_esri_feature_set(response.content)
 
         try:
             return [
@@ -466,15 +480,37 @@ class GeocodeImporter:
             raise error
 
 
-def import_geocodes(cursor: sqlite3.Cursor, from_datetime: datetime | None = None):
+@run_stats.record_stage("geocodes")
+def import_geocodes(
+    cursor: sqlite3.Cursor,
+    from_datetime: datetime | None = None,
+    fingerprints: StageFingerprints | None = None,
+):
     if from_datetime:
         esri_date = datetime_to_esri_datetime_utc(from_datetime)
     else:
         esri_date = None
 
     start_time = time.time()
-    with httpx.Client(timeout=settings.http_timeout_in_seconds) as client:
-        geocode_importer = GeocodeImporter(cursor, client, esri_date)
+    with create_http_client() as client:
+        access_token = get_esri_token(
+            settings.esri_auth_url,
+            settings.esri_referer,
+            settings.esri_username,
+            settings.esri_password,
+            client,
+        )
+        # Decide on skipping before the importer queries the geocode types
+        # and the feature count.
+        schema = fetch_geocode_layer_schema(client, access_token)
+        if fingerprints and fingerprints.is_unchanged("geocodes", schema.fingerprint):
+            logger.info("Skipping geocode import, layer not edited")
+            return
+
+        geocode_importer = GeocodeImporter(
+            cursor, client, access_token, schema, esri_date
+        )
+
         if geocode_importer.requires_full_refresh:
             logger.info(
                 "Clearing lf_geocode_sp_survey_point before full geocode refresh because the live layer no longer supports incremental imports"
@@ -0,0 +1,315 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+import httpx
+
+from address_etl.settings import settings
+
+logger = logging.getLogger(__name__)
+
+HTTP_ARCHIVE_MODES = ("off", "record", "replay")
+
+# Credentials and ESRI tokens are left out of the request keys and recorded
+# URLs, so an archive can be shared and replayed without the credentials.
+REDACTED_PARAMS = frozenset(("token", "username", "password"))
+
+# The recorded bodies are stored decoded, so these no longer apply to them.
+DROPPED_HEADERS = frozenset(("content-encoding", "content-length", "transfer-encoding"))
+
+_archive: "HttpArchive | None" = None
+
+
+def redact_params(params: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    return sorted(
+        (name, value) for name, value in params if name not in REDACTED_PARAMS
+    )
+
+
+def redact_url(url: httpx.URL) -> str:
+    return str(url.copy_with(params=redact_params(url.params.multi_items())))
+
+
+def redact_content(content: bytes) -> bytes:
+    """Response body with the credentials and tokens of a JSON object left out.
+
+    Covers the ESRI generateToken response, whose token would otherwise be
+    stored in the archive uploaded next to pls.db.
+    """
+    if not content.lstrip().startswith(b"{") or b'"token"' not in content:
+        return content
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return content
+    if not REDACTED_PARAMS.intersection(payload):
+        return content
+    return json.dumps(
+        {
+            name: "redacted" if name in REDACTED_PARAMS else value
+            for name, value in payload.items()
+        }
+    ).encode()
+
+
+def request_key(request: httpx.Request) -> str:
+    """Digest identifying a request by its method, URL and body.
+
+    Query parameters and form fields are sorted, and credentials and tokens
+    are left out.
+    """
+    content = request.read()
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        content = urlencode(redact_params(parse_qsl(content.decode()))).encode()
+
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b"\0")
+    digest.update(redact_url(request.url).encode())
+    digest.update(b"\0")
+    digest.update(content)
+    return digest.hexdigest()
+
+
+class HttpArchive:
+    """SQLite archive of the ETL's HTTP exchanges.
+
+    Response bodies are compressed and stored once under their SHA-256 digest.
+    Exchanges are kept in the order they were recorded, and a request sent
+    several times, such as a retry, is replayed with its responses in that
+    order, repeating the last one. The inputs the requests depend on besides
+    the responses are kept in the pinned table, see pinned_value.
+    """
+
+    def __init__(self, path: str, mode: str) -> None:
+        if mode == "record":
+            Path(path).unlink(missing_ok=True)
+        elif not Path(path).exists():
+            raise FileNotFoundError(f"HTTP archive {path} does not exist")
+
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.replayed: dict[str, int] = {}
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bodies (
+                digest TEXT PRIMARY KEY,
+                content BLOB NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS exchanges (
+                id INTEGER PRIMARY KEY,
+                request_key TEXT NOT NULL,
+                method TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status_code INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body_digest TEXT NOT NULL REFERENCES bodies (digest),
+                elapsed_seconds REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pinned (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_exchanges_request_key "
+            "ON exchanges (request_key, id)"
+        )
+        self.connection.commit()
+
+    def record(
+        self, request: httpx.Request, response: httpx.Response, elapsed_seconds: float
+    ) -> None:
+        content = redact_content(response.content)
+        digest = hashlib.sha256(content).hexdigest()
+        headers = [
+            (name, value)
+            for name, value in response.headers.multi_items()
+            if name not in DROPPED_HEADERS
+        ]
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO bodies (digest, content) VALUES (?, ?)",
+                (digest, zlib.compress(content)),
+            )
+            self.connection.execute(
+                """
+                INSERT INTO exchanges (request_key, method, url, status_code,
+                    headers, body_digest, elapsed_seconds)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    request_key(request),
+                    request.method,
+                    redact_url(request.url),
+                    response.status_code,
+                    json.dumps(headers),
+                    digest,
+                    elapsed_seconds,
+                ),
+            )
+            self.connection.commit()
+
+    def replay(self, request: httpx.Request) -> tuple[int, list, bytes, float]:
+        """The recorded status code, headers, body and elapsed seconds."""
+        key = request_key(request)
+        with self.lock:
+            rows = self.connection.execute(
+                """
+                SELECT e.status_code, e.headers, b.content, e.elapsed_seconds
+                FROM exchanges e
+                JOIN bodies b ON b.digest = e.body_digest
+                WHERE e.request_key = ?
+                ORDER BY e.id
+                """,
+                (key,),
+            ).fetchall()
+            if not rows:
+                # Not an httpx error, so the request is not retried.
+                raise RuntimeError(
+                    f"No recorded response for {request.method} "
+                    f"{redact_url(request.url)} in {self.path}"
+                )
+            position = self.replayed.get(key, 0)
+            self.replayed[key] = position + 1
+
+        status_code, headers, content, elapsed = rows[min(position, len(rows) - 1)]
+        return status_code, json.loads(headers), zlib.decompress(content), elapsed
+
+    def pin(self, name: str, value: str) -> str:
+        """The value first recorded under name, recording value if there is none."""
+        with self.lock:
+            if self.mode == "record":
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO pinned (name, value) VALUES (?, ?)",
+                    (name, value),
+                )
+                self.connection.commit()
+            row = self.connection.execute(
+                "SELECT value FROM pinned WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None:
+            raise RuntimeError(f"No recorded {name} in {self.path}")
+        return row[0]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def get_http_archive() -> HttpArchive:
+    global _archive
+
+    if _archive is None:
+        logger.info(
+            f"Opening HTTP archive {settings.http_archive_path} "
+            f"to {settings.http_archive_mode}"
+        )
+        _archive = HttpArchive(settings.http_archive_path, settings.http_archive_mode)
+    return _archive
+
+
+def close_http_archive() -> None:
+    global _archive
+
+    if _archive is not None:
+        _archive.close()
+        _archive = None
+
+
+def pinned_value(name: str, value: str) -> str:
+    """value, or the value recorded under name when replaying an archive.
+
+    The requests of a run also depend on its clock and on the previous run's
+    database, such as the ESRI where clauses dated from the previous run's
+    start and the days drift is sampled on. Pinning these makes a replay send
+    the requests that were recorded. The previous database is still read from
+    S3, so it must not have been deleted since the recording.
+    """
+    if settings.http_archive_mode not in ("record", "replay"):
+        return value
+    return get_http_archive().pin(name, value)
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Transport recording every exchange of another transport in the archive."""
+
+    def __init__(self, transport: httpx.BaseTransport, archive: HttpArchive) -> None:
+        self.transport = transport
+        self.archive = archive
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        response = self.transport.handle_request(request)
+        try:
+            response.read()
+        finally:
+            response.close()
+        self.archive.record(request, response, time.perf_counter() - start)
+        return httpx.Response(
+            response.status_code,
+            headers=[
+                (name, value)
+                for name, value in response.headers.multi_items()
+                if name not in DROPPED_HEADERS
+            ],
+            content=response.content,
+            request=request,
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Transport answering every request from the archive.
+
+    With latency set, each response is delayed by the time it took when it
+    was recorded.
+    """
+
+    def __init__(self, archive: HttpArchive, latency: bool = False) -> None:
+        self.archive = archive
+        self.latency = latency
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        status_code, headers, content, elapsed_seconds = self.archive.replay(request)
+        if self.latency:
+            time.sleep(elapsed_seconds)
+        return httpx.Response(
+            status_code, headers=headers, content=content, request=request
+        )
+
+
+def create_http_transport() -> httpx.BaseTransport:
+    """Network transport for settings.http_archive_mode."""
+    mode = settings.http_archive_mode
+    if mode not in HTTP_ARCHIVE_MODES:
+        raise ValueError(f"Unknown HTTP archive mode {mode}")
+
+    if mode == "replay":
+        return ReplayTransport(
+            get_http_archive(), latency=settings.http_archive_replay_latency
+        )
+    transport = httpx.HTTPTransport()
+    if mode == "record":
+        return RecordingTransport(transport, get_http_archive())
+    return transport
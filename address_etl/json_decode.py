@@ -0,0 +1,168 @@
+import importlib.util
+import json
+import logging
+import re
+from collections.abc import Callable, Iterator
+from functools import cache
+from typing import Any, TypedDict
+
+from address_etl.settings import settings
+
+logger = logging.getLogger(__name__)
+
+JSON_DECODERS = ("msgspec", "orjson", "json")
+
+_bindings_start = re.compile(r'"bindings"\s*:\s*\[')
+_whitespace = re.compile(r"\s*")
+
+
+class SparqlTerm(TypedDict):
+    value: str
+
+
+class SparqlResults(TypedDict):
+    bindings: list[dict[str, SparqlTerm]]
+
+
+class SparqlResponse(TypedDict):
+    results: SparqlResults
+
+
+class EsriFeature(TypedDict, total=False):
+    attributes: dict[str, Any]
+    geometry: dict[str, Any] | None
+
+
+class EsriFeatureSet(TypedDict, total=False):
+    features: list[EsriFeature]
+    error: dict[str, Any]
+
+
+class EsriLayerDefinition(TypedDict, total=False):
+    fields: list[dict[str, Any]]
+    objectIdField: str
+    objectIdFieldName: str
+    editingInfo: dict[str, Any]
+    error: dict[str, Any]
+
+
+SparqlRecord = dict[str, str]
+
+
+@cache
+def get_json_decoder() -> str:
+    """Name of the JSON library to decode responses with.
+
+    settings.json_decoder selects one of JSON_DECODERS, or "auto" for the
+    fastest one installed. msgspec and orjson are optional dependencies.
+    """
+    if settings.json_decoder == "auto":
+        names = JSON_DECODERS
+    elif settings.json_decoder in JSON_DECODERS:
+        names = (settings.json_decoder,)
+    else:
+        raise ValueError(f"Unknown JSON decoder {settings.json_decoder}")
+
+    for name in names:
+        if importlib.util.find_spec(name) is not None:
+            break
+    else:
+        raise ImportError(f"JSON decoder {settings.json_decoder} is not installed")
+
+    logger.info(f"Decoding JSON responses with {name}")
+    return name
+
+
+def make_typed_decoder(name: str, schema: type) -> Callable[[bytes], Any]:
+    """Return the decode function of a JSON library for a schema.
+
+    Every library returns plain dicts and lists. msgspec also validates the
+    payload against the schema while decoding and skips the fields it does
+    not declare, such as the type and datatype of SPARQL terms. It cannot
+    replace a nested term with its value while decoding, so SPARQL bindings
+    are still flattened to records in Python.
+    """
+    if name == "msgspec":
+        import msgspec
+
+        return msgspec.json.Decoder(schema).decode
+    if name == "orjson":
+        import orjson
+
+        return orjson.loads
+    return json.loads
+
+
+@cache
+def get_typed_decoder(schema: type) -> Callable[[bytes], Any]:
+    return make_typed_decoder(get_json_decoder(), schema)
+
+
+def flatten_binding(binding: dict[str, SparqlTerm]) -> SparqlRecord:
+    """Flatten a SPARQL binding to a record of variable name to value.
+
+    Unbound optional variables are absent from the record.
+    """
+    return {name: term["value"] for name, term in binding.items()}
+
+
+def iter_json_bindings(content: bytes) -> Iterator[SparqlRecord]:
+    """Parse the bindings of a SPARQL JSON response one at a time.
+
+    Only the binding being parsed is held as Python objects besides the
+    response text.
+    """
+    text = content.decode()
+    match = _bindings_start.search(text)
+    if match is None:
+        raise ValueError("SPARQL JSON response has no results bindings")
+
+    decoder = json.JSONDecoder()
+    index = _whitespace.match(text, match.end()).end()
+    if text.startswith("]", index):
+        return
+    while True:
+        binding, index = decoder.raw_decode(text, index)
+        yield flatten_binding(binding)
+        index = _whitespace.match(text, index).end()
+        if text.startswith("]", index):
+            return
+        if not text.startswith(",", index):
+            raise ValueError(f"Expected , or ] at position {index} of bindings")
+        index = _whitespace.match(text, index + 1).end()
+
+
+def iter_sparql_records(content: bytes) -> Iterator[SparqlRecord]:
+    """Decode a SPARQL JSON results response into flat records, lazily.
+
+    With the json decoder the bindings are parsed one at a time, so only the
+    response bytes and the record being consumed are held. msgspec and orjson
+    decode the whole response at once into bindings of terms, and each
+    binding is released as it is flattened into its record.
+    """
+    if get_json_decoder() == "json":
+        yield from iter_json_bindings(content)
+        return
+
+    bindings = get_typed_decoder(SparqlResponse)(content)["results"]["bindings"]
+    bindings.reverse()
+    while bindings:
+        yield flatten_binding(bindings.pop())
+
+
+def decode_esri_feature_set(content: bytes) -> EsriFeatureSet:
+    """Decode an ESRI feature query response.
+
+    Only the features and error of the response are kept when decoding with
+    msgspec.
+    """
+    return get_typed_decoder(EsriFeatureSet)(content)
+
+
+def decode_esri_layer_definition(content: bytes) -> EsriLayerDefinition:
+    """Decode an ESRI layer definition response.
+
+    Only the fields, object id field, editing info and error of the response
+    are kept when decoding with msgspec.
+    """
+    return get_typed_decoder(EsriLayerDefinition)(content)
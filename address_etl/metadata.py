@@ -1,3 +1,4 @@
+import json
 import sqlite3
 from datetime import datetime
 
@@ -29,3 +30,96 @@ def metadata_write_end_time(cursor: sqlite3.Cursor, end_time_str: str | None = N
         (end_time_str,),
     )
     cursor.connection.commit()
+
+
+def metadata_read_start_time(
+    cursor: sqlite3.Cursor, schema_name: str = "main"
+) -> datetime:
+    """Read the start time from the metadata table"""
+    cursor.execute(f"SELECT start_time FROM {schema_name}.metadata")
+    return datetime.fromisoformat(cursor.fetchone()["start_time"])
+
+
+def metadata_write_full_rebuild_time(
+    cursor: sqlite3.Cursor, full_rebuild_time_str: str
+):
+    """Write the start time of the last full rebuild to the metadata table"""
+    cursor.execute(
+        "UPDATE metadata SET full_rebuild_time = ? WHERE id = 1",
+        (full_rebuild_time_str,),
+    )
+    cursor.connection.commit()
+
+
+def metadata_read_full_rebuild_time(
+    cursor: sqlite3.Cursor, schema_name: str = "main"
+) -> datetime | None:
+    """Read the start time of the last full rebuild from the metadata table.
+
+    Returns None if it was never recorded, e.g. for databases written before
+    incremental runs existed.
+    """
+    if not metadata_has_column(cursor, "full_rebuild_time", schema_name):
+        return None
+
+    cursor.execute(f"SELECT full_rebuild_time FROM {schema_name}.metadata")
+    row = cursor.fetchone()
+    if row is None or row["full_rebuild_time"] is None:
+        return None
+    return datetime.fromisoformat(row["full_rebuild_time"])
+
+
+def metadata_write_stage_fingerprints(
+    cursor: sqlite3.Cursor, stage_fingerprints: dict[str, str]
+):
+    """Write the input fingerprints of the ETL stages to the metadata table"""
+    cursor.execute(
+        "UPDATE metadata SET stage_fingerprints = ? WHERE id = 1",
+        (json.dumps(stage_fingerprints, sort_keys=True),),
+    )
+    cursor.connection.commit()
+
+
+def metadata_read_stage_fingerprints(
+    cursor: sqlite3.Cursor, schema_name: str = "main"
+) -> dict[str, str]:
+    """Read the input fingerprints of the ETL stages from the metadata table"""
+    if not metadata_has_column(cursor, "stage_fingerprints", schema_name):
+        return {}
+
+    cursor.execute(f"SELECT stage_fingerprints FROM {schema_name}.metadata")
+    row = cursor.fetchone()
+    if row is None or row["stage_fingerprints"] is None:
+        return {}
+    return json.loads(row["stage_fingerprints"])
+
+
+def metadata_write_row_hashes(cursor: sqlite3.Cursor, row_hashes: bool):
+    """Write whether the rows of the hashed tables have hashes to the metadata table"""
+    cursor.execute(
+        "UPDATE metadata SET row_hashes = ? WHERE id = 1",
+        (int(row_hashes),),
+    )
+    cursor.connection.commit()
+
+
+def metadata_read_row_hashes(cursor: sqlite3.Cursor, schema_name: str = "main") -> bool:
+    """Read whether the rows of the hashed tables have hashes from the metadata table.
+
+    Returns True if it was never recorded, as the rows may have hashes.
+    """
+    if not metadata_has_column(cursor, "row_hashes", schema_name):
+        return True
+
+    cursor.execute(f"SELECT row_hashes FROM {schema_name}.metadata")
+    row = cursor.fetchone()
+    if row is None or row["row_hashes"] is None:
+        return True
+    return bool(row["row_hashes"])
+
+
+def metadata_has_column(
+    cursor: sqlite3.Cursor, column_name: str, schema_name: str = "main"
+) -> bool:
+    cursor.execute(f"PRAGMA {schema_name}.table_info(metadata)")
+    return any(row["name"] == column_name for row in cursor.fetchall())
@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from address_etl.run_stats import get_peak_rss_bytes, run_stats
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "address_etl"
+
+
+def get_rss_bytes() -> int:
+    """Current resident set size, or the peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as file:
+            resident_pages = int(file.read().split()[1])
+    except OSError:
+        return get_peak_rss_bytes()
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics() -> str:
+    """The run's progress in the Prometheus text exposition format."""
+    stage = run_stats.current_stage
+    stage_seconds = time.perf_counter() - run_stats.stage_started
+    stage_rows = run_stats.rows_written - run_stats.stage_rows_written
+    metrics = [
+        (
+            "stage_info",
+            "gauge",
+            "Stage currently running.",
+            [(f'stage="{escape_label(stage)}"', 1)] if stage else [],
+        ),
+        (
+            "stage_batches_done",
+            "gauge",
+            "SPARQL batches of the current stage written.",
+            [("", run_stats.batches_done)],
+        ),
+        (
+            "stage_batches_total",
+            "gauge",
+            "SPARQL batches of the current stage.",
+            [("", run_stats.batches_total)],
+        ),
+        (
+            "stage_rows_per_second",
+            "gauge",
+            "Rows written per second in the current stage.",
+            [("", stage_rows / stage_seconds if stage_seconds > 0 else 0.0)],
+        ),
+        (
+            "rows_written_total",
+            "counter",
+            "Rows written to the SQLite database.",
+            [("", run_stats.rows_written)],
+        ),
+        (
+            "http_in_flight_requests",
+            "gauge",
+            "HTTP requests waiting for a response.",
+            [("", run_stats.in_flight_requests)],
+        ),
+        (
+            "decode_queue_depth",
+            "gauge",
+            "Fetched batches waiting to be decoded and written to SQLite.",
+            [("", run_stats.decode_queue_depth)],
+        ),
+        (
+            "resident_memory_bytes",
+            "gauge",
+            "Resident set size of the process.",
+            [("", get_rss_bytes())],
+        ),
+        (
+            "http_retries_total",
+            "counter",
+            "Retried HTTP requests by source.",
+            [
+                (f'source="{escape_label(source)}"', count)
+                for source, count in sorted(run_stats.retries_by_source.items())
+            ],
+        ),
+        (
+            "http_requests_total",
+            "counter",
+            "HTTP requests completed.",
+            [("", run_stats.http_requests)],
+        ),
+        (
+            "http_received_bytes_total",
+            "counter",
+            "Bytes received in HTTP responses.",
+            [("", run_stats.bytes_received)],
+        ),
+        (
+            "sqlite_commits_total",
+            "counter",
+            "Commits of the SQLite database.",
+            [("", run_stats.commits)],
+        ),
+    ]
+
+    lines = []
+    for name, metric_type, help_text, samples in metrics:
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {metric_type}")
+        for labels, value in samples:
+            labels = f"{{{labels}}}" if labels else ""
+            lines.append(f"{PREFIX}_{name}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Scrapes every few seconds would otherwise fill the ETL's logs.
+        pass
+
+
+def start_metrics_server(port: int) -> ThreadingHTTPServer:
+    """Serve /metrics on port from a daemon thread.
+
+    Binds all interfaces so a scraper sidecar in the same ECS task can reach
+    it. Call shutdown on the returned server to stop it.
+    """
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    )
+    thread.start()
+    logger.info(f"Serving metrics on port {server.server_address[1]}")
+    return server
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+from address_etl.sqlite_build import attach_read_only
+
+logger = logging.getLogger(__name__)
+
+# Tables with a hash column, and the column that identifies a row across runs.
+HASHED_TABLES = {
+    "local_auth": "la_code",
+    "locality": "locality_code",
+    "lf_road": "road_id",
+    "lf_parcel": "parcel_id",
+    "lf_site": "site_id",
+    "lf_place_name": "place_name_id",
+    "lf_geocode_sp_survey_point": "geocode_id",
+    "lf_address": "addr_id",
+}
+
+
+def row_hash(*values) -> str:
+    """Deterministic content hash of a row's column values."""
+    encoded = json.dumps(values, separators=(",", ":")).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def register_row_hash(connection: sqlite3.Connection) -> None:
+    connection.create_function("row_hash", -1, row_hash, deterministic=True)
+
+
+def get_business_columns(
+    cursor: sqlite3.Cursor, table_name: str, schema_name: str = "main"
+) -> list[str]:
+    cursor.execute(f"PRAGMA {schema_name}.table_info({table_name})")
+    return [row["name"] for row in cursor.fetchall() if row["name"] != "hash"]
+
+
+def populate_row_hashes(cursor: sqlite3.Cursor) -> None:
+    """Set the hash column of every row to the hash of its business columns."""
+    start_time = time.time()
+    for table_name in HASHED_TABLES:
+        columns = get_business_columns(cursor, table_name)
+        logger.info(f"Computing row hashes for {table_name}")
+        cursor.execute(f"UPDATE {table_name} SET hash = row_hash({', '.join(columns)})")
+        cursor.connection.commit()
+
+    logger.info(f"Time taken: {time.time() - start_time:.2f} seconds")
+
+
+def clear_row_hashes(cursor: sqlite3.Cursor) -> None:
+    """Clear the hashes of rows carried forward from an earlier snapshot.
+
+    Runs without a changeset skip populate_row_hashes, so a carried forward
+    hash could describe a row since changed. A NULL hash makes a later
+    changeset hash the row itself. Only needed when the previous snapshot
+    has row hashes, see metadata_read_row_hashes.
+    """
+    for table_name in HASHED_TABLES:
+        cursor.execute(f"UPDATE {table_name} SET hash = NULL WHERE hash IS NOT NULL")
+        if cursor.rowcount:
+            logger.info(f"Cleared {cursor.rowcount} row hashes of {table_name}")
+    cursor.connection.commit()
+
+
+def build_changeset(
+    cursor: sqlite3.Cursor, previous_db_path: str, changeset_path: str
+) -> None:
+    """Write the rows that changed since the previous ETL to a changeset database.
+
+    For each hashed table the changeset database has a table of the same name
+    holding inserted and updated rows, with the kind of change in change_type,
+    and a <table>_deleted table holding the ids of deleted rows.
+    """
+    start_time = time.time()
+    logger.info(f"Building changeset database {changeset_path}")
+    Path(changeset_path).unlink(missing_ok=True)
+
+    cursor.connection.commit()
+    attach_read_only(cursor, previous_db_path, "previous")
+    cursor.execute("ATTACH DATABASE ? AS changeset", (changeset_path,))
+    try:
+        for table_name, id_column in HASHED_TABLES.items():
+            build_table_changeset(cursor, table_name, id_column)
+        cursor.connection.commit()
+    finally:
+        cursor.execute("DETACH DATABASE changeset")
+        cursor.execute("DETACH DATABASE previous")
+
+    logger.info(f"Time taken: {time.time() - start_time:.2f} seconds")
+
+
+def build_table_changeset(
+    cursor: sqlite3.Cursor, table_name: str, id_column: str
+) -> None:
+    cursor.execute(
+        f"""
+        CREATE TABLE changeset.{table_name} AS
+        SELECT '' AS change_type, * FROM main.{table_name} WHERE 0
+        """
+    )
+    cursor.execute(
+        f"""
+        CREATE TABLE changeset.{table_name}_deleted AS
+        SELECT {id_column} FROM main.{table_name} WHERE 0
+        """
+    )
+
+    cursor.execute(
+        "SELECT 1 FROM previous.sqlite_master WHERE type = 'table' AND name = ?",
+        (table_name,),
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(
+            f"""
+            INSERT INTO changeset.{table_name}
+            SELECT 'insert', * FROM main.{table_name}
+            """
+        )
+        logger.info(f"{table_name}: {cursor.rowcount} inserted")
+        return
+
+    # Snapshots written before row hashes were populated have NULL hashes,
+    # so fall back to hashing the previous row's columns, as the previous
+    # snapshot defined them.
+    previous_columns = ", ".join(
+        f"p.{column}" for column in get_business_columns(cursor, table_name, "previous")
+    )
+    previous_hash = f"COALESCE(p.hash, row_hash({previous_columns}))"
+    cursor.execute(
+        f"""
+        INSERT INTO changeset.{table_name}
+        SELECT
+            CASE WHEN p.{id_column} IS NULL THEN 'insert' ELSE 'update' END,
+            c.*
+        FROM main.{table_name} c
+        LEFT JOIN previous.{table_name} p ON p.{id_column} = c.{id_column}
+        WHERE p.{id_column} IS NULL OR c.hash IS NOT {previous_hash}
+        """
+    )
+    changed_count = cursor.rowcount
+
+    cursor.execute(
+        f"""
+        INSERT INTO changeset.{table_name}_deleted
+        SELECT p.{id_column}
+        FROM previous.{table_name} p
+        WHERE NOT EXISTS (
+            SELECT 1 FROM main.{table_name} c WHERE c.{id_column} = p.{id_column}
+        )
+        """
+    )
+    logger.info(
+        f"{table_name}: {changed_count} inserted or updated, {cursor.rowcount} deleted"
+    )
@@ -0,0 +1,206 @@
+import logging
+import multiprocessing
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+from address_etl.crud import sparql_query
+from address_etl.json_decode import SparqlRecord, iter_sparql_records
+from address_etl.run_stats import run_stats
+from address_etl.settings import settings
+from address_etl.sparql_profile import RequestTiming, sparql_profiler
+from address_etl.timeline import timeline
+
+logger = logging.getLogger(__name__)
+
+RowFunction = Callable[[SparqlRecord], tuple]
+
+
+def road_row(row: SparqlRecord) -> tuple:
+    return (
+        row["road_id"],
+        row["road_name"],
+        row.get("road_name_suffix"),
+        row.get("road_name_type"),
+        row["locality_code"],
+        row["road_cat_desc"],
+    )
+
+
+def parcel_row(row: SparqlRecord) -> tuple:
+    return (
+        row["parcel_id"],
+        row["plan_no"],
+        row["lot_no"],
+    )
+
+
+def site_row(row: SparqlRecord) -> tuple:
+    return (
+        row["site_id"],
+        row.get("parent_site_id"),
+        row["site_type"],
+        row["parcel_id"],
+    )
+
+
+def place_name_row(row: SparqlRecord) -> tuple:
+    return (
+        row["place_name_id"],
+        row["pl_name_status_code"],
+        row["pl_name_type_code"],
+        row["pl_name"],
+        row["site_id"],
+    )
+
+
+def address_row(row: SparqlRecord) -> tuple:
+    """lf_address row with the address IRI in place of the address PID.
+
+    The PID is looked up in the main process, which owns the database.
+    """
+    return (
+        row["addr_id"],
+        row["addr_iri"],
+        row["parcel_id"],
+        row["addr_status_code"],
+        row.get("unit_type"),
+        row.get("unit_no"),
+        row.get("unit_suffix"),
+        row.get("level_type"),
+        row.get("level_no"),
+        row.get("level_suffix"),
+        row.get("street_no_first"),
+        row.get("street_no_first_suffix"),
+        row.get("street_no_last"),
+        row.get("street_no_last_suffix"),
+        row["road_id"],
+        row["site_id"],
+        row.get("location_desc"),
+        row["address_standard"],
+    )
+
+
+class DecodedRows:
+    """Rows of a SPARQL JSON response, decoded as they are iterated.
+
+    Counts the rows and the seconds spent decoding them, leaving out the time
+    the consumer spends between rows.
+    """
+
+    def __init__(self, row_function: RowFunction, content: bytes) -> None:
+        self.row_function = row_function
+        self.records = iter_sparql_records(content)
+        self.count = 0
+        self.seconds = 0.0
+
+    def __iter__(self) -> "DecodedRows":
+        return self
+
+    def __next__(self) -> tuple:
+        start = time.perf_counter()
+        try:
+            row = self.row_function(next(self.records))
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.count += 1
+        return row
+
+
+def decode_rows(row_function: RowFunction, content: bytes) -> tuple[list[tuple], float]:
+    """Decode a SPARQL JSON response and transform its bindings into rows.
+
+    Returns the rows and the seconds taken. Runs in the worker processes, so
+    only the raw response bytes are sent to the worker and only the row
+    tuples are sent back.
+    """
+    start = time.perf_counter()
+    rows = [row_function(row) for row in iter_sparql_records(content)]
+    return rows, time.perf_counter() - start
+
+
+def iter_decoded_batches(
+    client: httpx.Client,
+    iris: Sequence,
+    batch_size: int,
+    get_query: Callable[..., str],
+    row_function: RowFunction,
+) -> Iterator[tuple[int, list, Iterable[tuple]]]:
+    """Fetch the details of iris in batches and yield their transformed rows.
+
+    Yields (batch_number, batch_iris, rows) in batch order and records the
+    timing of each batch in sparql_profiler. Without pls_decode_workers, the
+    rows are decoded lazily as the caller consumes them, which it must do
+    before asking for the next batch. With pls_decode_workers set, responses
+    are decoded into lists by a process pool while the next batches are
+    fetched and the previous ones are written to SQLite.
+    """
+    stage = run_stats.current_stage
+    workers = settings.pls_decode_workers
+    batches_total = -(-len(iris) // batch_size)
+    if workers <= 0:
+        for i in range(0, len(iris), batch_size):
+            batch_iris = iris[i : i + batch_size]
+            timing = RequestTiming()
+            query = get_query(iris=batch_iris)
+            response = sparql_query(settings.sparql_endpoint, query, client, timing)
+            batch_number = i // batch_size + 1
+            rows = DecodedRows(row_function, response.content)
+            yield batch_number, batch_iris, rows
+            # The batch has been decoded and written once the next one is
+            # requested.
+            sparql_profiler.record(
+                stage,
+                batch_number,
+                batch_iris,
+                timing,
+                len(response.content),
+                rows.count,
+                rows.seconds,
+            )
+            run_stats.record_progress(batch_number, batches_total)
+        run_stats.record_progress(batches_total, batches_total)
+        return
+
+    def finish(batch_number, batch_iris, timing, content_length, future):
+        # Time the main thread spends stalled on the decode pool.
+        with timeline.span("decode wait", "decode", batch=batch_number):
+            rows, decode_seconds = future.result()
+        sparql_profiler.record(
+            stage,
+            batch_number,
+            batch_iris,
+            timing,
+            content_length,
+            len(rows),
+            decode_seconds,
+        )
+        run_stats.record_progress(batch_number - 1, batches_total, len(pending))
+        return batch_number, batch_iris, rows
+
+    # Forking would copy the parent's SQLite connections and HTTP client, and
+    # any lock held by another thread, into the workers.
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        pending = deque()
+        for i in range(0, len(iris), batch_size):
+            batch_iris = iris[i : i + batch_size]
+            timing = RequestTiming()
+            query = get_query(iris=batch_iris)
+            response = sparql_query(settings.sparql_endpoint, query, client, timing)
+            future = pool.submit(decode_rows, row_function, response.content)
+            pending.append(
+                (i // batch_size + 1, batch_iris, timing, len(response.content), future)
+            )
+
+            # Keep every worker busy while bounding the decoded batches held.
+            if len(pending) > workers:
+                yield finish(*pending.popleft())
+
+        while pending:
+            yield finish(*pending.popleft())
+        run_stats.record_progress(batches_total, batches_total)
@@ -0,0 +1,160 @@
+import logging
+import os
+import sqlite3
+import tempfile
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Self
+
+import httpx
+
+from address_etl.json_decode import iter_sparql_records
+from address_etl.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SPILL_BATCH_SIZE = 10000
+
+
+class DiscoveredIris(Sequence):
+    """Compact store for the keys returned by a stage's IRIs-only query.
+
+    Rows are held as tuples of interned strings, so the road, locality and
+    parcel values repeated across addresses are stored once. Once more than
+    settings.discovery_memory_rows rows are held, they are spilled to a
+    temporary on-disk SQLite database and read back one slice at a time.
+
+    Slicing returns dicts keyed by column, or plain values for a single
+    column, matching what the query templates expect. Close the store, or use
+    it as a context manager, to remove its spill database.
+    """
+
+    def __init__(self, columns: tuple[str, ...], memory_rows: int | None = None):
+        self.columns = columns
+        self.memory_rows = (
+            settings.discovery_memory_rows if memory_rows is None else memory_rows
+        )
+        self._rows: list[tuple[str, ...]] = []
+        self._interned: dict[str, str] = {}
+        self._spill: sqlite3.Connection | None = None
+        self._spilled_count = 0
+
+    def extend(self, rows: Iterable[tuple[str, ...]]) -> None:
+        for row in rows:
+            self._rows.append(
+                tuple(self._interned.setdefault(value, value) for value in row)
+            )
+            if len(self._rows) >= self.memory_rows:
+                self._flush()
+        # The rows share the interned strings, so the table is only needed
+        # while rows are being added.
+        self._interned = {}
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _flush(self) -> None:
+        if self._spill is None:
+            logger.info(
+                f"Spilling discovered IRIs to disk after {len(self._rows)} rows"
+            )
+            self._spill = open_spill_database(self.columns)
+
+        placeholders = ", ".join("?" for _ in self.columns)
+        for i in range(0, len(self._rows), SPILL_BATCH_SIZE):
+            self._spill.executemany(
+                f"INSERT INTO discovered VALUES ({placeholders})",
+                self._rows[i : i + SPILL_BATCH_SIZE],
+            )
+        self._spill.commit()
+        self._spilled_count += len(self._rows)
+        self._rows = []
+        self._interned = {}
+
+    def _read_spilled(self, start: int, stop: int) -> list[tuple[str, ...]]:
+        if self._spill is None or start >= stop:
+            return []
+
+        # Rows are only ever appended, so rowid is the 1-based position.
+        return self._spill.execute(
+            "SELECT * FROM discovered WHERE rowid > ? AND rowid <= ? ORDER BY rowid",
+            (start, stop),
+        ).fetchall()
+
+    def _to_item(self, row: tuple[str, ...]):
+        if len(self.columns) == 1:
+            return row[0]
+        return dict(zip(self.columns, row))
+
+    def __len__(self) -> int:
+        return self._spilled_count + len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("DiscoveredIris only supports contiguous slices")
+
+            rows = self._read_spilled(start, min(stop, self._spilled_count))
+            rows.extend(
+                self._rows[
+                    max(start - self._spilled_count, 0) : max(
+                        stop - self._spilled_count, 0
+                    )
+                ]
+            )
+            return [self._to_item(row) for row in rows]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("DiscoveredIris index out of range")
+        return self[index : index + 1][0]
+
+    def __iter__(self) -> Iterator:
+        for i in range(0, len(self), SPILL_BATCH_SIZE):
+            yield from self[i : i + SPILL_BATCH_SIZE]
+
+
+def open_spill_database(columns: tuple[str, ...]) -> sqlite3.Connection:
+    """Open a scratch database on disk that is removed once it is closed.
+
+    A separate file is used because temp tables follow PRAGMA temp_store,
+    which keeps them in memory during bulk inserts.
+    """
+    fd, path = tempfile.mkstemp(prefix="discovered-", suffix=".db")
+    os.close(fd)
+    try:
+        connection = sqlite3.connect(path)
+    finally:
+        os.unlink(path)
+
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    connection.execute(
+        f"CREATE TABLE discovered ({', '.join(f'{column} TEXT' for column in columns)})"
+    )
+    return connection
+
+
+def read_discovered_iris(
+    response: httpx.Response, columns: tuple[str, ...]
+) -> DiscoveredIris:
+    """Read the columns of an IRIs-only query response into a DiscoveredIris.
+
+    The bindings are parsed and stored one at a time, so the decoded response
+    is never held in full.
+    """
+    iris = DiscoveredIris(columns)
+    iris.extend(
+        tuple(row[column] for column in columns)
+        for row in iter_sparql_records(response.content)
+    )
+    return iris
@@ -0,0 +1,303 @@
+import logging
+import sqlite3
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+import httpx
+
+from address_etl.crud import create_http_client, sparql_query
+from address_etl.json_decode import iter_sparql_records
+from address_etl.pls.queries import address, place_name, road, site
+from address_etl.pls.tables import (
+    create_address_indexes,
+    create_parcel_indexes,
+    create_place_name_indexes,
+    create_road_indexes,
+    create_site_indexes,
+    map_ids_to_integers,
+    optimize_sqlite_for_bulk_inserts,
+    populate_address_tables,
+    populate_locality_tables,
+    populate_parcel_tables,
+    populate_place_name_tables,
+    populate_road_tables,
+    populate_site_tables,
+    prune_addresses_without_pid_mapping,
+    restore_sqlite_settings,
+)
+from address_etl.settings import settings
+
+logger = logging.getLogger(__name__)
+
+ADDRESS_IRI_BATCH_SIZE = 5000
+
+# Tables refreshed by incremental runs, with their id column and id map table.
+ID_MAPPED_TABLES = (
+    ("lf_road", "road_id", "lf_road_id_map"),
+    ("lf_parcel", "parcel_id", "lf_parcel_id_map"),
+    ("lf_site", "site_id", "lf_site_id_map"),
+    ("lf_place_name", "place_name_id", "lf_place_name_id_map"),
+    ("lf_address", "addr_id", "lf_address_id_map"),
+)
+
+
+def is_incremental_run(
+    previous_full_rebuild_time: datetime | None, etl_started_at: datetime
+) -> bool:
+    """Whether this run can extract only the addresses that changed.
+
+    Falls back to a full rebuild when incremental runs are disabled, when the
+    previous database has no recorded full rebuild, or when the last full
+    rebuild is older than the configured interval.
+    """
+    if not settings.pls_incremental_sparql or previous_full_rebuild_time is None:
+        return False
+
+    return etl_started_at - previous_full_rebuild_time < timedelta(
+        days=settings.pls_full_rebuild_interval_days
+    )
+
+
+def get_changed_address_iris(
+    client: httpx.Client, changed_since: datetime
+) -> list[str]:
+    query = address.get_query_changed_iris(changed_since.isoformat())
+    response = sparql_query(settings.sparql_endpoint, query, client)
+    return sorted(row["addr_iri"] for row in iter_sparql_records(response.content))
+
+
+def get_iris_for_addresses(
+    client: httpx.Client,
+    get_query: Callable[..., str],
+    addr_iris: list[str],
+    columns: tuple[str, ...],
+) -> list[dict[str, str]]:
+    """Run an IRIs-only query restricted to addr_iris and return its distinct rows."""
+    rows = {}
+    for i in range(0, len(addr_iris), ADDRESS_IRI_BATCH_SIZE):
+        query = get_query(addr_iris=addr_iris[i : i + ADDRESS_IRI_BATCH_SIZE])
+        response = sparql_query(settings.sparql_endpoint, query, client)
+        for row in iter_sparql_records(response.content):
+            rows[tuple(row[column] for column in columns)] = None
+
+    return [dict(zip(columns, key)) for key in rows]
+
+
+def delete_changed_address_rows(cursor: sqlite3.Cursor, addr_iris: list[str]):
+    """Delete the addresses, sites and place names of the changed addresses.
+
+    Whatever still exists in the source is inserted again afterwards, so
+    addresses retired since the previous run drop out of the tables. The roads
+    and parcels the deleted rows referenced are kept in the temp tables
+    changed_road and changed_parcel for prune_unreferenced_rows.
+    """
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    cursor.execute("CREATE TEMP TABLE changed_address (iri TEXT PRIMARY KEY)")
+    cursor.executemany(
+        "INSERT OR IGNORE INTO changed_address (iri) VALUES (?)",
+        [(iri,) for iri in addr_iris],
+    )
+
+    # Address ids start with "<addr_iri>/" and "0" sorts right after "/".
+    cursor.execute(
+        """
+        CREATE TEMP TABLE changed_address_id AS
+        SELECT m.id
+        FROM changed_address c
+        JOIN lf_address_id_map m
+            ON m.iri >= c.iri || '/' AND m.iri < c.iri || '0'
+        """
+    )
+    # Site ids are "<parcel_id>|<addr_iri>".
+    cursor.execute(
+        """
+        CREATE TEMP TABLE changed_site AS
+        SELECT m.id
+        FROM lf_site_id_map m
+        JOIN changed_address c ON c.iri = substr(m.iri, instr(m.iri, '|') + 1)
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TEMP TABLE changed_road AS
+        SELECT DISTINCT road_id AS id
+        FROM lf_address
+        WHERE addr_id IN (SELECT id FROM changed_address_id)
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TEMP TABLE changed_parcel AS
+        SELECT parcel_id AS id
+        FROM lf_address
+        WHERE addr_id IN (SELECT id FROM changed_address_id)
+        UNION
+        SELECT parcel_id
+        FROM lf_site
+        WHERE site_id IN (SELECT id FROM changed_site)
+        """
+    )
+
+    cursor.execute(
+        "DELETE FROM lf_address WHERE addr_id IN (SELECT id FROM changed_address_id)"
+    )
+    logger.info(f"Deleted {cursor.rowcount} changed address rows")
+    cursor.execute(
+        "DELETE FROM lf_place_name WHERE site_id IN (SELECT id FROM changed_site)"
+    )
+    logger.info(f"Deleted {cursor.rowcount} changed place name rows")
+    cursor.execute("DELETE FROM lf_site WHERE site_id IN (SELECT id FROM changed_site)")
+    logger.info(f"Deleted {cursor.rowcount} changed site rows")
+
+    cursor.execute("DROP TABLE changed_site")
+    cursor.execute("DROP TABLE changed_address_id")
+    cursor.execute("DROP TABLE changed_address")
+    cursor.connection.commit()
+
+
+def replace_refetched_rows(cursor: sqlite3.Cursor):
+    """Delete carried-over rows that were fetched again in this run.
+
+    Refetched rows still hold their text identifier, which is mapped to the
+    integer id of the row it replaces once the old row is gone.
+    """
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    for table_name, id_column, map_table_name in ID_MAPPED_TABLES:
+        cursor.execute(
+            f"""
+            DELETE FROM {table_name}
+            WHERE {id_column} IN (
+                SELECT m.id
+                FROM {map_table_name} m
+                JOIN {table_name} t ON t.{id_column} = m.iri
+            )
+            """
+        )
+        logger.info(f"Replaced {cursor.rowcount} refetched {table_name} rows")
+    cursor.connection.commit()
+
+
+def prune_unreferenced_rows(cursor: sqlite3.Cursor):
+    """Delete the roads and parcels that only the changed addresses referenced.
+
+    Runs after replace_refetched_rows, so roads and parcels that were fetched
+    again for the changed addresses are no longer in changed_road or
+    changed_parcel under their old id. What remains there and no address or
+    site references any more was retired with the addresses.
+    """
+    cursor.execute(
+        """
+        DELETE FROM lf_road
+        WHERE road_id IN (SELECT id FROM changed_road)
+            AND NOT EXISTS (
+                SELECT 1 FROM lf_address a WHERE a.road_id = lf_road.road_id
+            )
+        """
+    )
+    logger.info(f"Pruned {cursor.rowcount} unreferenced road rows")
+    cursor.execute(
+        """
+        DELETE FROM lf_parcel
+        WHERE parcel_id IN (SELECT id FROM changed_parcel)
+            AND NOT EXISTS (
+                SELECT 1 FROM lf_site s WHERE s.parcel_id = lf_parcel.parcel_id
+            )
+            AND NOT EXISTS (
+                SELECT 1 FROM lf_address a WHERE a.parcel_id = lf_parcel.parcel_id
+            )
+        """
+    )
+    logger.info(f"Pruned {cursor.rowcount} unreferenced parcel rows")
+
+    cursor.execute("DROP TABLE changed_road")
+    cursor.execute("DROP TABLE changed_parcel")
+    cursor.connection.commit()
+
+
+def relink_refetched_geocodes(cursor: sqlite3.Cursor):
+    """Link geocodes to the site of their address.
+
+    Geocodes keep the site IRI. Refetched addresses still hold it, while
+    carried-over addresses hold an integer site id that is mapped back to its
+    IRI, so geocodes imported this run for an unchanged address are linked too.
+    """
+    optimize_sqlite_for_bulk_inserts(cursor)
+
+    cursor.execute(
+        """
+        UPDATE lf_geocode_sp_survey_point
+        SET site_id = COALESCE(m.iri, a.site_id)
+        FROM lf_address a
+        LEFT JOIN lf_site_id_map m ON m.id = a.site_id
+        WHERE a.address_pid = lf_geocode_sp_survey_point.address_pid
+            AND lf_geocode_sp_survey_point.site_id IS NOT COALESCE(m.iri, a.site_id)
+        """
+    )
+    logger.info(f"Relinked {cursor.rowcount} geocode records to their site")
+    cursor.connection.commit()
+
+    restore_sqlite_settings(cursor)
+
+
+def populate_tables_incremental(cursor: sqlite3.Cursor, changed_since: datetime):
+    """Refresh the carried-over tables for addresses whose lifecycle changed.
+
+    Only addresses with a lifecycle stage that began or ended since
+    changed_since are extracted, together with the roads, parcels, sites and
+    place names they reference. Edits that do not touch an address lifecycle
+    are picked up by the next full rebuild.
+    """
+    start_time = time.time()
+
+    with create_http_client() as client:
+        addr_iris = get_changed_address_iris(client, changed_since)
+        logger.info(f"Found {len(addr_iris)} addresses changed since {changed_since}")
+
+        road_iris = get_iris_for_addresses(
+            client,
+            road.get_query_iris_only,
+            addr_iris,
+            ("road", "locality_code", "_road_name"),
+        )
+        site_iris = get_iris_for_addresses(
+            client, site.get_query_iris_only, addr_iris, ("parcel_id", "address")
+        )
+        place_name_iris = get_iris_for_addresses(
+            client,
+            place_name.get_query_iris_only,
+            addr_iris,
+            ("parcel_id", "addr_iri"),
+        )
+        address_iris = get_iris_for_addresses(
+            client,
+            address.get_query_iris_only,
+            addr_iris,
+            ("addr_iri", "parcel_id", "road", "locality_code", "_road_name"),
+        )
+        parcel_iris = sorted({iri["parcel_id"] for iri in site_iris})
+
+        # The carried-over tables come without indexes unless the database
+        # was cloned, and the deletes below rely on them.
+        create_road_indexes(cursor)
+        create_parcel_indexes(cursor)
+        create_site_indexes(cursor)
+        create_place_name_indexes(cursor)
+        create_address_indexes(cursor)
+        delete_changed_address_rows(cursor, addr_iris)
+
+        populate_locality_tables(client, cursor)
+        populate_road_tables(client, cursor, road_iris)
+        populate_parcel_tables(client, cursor, parcel_iris)
+        populate_site_tables(client, cursor, site_iris)
+        populate_place_name_tables(client, cursor, place_name_iris)
+        populate_address_tables(client, cursor, address_iris)
+        prune_addresses_without_pid_mapping(cursor)
+
+        replace_refetched_rows(cursor)
+        prune_unreferenced_rows(cursor)
+        relink_refetched_geocodes(cursor)
+
+    map_ids_to_integers(cursor)
+
+    logger.info(f"Time taken: {time.time() - start_time:.2f} seconds")
@@ -5,7 +5,7 @@ from jinja2 import Template
 from address_etl.pls.debug_parcels import DEBUG_PARCEL_IRIS
 
 
-def get_query_iris_only(debug: bool = False):
+def get_query_iris_only(debug: bool = False, addr_iris: list[str] | None = None):
     return Template(
         dedent(
             """
@@ -28,6 +28,14 @@ def get_query_iris_only(debug: bool = False):
             }
             {% endif %}
 
+            {% if addr_iris %}
+            VALUES ?addr_iri {
+                {% for addr_iri in addr_iris %}
+                <{{ addr_iri }}>
+                {% endfor %}
+            }
+            {% endif %}
+
             {
                 SELECT ?addr_iri (MAX(?_start_time) AS ?latest_start_time)
                 WHERE {
@@ -97,7 +105,39 @@ def get_query_iris_only(debug: bool = False):
         }
         """
         )
-    ).render(debug=debug, DEBUG_PARCEL_IRIS=DEBUG_PARCEL_IRIS)
+    ).render(debug=debug, DEBUG_PARCEL_IRIS=DEBUG_PARCEL_IRIS, addr_iris=addr_iris)
+
+
+def get_query_changed_iris(changed_since: str):
+    """Addresses with a lifecycle stage that began or ended at or after changed_since."""
+    return Template(
+        dedent(
+            """
+        PREFIX addr: <https://linked.data.gov.au/def/addr/>
+        PREFIX lc: <https://linked.data.gov.au/def/lifecycle/>
+        PREFIX time: <http://www.w3.org/2006/time#>
+        PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+
+        SELECT DISTINCT ?addr_iri
+        WHERE {
+            GRAPH <urn:qali:graph:addresses> {
+                ?addr_iri a addr:Address ;
+                    lc:hasLifecycleStage ?lifecycle_stage .
+
+                {
+                    ?lifecycle_stage time:hasBeginning/time:inXSDDateTime ?changed_time .
+                }
+                UNION
+                {
+                    ?lifecycle_stage time:hasEnd/time:inXSDDateTime ?changed_time .
+                }
+
+                FILTER(?changed_time >= "{{ changed_since }}"^^xsd:dateTime)
+            }
+        }
+        """
+        )
+    ).render(changed_since=changed_since)
 
 
 def get_query(iris: list = None):
@@ -5,7 +5,7 @@ from jinja2 import Template
 from address_etl.pls.debug_parcels import DEBUG_PARCEL_IRIS
 
 
-def get_query_iris_only(debug: bool = False):
+def get_query_iris_only(debug: bool = False, addr_iris: list[str] | None = None):
     return Template(
         dedent(
             """
@@ -23,6 +23,14 @@ def get_query_iris_only(debug: bool = False):
             }
             {% endif %}
 
+            {% if addr_iris %}
+            VALUES ?address {
+                {% for addr_iri in addr_iris %}
+                <{{ addr_iri }}>
+                {% endfor %}
+            }
+            {% endif %}
+
             GRAPH <urn:qali:graph:addresses> {
                 ?parcel_id a addr:AddressableObject ;
                            cn:hasName ?address .
@@ -32,7 +40,7 @@ def get_query_iris_only(debug: bool = False):
         }
         """
         )
-    ).render(debug=debug, DEBUG_PARCEL_IRIS=DEBUG_PARCEL_IRIS)
+    ).render(debug=debug, DEBUG_PARCEL_IRIS=DEBUG_PARCEL_IRIS, addr_iris=addr_iris)
 
 
 def get_query(iris: list = None):
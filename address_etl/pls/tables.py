@@ -1,13 +1,28 @@
 import logging
 import sqlite3
 import time
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from contextlib import ExitStack
+from datetime import date
+from typing import Any
 
 import httpx
 
 from address_etl.address_iri_pid_map import load_address_pid_mappings
-from address_etl.crud import sparql_query
+from address_etl.crud import create_http_client, sparql_query
+from address_etl.fingerprint import StageFingerprints, get_graph_fingerprint
+from address_etl.http_archive import pinned_value
 from address_etl.id_map import text_to_id_for_pk
+from address_etl.json_decode import iter_sparql_records
+from address_etl.pls.decode import (
+    address_row,
+    iter_decoded_batches,
+    parcel_row,
+    place_name_row,
+    road_row,
+    site_row,
+)
+from address_etl.pls.discovered import read_discovered_iris
 from address_etl.pls.queries import (
     address,
     local_auth,
@@ -17,7 +32,9 @@ from address_etl.pls.queries import (
     road,
     site,
 )
+from address_etl.run_stats import run_stats
 from address_etl.settings import settings
+from address_etl.sqlite_build import attach_read_only, set_page_size
 from address_etl.tables import (
     create_address_iri_pid_map_table,
     create_geocode_type_code_table,
@@ -28,18 +45,67 @@ logger = logging.getLogger(__name__)
 
 BATCH_SIZE = 2000
 
+# Named graphs read by the road stage, which only fetches new roads when they
+# are unchanged.
+ROAD_GRAPHS = ["urn:qali:graph:geographical-names", "urn:qali:graph:roads"]
+
+# Tables that are rebuilt from source on every run. All other tables are
+# carried over from the previous ETL's database.
+REBUILT_TABLES = (
+    "metadata",
+    "local_auth",
+    "local_auth_loaded",
+    "locality",
+    "locality_loaded",
+    "lf_road",
+    "lf_road_loaded",
+    "lf_parcel",
+    "lf_parcel_loaded",
+    "lf_site",
+    "lf_site_loaded",
+    "lf_place_name",
+    "lf_place_name_loaded",
+    "lf_geocode_sp_survey_point_loaded",
+    "lf_address",
+    "lf_address_loaded",
+)
+
+# Tables carried over from the previous ETL's database.
+CARRIED_OVER_TABLES = (
+    "geocode_type_code",
+    "address_iri_pid_map",
+    "lf_road_id_map",
+    "lf_parcel_id_map",
+    "lf_site_id_map",
+    "lf_place_name_id_map",
+    "lf_address_id_map",
+    "lf_geocode_sp_survey_point",
+)
+
+# Rebuilt tables that incremental runs carry over from the previous ETL's
+# database and only refresh for addresses whose lifecycle changed.
+INCREMENTAL_CARRIED_OVER_TABLES = (
+    "lf_road",
+    "lf_parcel",
+    "lf_site",
+    "lf_place_name",
+    "lf_address",
+)
+
 
 def create_id_map_table(table_name: str, cursor: sqlite3.Cursor):
     logger.info(f"Creating {table_name} table")
     cursor.execute(
         f"""
-        CREATE TABLE {table_name} (
+        CREATE TABLE IF NOT EXISTS {table_name} (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             iri TEXT UNIQUE
         )
     """
     )
-    cursor.execute(f"CREATE INDEX idx_{table_name}_iri ON {table_name} (iri)")
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{table_name}_iri ON {table_name} (iri)"
+    )
 
 
 def create_locality_tables(cursor: sqlite3.Cursor):
@@ -90,14 +156,16 @@ def create_locality_tables(cursor: sqlite3.Cursor):
         """
     )
 
-    cursor.execute("CREATE INDEX idx_locality_la_code ON locality (la_code)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_locality_la_code ON locality (la_code)"
+    )
 
 
 def create_road_tables(cursor: sqlite3.Cursor):
     logger.info("Creating lf_road table")
     cursor.execute(
         """
-        CREATE TABLE lf_road (
+        CREATE TABLE IF NOT EXISTS lf_road (
             road_id TEXT PRIMARY KEY,
             road_cat TEXT CHECK (length(road_cat) <=20),
             road_name TEXT CHECK (length(road_name) <=50) NOT NULL,
@@ -127,7 +195,9 @@ def create_road_tables(cursor: sqlite3.Cursor):
 def create_road_indexes(cursor: sqlite3.Cursor):
     """Create indexes for road table after data insertion"""
     logger.info("Creating road table indexes")
-    cursor.execute("CREATE INDEX idx_lf_road_locality_code ON lf_road (locality_code)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_lf_road_locality_code ON lf_road (locality_code)"
+    )
     cursor.connection.commit()
 
 
@@ -135,7 +205,7 @@ def create_parcel_tables(cursor: sqlite3.Cursor):
     logger.info("Creating lf_parcel table")
     cursor.execute(
         """
-        CREATE TABLE lf_parcel (
+        CREATE TABLE IF NOT EXISTS lf_parcel (
             parcel_id TEXT PRIMARY KEY,
             plan_no TEXT CHECK (length(plan_no) <= 10),
             lot_no TEXT CHECK (length(lot_no) <= 5),
@@ -160,7 +230,9 @@ def create_parcel_tables(cursor: sqlite3.Cursor):
 def create_parcel_indexes(cursor: sqlite3.Cursor):
     """Create indexes for parcel table after data insertion"""
     logger.info("Creating parcel table indexes")
-    cursor.execute("CREATE INDEX idx_lf_parcel_plan_lot ON lf_parcel(plan_no, lot_no)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_lf_parcel_plan_lot ON lf_parcel(plan_no, lot_no)"
+    )
     cursor.connection.commit()
 
 
@@ -168,7 +240,7 @@ def create_site_tables(cursor: sqlite3.Cursor):
     logger.info("Creating lf_site table")
     cursor.execute(
         """
-        CREATE TABLE lf_site (
+        CREATE TABLE IF NOT EXISTS lf_site (
             site_id TEXT PRIMARY KEY,
             parent_site_id TEXT,
             site_type TEXT CHECK (length(site_type) <= 50) NOT NULL,
@@ -196,9 +268,11 @@ def create_site_tables(cursor: sqlite3.Cursor):
 def create_site_indexes(cursor: sqlite3.Cursor):
     """Create indexes for site table after data insertion"""
     logger.info("Creating site table indexes")
-    cursor.execute("CREATE INDEX idx_lf_site_parcel_id ON lf_site (parcel_id)")
     cursor.execute(
-        "CREATE INDEX idx_lf_site_parent_site_id ON lf_site (parent_site_id)"
+        "CREATE INDEX IF NOT EXISTS idx_lf_site_parcel_id ON lf_site (parcel_id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_lf_site_parent_site_id ON lf_site (parent_site_id)"
     )
     cursor.connection.commit()
 
@@ -207,7 +281,7 @@ def create_place_name_tables(cursor: sqlite3.Cursor):
     logger.info("Creating lf_place_name table")
     cursor.execute(
         """
-        CREATE TABLE lf_place_name (
+        CREATE TABLE IF NOT EXISTS lf_place_name (
             place_name_id TEXT PRIMARY KEY,
             pl_name_status_code TEXT CHECK (length(pl_name_status_code) = 1) NOT NULL,
             pl_name_type_code TEXT CHECK (length(pl_name_type_code) <= 4) NOT NULL,
@@ -235,7 +309,9 @@ def create_place_name_tables(cursor: sqlite3.Cursor):
 def create_place_name_indexes(cursor: sqlite3.Cursor):
     """Create indexes for place name table after data insertion"""
     logger.info("Creating place name table indexes")
-    cursor.execute("CREATE INDEX idx_lf_place_name_site_id ON lf_place_name (site_id)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_lf_place_name_site_id ON lf_place_name (site_id)"
+    )
     cursor.connection.commit()
 
 
@@ -243,7 +319,7 @@ def create_geocode_tables(cursor: sqlite3.Cursor):
     logger.info("Creating lf_geocode_sp_survey_point table")
     cursor.execute(
         """
-        CREATE TABLE lf_geocode_sp_survey_point (
+        CREATE TABLE IF NOT EXISTS lf_geocode_sp_survey_point (
             geocode_id TEXT PRIMARY KEY,
             geocode_type TEXT CHECK (length(geocode_type) <= 4) NOT NULL,
             address_pid TEXT NOT NULL,
@@ -270,10 +346,10 @@ def create_geocode_indexes(cursor: sqlite3.Cursor):
     """Create indexes for geocode table after data insertion"""
     logger.info("Creating geocode table indexes")
     cursor.execute(
-        "CREATE INDEX idx_lf_geocode_sp_survey_point_address_pid ON lf_geocode_sp_survey_point (address_pid)"
+        "CREATE INDEX IF NOT EXISTS idx_lf_geocode_sp_survey_point_address_pid ON lf_geocode_sp_survey_point (address_pid)"
     )
     cursor.execute(
-        "CREATE INDEX idx_lf_geocode_sp_survey_point_site_id ON lf_geocode_sp_survey_point (site_id)"
+        "CREATE INDEX IF NOT EXISTS idx_lf_geocode_sp_survey_point_site_id ON lf_geocode_sp_survey_point (site_id)"
     )
     cursor.connection.commit()
 
@@ -282,7 +358,7 @@ def create_address_tables(cursor: sqlite3.Cursor):
     logger.info("Creating address table")
     cursor.execute(
         """
-        CREATE TABLE lf_address (
+        CREATE TABLE IF NOT EXISTS lf_address (
             addr_id TEXT PRIMARY KEY,
             address_pid TEXT NOT NULL,
             parcel_id TEXT NOT NULL,
@@ -326,15 +402,40 @@ def create_address_indexes(cursor: sqlite3.Cursor):
     """Create indexes for address table after data insertion"""
     logger.info("Creating address table indexes")
     cursor.execute(
-        "CREATE INDEX idx_lf_address_address_pid ON lf_address (address_pid)"
+        "CREATE INDEX IF NOT EXISTS idx_lf_address_address_pid ON lf_address (address_pid)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_lf_address_parcel_id ON lf_address (parcel_id)"
     )
-    cursor.execute("CREATE INDEX idx_lf_address_parcel_id ON lf_address (parcel_id)")
-    cursor.execute("CREATE INDEX idx_lf_address_road_id ON lf_address (road_id)")
-    cursor.execute("CREATE INDEX idx_lf_address_site_id ON lf_address (site_id)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_lf_address_road_id ON lf_address (road_id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_lf_address_site_id ON lf_address (site_id)"
+    )
+    cursor.connection.commit()
+
+
+def reset_rebuilt_tables(cursor: sqlite3.Cursor, keep: Iterable[str] = ()):
+    """Drop and recreate the tables that are repopulated on every run.
+
+    Used when the database starts as a copy of the previous ETL's database.
+    The id map, geocode and cache tables are kept, and created if the previous
+    database predates them. Rebuilt tables named in keep are left as they are.
+    """
+    keep = set(keep)
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    for table_name in REBUILT_TABLES:
+        if table_name in keep:
+            continue
+        logger.info(f"Dropping {table_name} table")
+        cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
     cursor.connection.commit()
+    create_tables(cursor)
 
 
 def create_tables(cursor: sqlite3.Cursor):
+    set_page_size(cursor)
     cursor.execute("PRAGMA foreign_keys = ON")
     create_metadata_table(cursor)
     create_geocode_type_code_table(cursor)
@@ -349,6 +450,7 @@ def create_tables(cursor: sqlite3.Cursor):
     cursor.connection.commit()
 
 
+@run_stats.record_stage("locality")
 def populate_locality_tables(client: httpx.Client, cursor: sqlite3.Cursor):
     start_time = time.time()
     logger.info("Fetching locality data")
@@ -358,39 +460,37 @@ def populate_locality_tables(client: httpx.Client, cursor: sqlite3.Cursor):
     query = local_auth.get_query()
     response = sparql_query(settings.sparql_endpoint, query, client)
 
-    rows = response.json()["results"]["bindings"]
-    logger.info(f"Found {len(rows)} local_auth rows")
-
-    insert_data = [(row["la_code"]["value"], row["lga_name"]["value"]) for row in rows]
+    rows = iter_sparql_records(response.content)
+    insert_data = ((row["la_code"], row["lga_name"]) for row in rows)
 
     cursor.executemany(
         "INSERT INTO local_auth (la_code, la_name) VALUES (?, ?)", insert_data
     )
+    logger.info(f"Inserted {cursor.rowcount} local_auth rows")
     cursor.connection.commit()
 
     # locality table
     query = locality.get_query()
     response = sparql_query(settings.sparql_endpoint, query, client)
 
-    rows = response.json()["results"]["bindings"]
-    logger.info(f"Found {len(rows)} locality rows")
-
-    insert_data = [
+    rows = iter_sparql_records(response.content)
+    insert_data = (
         (
-            row["locality_code"]["value"],
-            row["locality_name"]["value"],
-            row["locality_type"]["value"],
-            row["la_code"]["value"],
-            row["state"]["value"],
-            row["status"]["value"],
+            row["locality_code"],
+            row["locality_name"],
+            row["locality_type"],
+            row["la_code"],
+            row["state"],
+            row["status"],
         )
         for row in rows
-    ]
+    )
 
     cursor.executemany(
         "INSERT INTO locality (locality_code, locality_name, locality_type, la_code, state, status) VALUES (?, ?, ?, ?, ?, ?)",
         insert_data,
     )
+    logger.info(f"Inserted {cursor.rowcount} locality rows")
     cursor.connection.commit()
 
     restore_sqlite_settings(cursor)
@@ -398,89 +498,155 @@ def populate_locality_tables(client: httpx.Client, cursor: sqlite3.Cursor):
     logger.info(f"Time taken: {time.time() - start_time:.2f} seconds")
 
 
-def populate_road_tables(client: httpx.Client, cursor: sqlite3.Cursor):
+@run_stats.record_stage("road")
+def populate_road_tables(
+    client: httpx.Client,
+    cursor: sqlite3.Cursor,
+    iris: list | None = None,
+    reuse_previous: bool = False,
+):
     start_time = time.time()
     logger.info("Fetching road data")
     optimize_sqlite_for_bulk_inserts(cursor)
 
-    query = road.get_query_iris_only(debug=settings.debug)
-    response = sparql_query(settings.sparql_endpoint, query, client)
-
-    iris = [
-        {
-            "road": row["road"]["value"],
-            "locality_code": row["locality_code"]["value"],
-            "_road_name": row["_road_name"]["value"],
-        }
-        for row in response.json()["results"]["bindings"]
-    ]
-    total_iris = len(iris)
-    logger.info(f"Found {total_iris} road ids")
-
-    processed_count = 0
-    seen_road_ids = set()
-    optimized_batch_size = 10000
-
-    for i in range(0, total_iris, optimized_batch_size):
-        batch_iris = iris[i : i + optimized_batch_size]
-        batch_size = len(batch_iris)
-
-        try:
-            query = road.get_query(iris=batch_iris)
+    with ExitStack() as stack:
+        if iris is None:
+            query = road.get_query_iris_only(debug=settings.debug)
             response = sparql_query(settings.sparql_endpoint, query, client)
-            rows = response.json()["results"]["bindings"]
-
-            insert_data = []
-            for row in rows:
-                if row["road_id"]["value"] not in seen_road_ids:
-                    seen_road_ids.add(row["road_id"]["value"])
-                    insert_data.append(
-                        (
-                            row["road_id"]["value"],
-                            row["road_name"]["value"],
-                            row.get("road_name_suffix", {}).get("value"),
-                            row.get("road_name_type", {}).get("value"),
-                            row["locality_code"]["value"],
-                            row["road_cat_desc"]["value"],
-                        )
-                    )
 
-            if insert_data:
+            iris = stack.enter_context(
+                read_discovered_iris(response, ("road", "locality_code", "_road_name"))
+            )
+
+        if reuse_previous:
+            iris = reuse_previous_rows(
+                cursor, "lf_road", "road_id", "lf_road_id_map", iris, key=road_key
+            )
+
+        total_iris = len(iris)
+        logger.info(f"Found {total_iris} road ids")
+
+        processed_count = 0
+        optimized_batch_size = 10000
+
+        batches = iter_decoded_batches(
+            client, iris, optimized_batch_size, road.get_query, road_row
+        )
+        for batch_number, batch_iris, insert_data in batches:
+            try:
+                # The same road is returned for every name variant and locality
+                # key it is discovered under, so keep the first row per road_id.
                 cursor.executemany(
-                    "INSERT INTO lf_road (road_id, road_name, road_name_suffix, road_name_type, locality_code, road_cat_desc) VALUES (?, ?, ?, ?, ?, ?)",
+                    "INSERT INTO lf_road (road_id, road_name, road_name_suffix, road_name_type, locality_code, road_cat_desc) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (road_id) DO NOTHING",
                     insert_data,
                 )
 
-            if (
-                i // optimized_batch_size + 1
-            ) % 5 == 0 or i + optimized_batch_size >= total_iris:
-                cursor.connection.commit()
+                if (
+                    batch_number % 5 == 0
+                    or batch_number * optimized_batch_size >= total_iris
+                ):
+                    cursor.connection.commit()
 
-            processed_count += batch_size
-            logger.info(
-                f"Processed {processed_count} of {total_iris} roads (batch {i // optimized_batch_size + 1})"
-            )
+                processed_count += len(batch_iris)
+                logger.info(
+                    f"Processed {processed_count} of {total_iris} roads (batch {batch_number})"
+                )
 
-        except Exception as e:
-            logger.error(
-                f"Failed to process batch {i // optimized_batch_size + 1}: {e}"
-            )
-            raise
+            except Exception as e:
+                logger.error(f"Failed to process batch {batch_number}: {e}")
+                raise
 
     restore_sqlite_settings(cursor)
 
     logger.info(f"Time taken: {time.time() - start_time:.2f} seconds")
 
 
+def road_key(iri: dict[str, str]) -> str:
+    """The road_id the road query builds for a discovered road."""
+    return f"{iri['road']}/{iri['locality_code']}/{iri['_road_name'].upper()}"
+
+
+def reuse_previous_rows(
+    cursor: sqlite3.Cursor,
+    table_name: str,
+    id_column: str,
+    map_table_name: str,
+    iris: Sequence,
+    key: Callable[[Any], str] | None = None,
+) -> list:
+    """Copy rows for IRIs already in the previous ETL's database.
+
+    Expects the previous database attached as previous. iris holds the
+    discovered IRIs, or the discovered rows that key maps to the IRI the table
+    is keyed by. Reused rows are inserted with their IRI, like freshly fetched
+    rows, so they are mapped back to the same id later. A rotating slice of the
+    known rows is left out and fetched again to pick up drift, so every row is
+    refreshed at least once every pls_reuse_drift_sample_days runs.
+
+    Returns the items of iris that still need to be fetched, in their original
+    order.
+    """
+    cursor.execute("DROP TABLE IF EXISTS temp.discovered_iri")
+    cursor.execute(
+        """
+        CREATE TEMP TABLE discovered_iri (
+            iri TEXT PRIMARY KEY,
+            position INTEGER NOT NULL
+        )
+        """
+    )
+    cursor.executemany(
+        "INSERT OR IGNORE INTO discovered_iri (iri, position) VALUES (?, ?)",
+        (
+            (iri if key is None else key(iri), position)
+            for position, iri in enumerate(iris)
+        ),
+    )
+
+    cursor.execute(f"PRAGMA main.table_info({table_name})")
+    columns = [row["name"] for row in cursor.fetchall() if row["name"] != id_column]
+    sample_days = settings.pls_reuse_drift_sample_days
+    today = date.fromisoformat(pinned_value("drift_sample_date", str(date.today())))
+    sample_slot = today.toordinal() % sample_days
+    cursor.execute(
+        f"""
+        INSERT INTO main.{table_name} ({id_column}, {", ".join(columns)})
+        SELECT d.iri, {", ".join(f"p.{column}" for column in columns)}
+        FROM temp.discovered_iri d
+        JOIN main.{map_table_name} m ON m.iri = d.iri
+        JOIN previous.{table_name} p ON p.{id_column} = m.id
+        WHERE m.id % ? != ?
+        """,
+        (sample_days, sample_slot),
+    )
+    logger.info(f"Reused {cursor.rowcount} of {len(iris)} {table_name} rows")
+    cursor.connection.commit()
+
+    cursor.execute(
+        f"""
+        SELECT d.position
+        FROM temp.discovered_iri d
+        WHERE NOT EXISTS (
+            SELECT 1 FROM main.{table_name} t WHERE t.{id_column} = d.iri
+        )
+        ORDER BY d.position
+        """
+    )
+    positions = [row["position"] for row in cursor.fetchall()]
+    cursor.execute("DROP TABLE temp.discovered_iri")
+    return [iris[position] for position in positions]
+
+
 def optimize_sqlite_for_bulk_inserts(cursor: sqlite3.Cursor):
     """Optimize SQLite settings for bulk insert operations"""
     cursor.execute("PRAGMA foreign_keys = OFF")
-    cursor.execute("PRAGMA journal_mode = WAL")
-    cursor.execute("PRAGMA synchronous = NORMAL")
+    if not settings.pls_sqlite_fast_build:
+        # The fast build database already runs without a journal.
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
     cursor.execute("PRAGMA cache_size = -128000")  # 128MB cache for 16GB memory
     cursor.execute("PRAGMA temp_store = MEMORY")
     cursor.execute("PRAGMA mmap_size = 536870912")  # 512MB memory mapping
-    cursor.execute("PRAGMA page_size = 65536")  # Larger page size for better I/O
     cursor.execute(
         "PRAGMA auto_vacuum = NONE"
     )  # Disable auto-vacuum during bulk operations
@@ -494,324 +660,264 @@ def restore_sqlite_settings(cursor: sqlite3.Cursor):
     cursor.connection.commit()
 
 
-def populate_parcel_tables(client: httpx.Client, cursor: sqlite3.Cursor):
+@run_stats.record_stage("parcel")
+def populate_parcel_tables(
+    client: httpx.Client,
+    cursor: sqlite3.Cursor,
+    iris: list | None = None,
+    reuse_previous: bool = False,
+):
     start_time = time.time()
     logger.info("Fetching parcel data")
     optimize_sqlite_for_bulk_inserts(cursor)
 
-    query = parcel.get_query_iris_only(debug=settings.debug)
-    response = sparql_query(settings.sparql_endpoint, query, client)
+    with ExitStack() as stack:
+        if iris is None:
+            query = parcel.get_query_iris_only(debug=settings.debug)
+            response = sparql_query(settings.sparql_endpoint, query, client)
 
-    iris = [row["parcel_id"]["value"] for row in response.json()["results"]["bindings"]]
-    total_iris = len(iris)
-    logger.info(f"Found {total_iris} parcel iris rows")
+            iris = stack.enter_context(read_discovered_iris(response, ("parcel_id",)))
 
-    processed_count = 0
-    optimized_batch_size = 10000
+        if reuse_previous:
+            iris = reuse_previous_rows(
+                cursor, "lf_parcel", "parcel_id", "lf_parcel_id_map", iris
+            )
 
-    for i in range(0, total_iris, optimized_batch_size):
-        batch_iris = iris[i : i + optimized_batch_size]
-        batch_size = len(batch_iris)
+        total_iris = len(iris)
+        logger.info(f"Found {total_iris} parcel iris rows")
 
-        try:
-            query = parcel.get_query(iris=batch_iris)
-            response = sparql_query(settings.sparql_endpoint, query, client)
-            rows = response.json()["results"]["bindings"]
+        processed_count = 0
+        optimized_batch_size = 10000
 
-            insert_data = [
-                (
-                    row["parcel_id"]["value"],
-                    row["plan_no"]["value"],
-                    row["lot_no"]["value"],
+        batches = iter_decoded_batches(
+            client, iris, optimized_batch_size, parcel.get_query, parcel_row
+        )
+        for batch_number, batch_iris, insert_data in batches:
+            try:
+                cursor.executemany(
+                    "INSERT INTO lf_parcel (parcel_id, plan_no, lot_no) VALUES (?, ?, ?)",
+                    insert_data,
                 )
-                for row in rows
-            ]
-
-            cursor.executemany(
-                "INSERT INTO lf_parcel (parcel_id, plan_no, lot_no) VALUES (?, ?, ?)",
-                insert_data,
-            )
 
-            if (
-                i // optimized_batch_size + 1
-            ) % 5 == 0 or i + optimized_batch_size >= total_iris:
-                cursor.connection.commit()
+                if (
+                    batch_number % 5 == 0
+                    or batch_number * optimized_batch_size >= total_iris
+                ):
+                    cursor.connection.commit()
 
-            processed_count += batch_size
-            logger.info(
-                f"Processed {processed_count} of {total_iris} parcels (batch {i // optimized_batch_size + 1})"
-            )
+                processed_count += len(batch_iris)
+                logger.info(
+                    f"Processed {processed_count} of {total_iris} parcels (batch {batch_number})"
+                )
 
-        except Exception as e:
-            logger.error(
-                f"Failed to process batch {i // optimized_batch_size + 1}: {e}"
-            )
-            raise
+            except Exception as e:
+                logger.error(f"Failed to process batch {batch_number}: {e}")
+                raise
 
     restore_sqlite_settings(cursor)
 
     logger.info(f"Time taken: {time.time() - start_time:.2f} seconds")
 
 
-def populate_site_tables(client: httpx.Client, cursor: sqlite3.Cursor):
+@run_stats.record_stage("site")
+def populate_site_tables(
+    client: httpx.Client, cursor: sqlite3.Cursor, iris: list | None = None
+):
     start_time = time.time()
     logger.info("Fetching site data")
     optimize_sqlite_for_bulk_inserts(cursor)
 
-    query = site.get_query_iris_only(debug=settings.debug)
-    response = sparql_query(settings.sparql_endpoint, query, client)
-
-    iris = [
-        {
-            "parcel_id": row["parcel_id"]["value"],
-            "address": row["address"]["value"],
-        }
-        for row in response.json()["results"]["bindings"]
-    ]
-    total_iris = len(iris)
-    logger.info(f"Found {total_iris} site ids")
-
-    processed_count = 0
-    optimized_batch_size = 10000
-
-    for i in range(0, total_iris, optimized_batch_size):
-        batch_iris = iris[i : i + optimized_batch_size]
-        batch_size = len(batch_iris)
-
-        try:
-            query = site.get_query(iris=batch_iris)
+    with ExitStack() as stack:
+        if iris is None:
+            query = site.get_query_iris_only(debug=settings.debug)
             response = sparql_query(settings.sparql_endpoint, query, client)
 
-            rows = response.json()["results"]["bindings"]
+            iris = stack.enter_context(
+                read_discovered_iris(response, ("parcel_id", "address"))
+            )
 
-            insert_data = [
-                (
-                    row["site_id"]["value"],
-                    row.get("parent_site_id", {}).get("value"),
-                    row["site_type"]["value"],
-                    row["parcel_id"]["value"],
-                )
-                for row in rows
-            ]
+        total_iris = len(iris)
+        logger.info(f"Found {total_iris} site ids")
 
-            cursor.executemany(
-                "INSERT INTO lf_site (site_id, parent_site_id, site_type, parcel_id) VALUES (?, ?, ?, ?)",
-                insert_data,
-            )
+        processed_count = 0
+        optimized_batch_size = 10000
 
-            if (
-                i // optimized_batch_size + 1
-            ) % 5 == 0 or i + optimized_batch_size >= total_iris:
-                cursor.connection.commit()
+        batches = iter_decoded_batches(
+            client, iris, optimized_batch_size, site.get_query, site_row
+        )
+        for batch_number, batch_iris, insert_data in batches:
+            try:
+                cursor.executemany(
+                    "INSERT INTO lf_site (site_id, parent_site_id, site_type, parcel_id) VALUES (?, ?, ?, ?)",
+                    insert_data,
+                )
 
-            processed_count += batch_size
-            logger.info(
-                f"Processed {processed_count} of {total_iris} sites (batch {i // optimized_batch_size + 1})"
-            )
+                if (
+                    batch_number % 5 == 0
+                    or batch_number * optimized_batch_size >= total_iris
+                ):
+                    cursor.connection.commit()
 
-        except Exception as e:
-            logger.error(
-                f"Failed to process batch {i // optimized_batch_size + 1}: {e}"
-            )
-            raise
+                processed_count += len(batch_iris)
+                logger.info(
+                    f"Processed {processed_count} of {total_iris} sites (batch {batch_number})"
+                )
+
+            except Exception as e:
+                logger.error(f"Failed to process batch {batch_number}: {e}")
+                raise
 
     restore_sqlite_settings(cursor)
 
     logger.info(f"Time taken: {time.time() - start_time:.2f} seconds")
 
 
-def populate_place_name_tables(client: httpx.Client, cursor: sqlite3.Cursor):
+@run_stats.record_stage("place_name")
+def populate_place_name_tables(
+    client: httpx.Client, cursor: sqlite3.Cursor, iris: list | None = None
+):
     start_time = time.time()
     logger.info("Fetching place name data")
 
     optimize_sqlite_for_bulk_inserts(cursor)
 
-    query = place_name.get_query_iris_only(debug=settings.debug)
-    response = sparql_query(settings.sparql_endpoint, query, client)
-
-    iris = [
-        {
-            "parcel_id": row["parcel_id"]["value"],
-            "addr_iri": row["addr_iri"]["value"],
-        }
-        for row in response.json()["results"]["bindings"]
-    ]
-    total_iris = len(iris)
-    logger.info(f"Found {total_iris} place name ids")
-
-    processed_count = 0
-    optimized_batch_size = 10000
-
-    for i in range(0, total_iris, optimized_batch_size):
-        batch_iris = iris[i : i + optimized_batch_size]
-        batch_size = len(batch_iris)
-
-        try:
-            query = place_name.get_query(iris=batch_iris)
+    with ExitStack() as stack:
+        if iris is None:
+            query = place_name.get_query_iris_only(debug=settings.debug)
             response = sparql_query(settings.sparql_endpoint, query, client)
 
-            rows = response.json()["results"]["bindings"]
+            iris = stack.enter_context(
+                read_discovered_iris(response, ("parcel_id", "addr_iri"))
+            )
 
-            insert_data = [
-                (
-                    row["place_name_id"]["value"],
-                    row["pl_name_status_code"]["value"],
-                    row["pl_name_type_code"]["value"],
-                    row["pl_name"]["value"],
-                    row["site_id"]["value"],
-                )
-                for row in rows
-            ]
+        total_iris = len(iris)
+        logger.info(f"Found {total_iris} place name ids")
 
-            cursor.executemany(
-                "INSERT INTO lf_place_name (place_name_id, pl_name_status_code, pl_name_type_code, pl_name, site_id) VALUES (?, ?, ?, ?, ?)",
-                insert_data,
-            )
+        processed_count = 0
+        optimized_batch_size = 10000
 
-            if (
-                i // optimized_batch_size + 1
-            ) % 5 == 0 or i + optimized_batch_size >= total_iris:
-                cursor.connection.commit()
+        batches = iter_decoded_batches(
+            client, iris, optimized_batch_size, place_name.get_query, place_name_row
+        )
+        for batch_number, batch_iris, insert_data in batches:
+            try:
+                cursor.executemany(
+                    "INSERT INTO lf_place_name (place_name_id, pl_name_status_code, pl_name_type_code, pl_name, site_id) VALUES (?, ?, ?, ?, ?)",
+                    insert_data,
+                )
 
-            processed_count += batch_size
-            logger.info(
-                f"Processed {processed_count} of {total_iris} place names (batch {i // optimized_batch_size + 1})"
-            )
+                if (
+                    batch_number % 5 == 0
+                    or batch_number * optimized_batch_size >= total_iris
+                ):
+                    cursor.connection.commit()
 
-        except Exception as e:
-            logger.error(
-                f"Failed to process batch {i // optimized_batch_size + 1}: {e}"
-            )
-            raise
+                processed_count += len(batch_iris)
+                logger.info(
+                    f"Processed {processed_count} of {total_iris} place names (batch {batch_number})"
+                )
+
+            except Exception as e:
+                logger.error(f"Failed to process batch {batch_number}: {e}")
+                raise
 
     restore_sqlite_settings(cursor)
 
     logger.info(f"Time taken: {time.time() - start_time:.2f} seconds")
 
 
-def populate_address_tables(client: httpx.Client, cursor: sqlite3.Cursor):
+@run_stats.record_stage("address")
+def populate_address_tables(
+    client: httpx.Client, cursor: sqlite3.Cursor, iris: list | None = None
+):
     start_time = time.time()
     logger.info("Populating address table")
 
     optimize_sqlite_for_bulk_inserts(cursor)
 
-    query = address.get_query_iris_only(debug=settings.debug)
-    response = sparql_query(settings.sparql_endpoint, query, client)
-
-    iris = [
-        {
-            "addr_iri": row["addr_iri"]["value"],
-            "parcel_id": row["parcel_id"]["value"],
-            "road": row["road"]["value"],
-            "locality_code": row["locality_code"]["value"],
-            "_road_name": row["_road_name"]["value"],
-        }
-        for row in response.json()["results"]["bindings"]
-    ]
-    total_iris = len(iris)
-    logger.info(f"Found {total_iris} address ids")
-
-    processed_count = 0
-    optimized_batch_size = 5000
-
-    for i in range(0, total_iris, optimized_batch_size):
-        batch_iris = iris[i : i + optimized_batch_size]
-        batch_size = len(batch_iris)
-
-        try:
-            query = address.get_query(iris=batch_iris)
+    with ExitStack() as stack:
+        if iris is None:
+            query = address.get_query_iris_only(debug=settings.debug)
             response = sparql_query(settings.sparql_endpoint, query, client)
 
-            rows = response.json()["results"]["bindings"]
-            address_pid_lookup = load_address_pid_mappings_for_rows(rows, cursor)
-            insert_data, missing_iris = build_address_insert_data(
-                rows, address_pid_lookup
+            iris = stack.enter_context(
+                read_discovered_iris(
+                    response,
+                    (
+                        "addr_iri",
+                        "parcel_id",
+                        "road",
+                        "locality_code",
+                        "_road_name",
+                    ),
+                )
             )
 
-            cursor.executemany(
-                "INSERT INTO lf_address (addr_id, address_pid, parcel_id, addr_status_code, unit_type, unit_no, unit_suffix, level_type, level_no, level_suffix, street_no_first, street_no_first_suffix, street_no_last, street_no_last_suffix, road_id, site_id, location_desc, address_standard) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                insert_data,
-            )
+        total_iris = len(iris)
+        logger.info(f"Found {total_iris} address ids")
 
-            if (
-                i // optimized_batch_size + 1
-            ) % 5 == 0 or i + optimized_batch_size >= total_iris:
-                cursor.connection.commit()
+        processed_count = 0
+        optimized_batch_size = 5000
 
-            processed_count += batch_size
-            logger.info(
-                f"Processed {processed_count} of {total_iris} addresses (batch {i // optimized_batch_size + 1})"
-            )
-            if missing_iris:
-                logger.warning(
-                    "Skipped %s addresses in batch %s because no address PID mapping was found. Sample IRIs: %s",
-                    len(missing_iris),
-                    i // optimized_batch_size + 1,
-                    ", ".join(missing_iris[:5]),
+        batches = iter_decoded_batches(
+            client, iris, optimized_batch_size, address.get_query, address_row
+        )
+        for batch_number, batch_iris, rows in batches:
+            try:
+                address_pid_lookup = load_address_pid_mappings(
+                    cursor, sorted({iri["addr_iri"] for iri in batch_iris})
+                )
+                missing_iris: list[str] = []
+                insert_data = attach_address_pids(
+                    rows, address_pid_lookup, missing_iris
                 )
 
-        except Exception as e:
-            logger.error(
-                f"Failed to process batch {i // optimized_batch_size + 1}: {e}"
-            )
-            raise
+                cursor.executemany(
+                    "INSERT INTO lf_address (addr_id, address_pid, parcel_id, addr_status_code, unit_type, unit_no, unit_suffix, level_type, level_no, level_suffix, street_no_first, street_no_first_suffix, street_no_last, street_no_last_suffix, road_id, site_id, location_desc, address_standard) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    insert_data,
+                )
 
-    restore_sqlite_settings(cursor)
+                if (
+                    batch_number % 5 == 0
+                    or batch_number * optimized_batch_size >= total_iris
+                ):
+                    cursor.connection.commit()
 
-    logger.info(f"Time taken: {time.time() - start_time:.2f} seconds")
+                processed_count += len(batch_iris)
+                logger.info(
+                    f"Processed {processed_count} of {total_iris} addresses (batch {batch_number})"
+                )
+                if missing_iris:
+                    logger.warning(
+                        "Skipped %s addresses in batch %s because no address PID mapping was found. Sample IRIs: %s",
+                        len(missing_iris),
+                        batch_number,
+                        ", ".join(missing_iris[:5]),
+                    )
 
+            except Exception as e:
+                logger.error(f"Failed to process batch {batch_number}: {e}")
+                raise
 
-def load_address_pid_mappings_for_rows(
-    rows: list[dict[str, dict[str, str]]], cursor: sqlite3.Cursor
-) -> dict[str, str]:
-    address_iris = sorted(
-        {
-            row["addr_iri"]["value"]
-            for row in rows
-            if row.get("addr_iri", {}).get("value")
-        }
-    )
-    return load_address_pid_mappings(cursor, address_iris)
+    restore_sqlite_settings(cursor)
 
+    logger.info(f"Time taken: {time.time() - start_time:.2f} seconds")
 
-def build_address_insert_data(
-    rows: Iterable[dict[str, dict[str, str]]],
-    address_pid_lookup: dict[str, str],
-) -> tuple[list[tuple[str | None, ...]], list[str]]:
-    insert_data: list[tuple[str | None, ...]] = []
-    missing_iris: list[str] = []
 
+def attach_address_pids(
+    rows: Iterable[tuple[str | None, ...]],
+    address_pid_lookup: dict[str, str],
+    missing_iris: list[str],
+) -> Iterator[tuple[str | None, ...]]:
+    """Replace the address IRI of decoded lf_address rows with its PID."""
     for row in rows:
-        addr_iri = row["addr_iri"]["value"]
+        addr_iri = row[1]
         address_pid = address_pid_lookup.get(addr_iri)
         if address_pid is None:
             missing_iris.append(addr_iri)
             continue
 
-        insert_data.append(
-            (
-                row["addr_id"]["value"],
-                address_pid,
-                row["parcel_id"]["value"],
-                row["addr_status_code"]["value"],
-                row.get("unit_type", {}).get("value"),
-                row.get("unit_no", {}).get("value"),
-                row.get("unit_suffix", {}).get("value"),
-                row.get("level_type", {}).get("value"),
-                row.get("level_no", {}).get("value"),
-                row.get("level_suffix", {}).get("value"),
-                row.get("street_no_first", {}).get("value"),
-                row.get("street_no_first_suffix", {}).get("value"),
-                row.get("street_no_last", {}).get("value"),
-                row.get("street_no_last_suffix", {}).get("value"),
-                row["road_id"]["value"],
-                row["site_id"]["value"],
-                row.get("location_desc", {}).get("value"),
-                row["address_standard"]["value"],
-            )
-        )
-
-    return insert_data, missing_iris
+        yield row[0], address_pid, *row[2:]
 
 
 def prune_addresses_without_pid_mapping(cursor: sqlite3.Cursor) -> None:
@@ -830,59 +936,31 @@ def prune_addresses_without_pid_mapping(cursor: sqlite3.Cursor) -> None:
     cursor.connection.commit()
 
 
+@run_stats.record_stage("geocode_site_ids")
 def update_geocode_site_id(cursor: sqlite3.Cursor):
+    """Link geocodes to the site of the address they belong to.
+
+    Geocodes carried over from the previous ETL keep their site_id, so only
+    rows whose link is missing or stale are written: geocodes that were newly
+    imported, geocodes whose address_pid changed, and geocodes whose address
+    now points at a different site.
+    """
     start_time = time.time()
     logger.info("Updating geocode table with site_id")
 
     optimize_sqlite_for_bulk_inserts(cursor)
 
-    logger.info("Creating temporary mapping table for geocode updates")
     cursor.execute(
         """
-        CREATE TEMPORARY TABLE geocode_site_mapping AS
-        SELECT g.geocode_id, a.site_id
-        FROM lf_geocode_sp_survey_point g
-        JOIN lf_address a ON g.address_pid = a.address_pid
-    """
-    )
-
-    cursor.execute(
-        "CREATE INDEX idx_temp_geocode_id ON geocode_site_mapping (geocode_id)"
-    )
-
-    batch_size = 50000
-    total_updated = 0
-
-    while True:
-        cursor.execute(
-            f"""
-            UPDATE lf_geocode_sp_survey_point 
-            SET site_id = (
-                SELECT site_id 
-                FROM geocode_site_mapping 
-                WHERE geocode_site_mapping.geocode_id = lf_geocode_sp_survey_point.geocode_id
-            )
-            WHERE rowid IN (
-                SELECT g.rowid 
-                FROM lf_geocode_sp_survey_point g
-                LEFT JOIN geocode_site_mapping m ON g.geocode_id = m.geocode_id
-                WHERE m.site_id IS NOT NULL AND g.site_id IS NULL
-                LIMIT {batch_size}
-            )
+        UPDATE lf_geocode_sp_survey_point
+        SET site_id = a.site_id
+        FROM lf_address a
+        WHERE a.address_pid = lf_geocode_sp_survey_point.address_pid
+            AND lf_geocode_sp_survey_point.site_id IS NOT a.site_id
         """
-        )
-
-        rows_updated = cursor.rowcount
-        total_updated += rows_updated
-
-        if rows_updated == 0:
-            break
-
-        cursor.connection.commit()
-        logger.info(f"Updated {total_updated} geocode records so far")
-
-    # Clean up temporary table
-    cursor.execute("DROP TABLE geocode_site_mapping")
+    )
+    logger.info(f"Relinked {cursor.rowcount} geocode records to their site")
+    cursor.connection.commit()
 
     logger.info("Adding foreign key constraint to geocode table")
     cursor.execute("PRAGMA foreign_key_check")
@@ -908,16 +986,75 @@ def prune_geocodes_without_addresses(cursor: sqlite3.Cursor) -> None:
     cursor.connection.commit()
 
 
-def populate_tables(cursor: sqlite3.Cursor):
-    with httpx.Client(timeout=settings.http_timeout_in_seconds) as client:
+def get_reused_tables() -> tuple[str, ...]:
+    """The tables whose rows can be reused from the previous ETL's database."""
+    if settings.pls_reuse_unchanged_rows:
+        return ("lf_road", "lf_parcel")
+    if settings.skip_unchanged_stages:
+        # Only roads are reused when their graphs are unchanged.
+        return ("lf_road",)
+    return ()
+
+
+def has_previous_tables(cursor: sqlite3.Cursor, table_names: Iterable[str]) -> bool:
+    cursor.execute("SELECT name FROM previous.sqlite_master WHERE type = 'table'")
+    existing = {row["name"] for row in cursor.fetchall()}
+    return all(table_name in existing for table_name in table_names)
+
+
+def populate_tables(
+    cursor: sqlite3.Cursor,
+    previous_db_path: str | None = None,
+    fingerprints: StageFingerprints | None = None,
+):
+    fingerprints = fingerprints or StageFingerprints()
+    attach_previous = bool(previous_db_path) and (
+        settings.pls_reuse_unchanged_rows or settings.skip_unchanged_stages
+    )
+    has_previous = False
+    if attach_previous:
+        attach_read_only(cursor, previous_db_path, "previous")
+        has_previous = has_previous_tables(cursor, get_reused_tables())
+        if not has_previous:
+            logger.info("Previous database has no tables to copy forward")
+
+    with create_http_client() as client:
+        # The fingerprint is recorded on every run, like those of the ESRI
+        # imports, so that a run with skip_unchanged_stages newly set can use it.
+        road_unchanged = (
+            fingerprints.is_unchanged(
+                "road", get_graph_fingerprint(client, ROAD_GRAPHS)
+            )
+            and has_previous
+        )
+
+        # Localities are never skipped. The graph fingerprint is a triple count,
+        # which misses renames, and the two locality queries are small.
         populate_locality_tables(client, cursor)
 
-        populate_road_tables(client, cursor)
+        # Roads are still discovered from the addresses, but with an unchanged
+        # roads graph only roads missing from the previous database are fetched.
+        # The fingerprint is a triple count, which misses edits that keep the
+        # count, so a slice of the reused roads is still fetched for drift.
+        populate_road_tables(
+            client,
+            cursor,
+            reuse_previous=has_previous
+            and (settings.pls_reuse_unchanged_rows or road_unchanged),
+        )
         create_road_indexes(cursor)
 
-        populate_parcel_tables(client, cursor)
+        populate_parcel_tables(
+            client,
+            cursor,
+            reuse_previous=has_previous and settings.pls_reuse_unchanged_rows,
+        )
         create_parcel_indexes(cursor)
 
+        if attach_previous:
+            cursor.connection.commit()
+            cursor.execute("DETACH DATABASE previous")
+
         populate_site_tables(client, cursor)
         create_site_indexes(cursor)
 
@@ -931,6 +1068,12 @@ def populate_tables(cursor: sqlite3.Cursor):
         # # This will create the geocode table's index as well
         update_geocode_site_id(cursor)
 
+    map_ids_to_integers(cursor)
+
+
+@run_stats.record_stage("map_ids_to_integers")
+def map_ids_to_integers(cursor: sqlite3.Cursor):
+    """Replace the text identifiers of newly inserted rows with their map ids."""
     text_to_id_for_pk("lf_road_id_map", "lf_road", "road_id", cursor)
     text_to_id_for_pk("lf_parcel_id_map", "lf_parcel", "parcel_id", cursor)
     text_to_id_for_pk("lf_site_id_map", "lf_site", "site_id", cursor)
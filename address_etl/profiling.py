@@ -0,0 +1,92 @@
+import cProfile
+import io
+import logging
+import pstats
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from address_etl.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = "/tmp/pls_profiles"
+PROFILERS = ("cprofile", "tracemalloc")
+TOP_ENTRIES = 50
+
+profile_files: list[Path] = []
+_active = False
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[None]:
+    """Profile a stage if it is listed in settings.profile_stages.
+
+    Each profiler in settings.profilers writes its reports to PROFILE_DIR
+    and adds them to profile_files. Stages run inside a profiled stage are
+    not profiled separately.
+    """
+    global _active
+    if name not in settings.profile_stages or _active:
+        yield
+        return
+
+    unknown = set(settings.profilers) - set(PROFILERS)
+    if unknown:
+        raise ValueError(f"Unknown profilers {sorted(unknown)}")
+
+    profile_dir = Path(PROFILE_DIR)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Profiling stage {name} with {', '.join(settings.profilers)}")
+    _active = True
+    try:
+        with ExitStack() as stack:
+            if "tracemalloc" in settings.profilers:
+                stack.enter_context(trace_allocations(profile_dir, name))
+            if "cprofile" in settings.profilers:
+                stack.enter_context(profile_calls(profile_dir, name))
+            yield
+    finally:
+        _active = False
+
+
+@contextmanager
+def profile_calls(profile_dir: Path, name: str) -> Iterator[None]:
+    """Write the stage's cProfile stats and their top cumulative entries."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        prof_path = profile_dir / f"{name}.prof"
+        profiler.dump_stats(prof_path)
+
+        report = io.StringIO()
+        stats = pstats.Stats(profiler, stream=report)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_ENTRIES)
+        report_path = profile_dir / f"{name}.prof.txt"
+        report_path.write_text(report.getvalue())
+        profile_files.extend((prof_path, report_path))
+
+
+@contextmanager
+def trace_allocations(profile_dir: Path, name: str) -> Iterator[None]:
+    """Write the allocations still held at the end of the stage by line."""
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        lines = [
+            f"Traced memory at the end of stage {name}: {current} bytes, peak {peak} bytes",
+            "",
+            *(str(stat) for stat in snapshot.statistics("lineno")[:TOP_ENTRIES]),
+        ]
+        report_path = profile_dir / f"{name}.tracemalloc.txt"
+        report_path.write_text("\n".join(lines) + "\n")
+        profile_files.append(report_path)
@@ -0,0 +1,103 @@
+import logging
+import sqlite3
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+
+from address_etl.run_stats import StageStats
+from address_etl.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# The run_stats columns that can be compared, present since the table was added.
+REGRESSION_METRICS = (
+    "wall_seconds",
+    "rows_written",
+    "http_requests",
+    "bytes_received",
+    "retries",
+    "commits",
+)
+
+
+@dataclass
+class Regression:
+    stage: str
+    metric: str
+    previous: float
+    current: float
+
+    @property
+    def factor(self) -> float:
+        return self.current / self.previous
+
+    def __str__(self) -> str:
+        return f"{self.stage} {self.metric} {self.factor:.2f}x"
+
+
+def read_stage_totals(
+    cursor: sqlite3.Cursor, schema_name: str = "main"
+) -> dict[str, dict[str, float]]:
+    """Read the per-stage figures of the run that built a database.
+
+    Returns an empty dict for databases written before run_stats existed.
+    """
+    cursor.execute(
+        f"SELECT 1 FROM {schema_name}.sqlite_master "
+        "WHERE type = 'table' AND name = 'run_stats'"
+    )
+    if cursor.fetchone() is None:
+        return {}
+
+    sums = ", ".join(f"SUM({metric}) AS {metric}" for metric in REGRESSION_METRICS)
+    cursor.execute(f"SELECT stage, {sums} FROM {schema_name}.run_stats GROUP BY stage")
+    return {
+        row["stage"]: {metric: row[metric] for metric in REGRESSION_METRICS}
+        for row in cursor.fetchall()
+    }
+
+
+def stage_totals(stages: Iterable[StageStats]) -> dict[str, dict[str, float]]:
+    """Sum the figures of stages recorded more than once in a run."""
+    totals: dict[str, dict[str, float]] = {}
+    for stats in stages:
+        figures = asdict(stats)
+        stage = totals.setdefault(stats.stage, dict.fromkeys(REGRESSION_METRICS, 0))
+        for metric in REGRESSION_METRICS:
+            stage[metric] += figures[metric]
+    return totals
+
+
+def find_regressions(
+    previous: dict[str, dict[str, float]], stages: Iterable[StageStats]
+) -> list[Regression]:
+    """Compare this run's stages with the previous run's and log regressions.
+
+    A figure regresses when it grows by more than its factor in
+    settings.regression_factors. Stages that took less than
+    settings.regression_min_wall_seconds in the previous run, including
+    those it skipped, are not compared.
+    """
+    unknown = set(settings.regression_factors) - set(REGRESSION_METRICS)
+    if unknown:
+        raise ValueError(f"Unknown regression metrics {sorted(unknown)}")
+
+    regressions = []
+    for stage, figures in stage_totals(stages).items():
+        before = previous.get(stage)
+        if not before or before["wall_seconds"] < settings.regression_min_wall_seconds:
+            continue
+        for metric, factor in settings.regression_factors.items():
+            if before[metric] > 0 and figures[metric] > before[metric] * factor:
+                regressions.append(
+                    Regression(stage, metric, before[metric], figures[metric])
+                )
+
+    for regression in regressions:
+        logger.warning(
+            f"Performance regression in stage {regression.stage}: "
+            f"{regression.metric} {regression.previous:g} -> {regression.current:g} "
+            f"({regression.factor:.2f}x the previous run)"
+        )
+    if not regressions:
+        logger.info("No performance regressions against the previous run")
+    return regressions
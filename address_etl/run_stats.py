@@ -0,0 +1,259 @@
+import functools
+import logging
+import resource
+import sqlite3
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+import httpx
+import pytz
+
+from address_etl.profiling import profile_stage
+from address_etl.settings import settings
+from address_etl.sql_trace import TracingCursor, sql_trace
+from address_etl.tables import create_run_stats_table
+from address_etl.timeline import timeline
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageStats:
+    stage: str
+    started_at: str
+    wall_seconds: float
+    rows_written: int
+    http_requests: int
+    bytes_received: int
+    retries: int
+    # Peak resident set size of the ETL process while the stage ran.
+    peak_rss_bytes: int
+    commits: int
+    sql_statements: int
+    sql_seconds: float
+
+
+class RunStats:
+    """Collects the performance counters of each stage of an ETL run.
+
+    The HTTP counters are fed by the clients of create_http_client, retries
+    by the backoff handlers and commits by RunStatsConnection. Rows written
+    are read from the SQLite connection's total_changes.
+
+    The progress attributes are also read by the metrics server thread, so
+    they are only ever replaced, never mutated in place.
+    """
+
+    def __init__(self) -> None:
+        self.stages: list[StageStats] = []
+        self.current_stage: str | None = None
+        self.connection: sqlite3.Connection | None = None
+        self.http_requests = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.retries_by_source: dict[str, int] = {}
+        self.commits = 0
+        self.in_flight_requests = 0
+        self.rows_written = 0
+        self.stage_rows_written = 0
+        self.stage_started = time.perf_counter()
+        self.batches_done = 0
+        self.batches_total = 0
+        self.decode_queue_depth = 0
+        # The peak resident set size of each running stage, outermost first,
+        # taken before a nested stage reset the high-water mark.
+        self.stage_peak_rss: list[int] = []
+
+    def attach(self, connection: sqlite3.Connection | None) -> None:
+        """Count the rows written through connection, or stop with None."""
+        self.connection = connection
+
+    def record_http_response(self, response: httpx.Response) -> None:
+        response.read()
+        self.http_requests += 1
+        # Responses built in memory, such as by mock transports, are never
+        # downloaded, so fall back to the length of their content.
+        self.bytes_received += response.num_bytes_downloaded or len(response.content)
+
+    def record_retry(self, source: str) -> None:
+        """Count a retry of a request to source, sparql or esri."""
+        self.retries += 1
+        self.retries_by_source = {
+            **self.retries_by_source,
+            source: self.retries_by_source.get(source, 0) + 1,
+        }
+
+    def record_progress(
+        self, batches_done: int, batches_total: int, decode_queue_depth: int = 0
+    ) -> None:
+        """Update the progress of the current stage's batches."""
+        self.batches_done = batches_done
+        self.batches_total = batches_total
+        self.decode_queue_depth = decode_queue_depth
+        self.rows_written = self.total_changes()
+
+    def total_changes(self) -> int:
+        return self.connection.total_changes if self.connection else 0
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        parent_stage = self.current_stage
+        self.current_stage = name
+        self.record_progress(0, 0)
+        self.stage_rows_written = self.rows_written
+        self.stage_started = time.perf_counter()
+        started_at = datetime.now(pytz.UTC)
+        start = time.perf_counter()
+        if self.stage_peak_rss:
+            self.stage_peak_rss[-1] = max(self.stage_peak_rss[-1], get_peak_rss_bytes())
+        reset_peak_rss()
+        self.stage_peak_rss.append(0)
+        counters = (
+            self.total_changes(),
+            self.http_requests,
+            self.bytes_received,
+            self.retries,
+            self.commits,
+            sql_trace.executions,
+            sql_trace.seconds,
+        )
+        try:
+            with timeline.span(name, "stage"), profile_stage(name):
+                yield
+        finally:
+            self.current_stage = parent_stage
+            self.rows_written = self.total_changes()
+            peak_rss_bytes = max(self.stage_peak_rss.pop(), get_peak_rss_bytes())
+            stats = StageStats(
+                stage=name,
+                started_at=started_at.isoformat(),
+                wall_seconds=time.perf_counter() - start,
+                rows_written=self.total_changes() - counters[0],
+                http_requests=self.http_requests - counters[1],
+                bytes_received=self.bytes_received - counters[2],
+                retries=self.retries - counters[3],
+                peak_rss_bytes=peak_rss_bytes,
+                commits=self.commits - counters[4],
+                sql_statements=sql_trace.executions - counters[5],
+                sql_seconds=sql_trace.seconds - counters[6],
+            )
+            self.stages.append(stats)
+            logger.info(
+                f"Stage {name}: {stats.wall_seconds:.2f} seconds, "
+                f"{stats.rows_written} rows written, "
+                f"{stats.http_requests} HTTP requests"
+            )
+
+    def record_stage(self, name: str) -> Callable:
+        """Decorator recording each call of a function as the stage name."""
+
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def to_dict(self) -> dict:
+        report = {"stages": [asdict(stats) for stats in self.stages]}
+        if sql_trace.statements:
+            report["sql_statements"] = [
+                asdict(stats) for stats in sql_trace.top_statements()
+            ]
+        return report
+
+
+run_stats = RunStats()
+
+
+class RunStatsConnection(sqlite3.Connection):
+    """SQLite connection counting its commits in run_stats.
+
+    Its cursors time their statements in sql_trace if settings.sqlite_trace
+    is enabled, and its commits and executemany calls are spans of the
+    timeline if settings.trace_timeline is.
+    """
+
+    def cursor(self, factory: type[sqlite3.Cursor] | None = None) -> sqlite3.Cursor:
+        if factory is None:
+            if settings.sqlite_trace or timeline.enabled:
+                factory = TracingCursor
+            else:
+                factory = sqlite3.Cursor
+        return super().cursor(factory)
+
+    def commit(self) -> None:
+        with timeline.span("commit", "sqlite"):
+            super().commit()
+        run_stats.commits += 1
+
+
+def reset_peak_rss() -> None:
+    """Reset the resident set size high-water mark, where Linux allows it."""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        pass
+
+
+def get_peak_rss_bytes() -> int:
+    """Peak resident set size since reset_peak_rss.
+
+    Read from VmHWM, which follows the resets. Where /proc is not available
+    this is the peak of the process so far from ru_maxrss, in KiB on Linux.
+    """
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def write_run_stats(cursor: sqlite3.Cursor, stats: RunStats) -> None:
+    """Replace the run_stats table with the stages of this run."""
+    # Recreated rather than emptied, as a cloned database may have an older
+    # version of the table.
+    cursor.execute("DROP TABLE IF EXISTS run_stats")
+    create_run_stats_table(cursor)
+    cursor.executemany(
+        """
+        INSERT INTO run_stats (
+            stage,
+            started_at,
+            wall_seconds,
+            rows_written,
+            http_requests,
+            bytes_received,
+            retries,
+            peak_rss_bytes,
+            commits,
+            sql_statements,
+            sql_seconds
+        )
+        VALUES (
+            :stage,
+            :started_at,
+            :wall_seconds,
+            :rows_written,
+            :http_requests,
+            :bytes_received,
+            :retries,
+            :peak_rss_bytes,
+            :commits,
+            :sql_statements,
+            :sql_seconds
+        )
+        """,
+        [asdict(stage) for stage in stats.stages],
+    )
+    cursor.connection.commit()
@@ -1,14 +1,67 @@
+import json
 import logging
+import os
+import threading
+import time
 import traceback
 
 import boto3
 import botocore.exceptions
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 
 from address_etl.settings import Settings
+from address_etl.timeline import timeline
 
 logger = logging.getLogger(__name__)
 
+LATEST_MANIFEST_NAME = "latest.json"
+ZSTD_SUFFIX = ".zst"
+# The listing fallback of get_latest_file skips the reports uploaded beside
+# each database, such as the timeline and HTTP archive.
+DATABASE_SUFFIXES = ("pls.db", f"pls.db{ZSTD_SUFFIX}")
+
+
+class TransferProgress:
+    """Log the progress of an S3 transfer.
+
+    Instances are passed as the Callback of boto3 transfers, which call them
+    from several worker threads with the number of bytes just transferred.
+    A total_bytes of 0 means the size is not known up front.
+    """
+
+    def __init__(self, description: str, total_bytes: int, interval: float = 10.0):
+        self.description = description
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.transferred_bytes = 0
+        self.start_time = time.time()
+        self.last_logged_at = self.start_time
+        self.lock = threading.Lock()
+
+    def __call__(self, bytes_amount: int) -> None:
+        with self.lock:
+            self.transferred_bytes += bytes_amount
+            now = time.time()
+            if now - self.last_logged_at < self.interval and (
+                not self.total_bytes or self.transferred_bytes < self.total_bytes
+            ):
+                return
+            self.last_logged_at = now
+
+        elapsed = max(now - self.start_time, 1e-6)
+        rate = self.transferred_bytes / elapsed / 1024**2
+        if self.total_bytes:
+            percent = 100 * self.transferred_bytes / self.total_bytes
+            logger.info(
+                f"{self.description}: {self.transferred_bytes} of {self.total_bytes} bytes "
+                f"({percent:.1f}%, {rate:.1f} MiB/s)"
+            )
+        else:
+            logger.info(
+                f"{self.description}: {self.transferred_bytes} bytes ({rate:.1f} MiB/s)"
+            )
+
 
 def upload_file(
     bucket_name: str,
@@ -18,7 +71,16 @@ def upload_file(
     presigned_url_expiry_seconds: int = 3600,
 ) -> str:
     logger.info(f"Uploading file {file_path} to {bucket_name}/{key}")
-    s3.client.upload_file(file_path, bucket_name, key)
+    with timeline.span("upload", "s3", key=key):
+        s3.client.upload_file(
+            file_path,
+            bucket_name,
+            key,
+            Config=s3.transfer_config,
+            Callback=TransferProgress(
+                f"Uploading {bucket_name}/{key}", os.path.getsize(file_path)
+            ),
+        )
 
     # Create presigned URL for the uploaded file
     presigned_url = s3.client.generate_presigned_url(
@@ -30,15 +92,83 @@ def upload_file(
     return presigned_url
 
 
+def upload_compressed_file(
+    bucket_name: str,
+    key: str,
+    file_path: str,
+    s3: "S3",
+    compression_level: int = 3,
+    presigned_url_expiry_seconds: int = 3600,
+) -> tuple[str, int]:
+    """Upload a file compressed with zstd, streaming it through the compressor.
+
+    Returns the presigned URL and the compressed size in bytes.
+    """
+    import zstandard
+
+    logger.info(f"Uploading zstd compressed file {file_path} to {bucket_name}/{key}")
+    compressor = zstandard.ZstdCompressor(level=compression_level, threads=-1)
+    with (
+        timeline.span("upload compressed", "s3", key=key),
+        open(file_path, "rb") as file,
+        compressor.stream_reader(file, size=os.path.getsize(file_path)) as reader,
+    ):
+        s3.client.upload_fileobj(
+            reader,
+            bucket_name,
+            key,
+            Config=s3.transfer_config,
+            Callback=TransferProgress(f"Uploading {bucket_name}/{key}", 0),
+        )
+        compressed_size = reader.tell()
+
+    logger.info(
+        f"Uploaded {compressed_size} compressed bytes from {os.path.getsize(file_path)} bytes"
+    )
+    presigned_url = s3.client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": bucket_name, "Key": key},
+        ExpiresIn=presigned_url_expiry_seconds,
+    )
+    logger.info(f"Created presigned URL for {bucket_name}/{key}: {presigned_url}")
+    return presigned_url, compressed_size
+
+
 def download_file(bucket_name: str, key: str, file_path: str, s3: "S3") -> None:
-    s3.download_object_to_file(bucket_name, key, file_path)
+    """Download an S3 object to a file, decompressing zstd objects on the fly."""
+    if key.endswith(ZSTD_SUFFIX):
+        s3.download_compressed_object_to_file(bucket_name, key, file_path)
+    else:
+        s3.download_object_to_file(bucket_name, key, file_path)
+
+
+def write_latest_manifest(bucket_name: str, prefix: str, key: str, s3: "S3") -> None:
+    """Point the prefix's latest manifest at key.
+
+    S3 PUTs are atomic, so readers see either the previous or the new manifest.
+    """
+    manifest_key = f"{prefix}{LATEST_MANIFEST_NAME}"
+    logger.info(f"Writing {bucket_name}/{manifest_key} pointing to {key}")
+    s3.create_object(bucket_name, manifest_key, json.dumps({"key": key}).encode())
 
 
 def get_latest_file(bucket_name: str, s3: "S3", prefix: str = "") -> str | None:
     logger.info(f"Getting latest file from {bucket_name}")
-    objects = s3.list_objects(bucket_name)
+    manifest_key = f"{prefix}{LATEST_MANIFEST_NAME}"
+    try:
+        result = s3.client.get_object(Bucket=bucket_name, Key=manifest_key)
+    except botocore.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchKey":
+            raise
+    else:
+        manifest = json.loads(result["Body"].read())
+        logger.info(f"Latest file from {manifest_key}: {manifest['key']}")
+        return manifest["key"]
+
+    # Fall back to listing the prefix when no manifest has been written yet.
+    objects = s3.list_objects(bucket_name, prefix=prefix)
     for obj in objects:
-        if obj["Key"].startswith(prefix):
+        if obj["Key"].endswith(DATABASE_SUFFIXES):
             logger.info(f"Latest file: {obj['Key']}")
             return obj["Key"]
 
@@ -64,9 +194,20 @@ def _get_s3_client(settings: Settings):
     return boto3.client("s3")
 
 
+def get_transfer_config(settings: Settings) -> TransferConfig:
+    return TransferConfig(
+        multipart_threshold=settings.s3_transfer_chunk_size,
+        multipart_chunksize=settings.s3_transfer_chunk_size,
+        max_concurrency=settings.s3_transfer_max_concurrency,
+        use_threads=True,
+    )
+
+
 class S3:
     def __init__(self, settings: Settings):
         self.client = _get_s3_client(settings)
+        timeline.trace_boto_client(self.client)
+        self.transfer_config = get_transfer_config(settings)
 
     def list_buckets(self) -> list:
         try:
@@ -108,10 +249,14 @@ class S3:
             logger.error(traceback.format_exc())
             raise
 
-    def list_objects(self, bucket_name: str) -> list:
+    def list_objects(self, bucket_name: str, prefix: str = "") -> list:
         try:
-            result = self.client.list_objects(Bucket=bucket_name)
-            result = result["Contents"] if "Contents" in result else []
+            paginator = self.client.get_paginator("list_objects_v2")
+            result = [
+                obj
+                for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix)
+                for obj in page.get("Contents", [])
+            ]
             return sorted(result, key=lambda x: x["Key"], reverse=True)
         except boto3.exceptions.Boto3Error as e:
             logger.error(f"Failed to list S3 objects: {str(e)}")
@@ -151,6 +296,32 @@ class S3:
             logger.error(traceback.format_exc())
             raise
 
+    def get_object_range(
+        self, bucket_name: str, key: str, start: int, end: int
+    ) -> bytes:
+        """Get the bytes from start to end (inclusive) of an S3 object."""
+        try:
+            result = self.client.get_object(
+                Bucket=bucket_name, Key=key, Range=f"bytes={start}-{end}"
+            )
+            return result["Body"].read()
+        except boto3.exceptions.Boto3Error as e:
+            logger.error(f"Failed to get S3 object range: {str(e)}")
+            raise
+        except Exception:
+            logger.error(traceback.format_exc())
+            raise
+
+    def head_object(self, bucket_name: str, key: str) -> dict:
+        try:
+            return self.client.head_object(Bucket=bucket_name, Key=key)
+        except boto3.exceptions.Boto3Error as e:
+            logger.error(f"Failed to head S3 object: {str(e)}")
+            raise
+        except Exception:
+            logger.error(traceback.format_exc())
+            raise
+
     def download_object_to_file(
         self, bucket_name: str, key: str, file_path: str
     ) -> None:
@@ -160,7 +331,53 @@ class S3:
         """
         try:
             logger.info(f"Downloading {bucket_name}/{key} to {file_path}")
-            self.client.download_file(bucket_name, key, file_path)
+            total_bytes = self.head_object(bucket_name, key)["ContentLength"]
+            with timeline.span("download", "s3", key=key):
+                self.client.download_file(
+                    bucket_name,
+                    key,
+                    file_path,
+                    Config=self.transfer_config,
+                    Callback=TransferProgress(
+                        f"Downloading {bucket_name}/{key}", total_bytes
+                    ),
+                )
+        except boto3.exceptions.Boto3Error as e:
+            logger.error(f"Failed to download S3 object: {str(e)}")
+            raise
+        except Exception:
+            logger.error(traceback.format_exc())
+            raise
+
+    def download_compressed_object_to_file(
+        self, bucket_name: str, key: str, file_path: str
+    ) -> None:
+        """
+        Download a zstd compressed S3 object and decompress it straight to a file.
+        Parts are downloaded concurrently and decompressed in order as they arrive.
+        """
+        import zstandard
+
+        try:
+            logger.info(
+                f"Downloading and decompressing {bucket_name}/{key} to {file_path}"
+            )
+            total_bytes = self.head_object(bucket_name, key)["ContentLength"]
+            decompressor = zstandard.ZstdDecompressor()
+            with (
+                timeline.span("download compressed", "s3", key=key),
+                open(file_path, "wb") as file,
+                decompressor.stream_writer(file, closefd=False) as writer,
+            ):
+                self.client.download_fileobj(
+                    bucket_name,
+                    key,
+                    writer,
+                    Config=self.transfer_config,
+                    Callback=TransferProgress(
+                        f"Downloading {bucket_name}/{key}", total_bytes
+                    ),
+                )
         except boto3.exceptions.Boto3Error as e:
             logger.error(f"Failed to download S3 object: {str(e)}")
             raise
@@ -0,0 +1,197 @@
+import logging
+import sqlite3
+from collections import OrderedDict
+from collections.abc import Iterable
+from pathlib import Path
+
+from address_etl.s3 import S3
+
+logger = logging.getLogger(__name__)
+
+VFS_NAME = "s3-range"
+# https://sqlite.org/c3ref/c_iocap_atomic.html
+SQLITE_IOCAP_IMMUTABLE = 0x00002000
+
+
+class S3RangeReader:
+    """Read byte ranges of an S3 object through a bounded LRU block cache."""
+
+    def __init__(
+        self,
+        s3: S3,
+        bucket_name: str,
+        key: str,
+        block_size: int,
+        cache_bytes: int,
+    ) -> None:
+        self.s3 = s3
+        self.bucket_name = bucket_name
+        self.key = key
+        self.block_size = block_size
+        self.max_cached_blocks = max(1, cache_bytes // block_size)
+        self.size = s3.head_object(bucket_name, key)["ContentLength"]
+        self.blocks: OrderedDict[int, bytes] = OrderedDict()
+        self.request_count = 0
+        self.bytes_fetched = 0
+
+    def get_block(self, index: int) -> bytes:
+        block = self.blocks.get(index)
+        if block is not None:
+            self.blocks.move_to_end(index)
+            return block
+
+        start = index * self.block_size
+        end = min(start + self.block_size, self.size) - 1
+        block = self.s3.get_object_range(self.bucket_name, self.key, start, end)
+        self.request_count += 1
+        self.bytes_fetched += len(block)
+
+        self.blocks[index] = block
+        if len(self.blocks) > self.max_cached_blocks:
+            self.blocks.popitem(last=False)
+        return block
+
+    def read(self, amount: int, offset: int) -> bytes:
+        end = min(offset + amount, self.size)
+        if offset >= end:
+            return b""
+
+        chunks = []
+        for index in range(offset // self.block_size, (end - 1) // self.block_size + 1):
+            block_start = index * self.block_size
+            block = self.get_block(index)
+            chunks.append(block[max(offset - block_start, 0) : end - block_start])
+        return b"".join(chunks)
+
+
+class S3VFSFile:
+    """An immutable, read-only SQLite file backed by an S3RangeReader."""
+
+    def __init__(self, reader: S3RangeReader) -> None:
+        self.reader = reader
+
+    def xRead(self, amount: int, offset: int) -> bytes:
+        return self.reader.read(amount, offset)
+
+    def xFileSize(self) -> int:
+        return self.reader.size
+
+    def xDeviceCharacteristics(self) -> int:
+        return SQLITE_IOCAP_IMMUTABLE
+
+    def xSectorSize(self) -> int:
+        return 4096
+
+    def xFileControl(self, op: int, ptr: int) -> bool:
+        return False
+
+    def xLock(self, level: int) -> None:
+        pass
+
+    def xUnlock(self, level: int) -> None:
+        pass
+
+    def xCheckReservedLock(self) -> bool:
+        return False
+
+    def xSync(self, flags: int) -> None:
+        pass
+
+    def xClose(self) -> None:
+        pass
+
+    def xWrite(self, data: bytes, offset: int) -> None:
+        raise OSError("S3 databases are read-only")
+
+    def xTruncate(self, newsize: int) -> None:
+        raise OSError("S3 databases are read-only")
+
+
+def _create_vfs(reader: S3RangeReader):
+    import apsw
+
+    class S3VFS(apsw.VFS):
+        def __init__(self) -> None:
+            super().__init__(VFS_NAME, base="")
+
+        def xOpen(self, name, flags):
+            flags[1] = apsw.SQLITE_OPEN_READONLY
+            return S3VFSFile(reader)
+
+        def xAccess(self, pathname: str, flags: int) -> bool:
+            # There are never journal or WAL files next to the database.
+            return False
+
+        def xFullPathname(self, name: str) -> str:
+            return name
+
+    return S3VFS()
+
+
+def copy_tables_from_s3(
+    s3: S3,
+    bucket_name: str,
+    key: str,
+    destination: str,
+    table_names: Iterable[str],
+    block_size: int = 1024 * 1024,
+    cache_bytes: int = 64 * 1024 * 1024,
+) -> None:
+    """Copy tables from a SQLite database in S3 into a new local database.
+
+    Python's sqlite3 module cannot register a custom VFS, so the remote
+    database is opened with APSW through a VFS that serves pages with ranged
+    S3 GETs. Only the pages needed to read the requested tables are fetched.
+    Tables missing from the remote database are skipped.
+    """
+    import apsw
+
+    reader = S3RangeReader(s3, bucket_name, key, block_size, cache_bytes)
+    vfs = _create_vfs(reader)
+    Path(destination).unlink(missing_ok=True)
+    local = sqlite3.connect(destination)
+    try:
+        remote = apsw.Connection(key, flags=apsw.SQLITE_OPEN_READONLY, vfs=VFS_NAME)
+        try:
+            for table_name in table_names:
+                copy_table(remote, local, table_name)
+        finally:
+            remote.close()
+        local.commit()
+    finally:
+        local.close()
+        vfs.unregister()
+
+    logger.info(
+        f"Copied tables from {bucket_name}/{key} with {reader.request_count} range requests "
+        f"({reader.bytes_fetched} of {reader.size} bytes)"
+    )
+
+
+def copy_table(remote, local: sqlite3.Connection, table_name: str) -> None:
+    row = remote.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (table_name,),
+    ).fetchone()
+    if row is None:
+        logger.info(f"Table {table_name} does not exist in the remote database")
+        return
+
+    logger.info(f"Copying {table_name} from the remote database")
+    local.execute(row[0])
+    column_count = len(remote.execute(f"PRAGMA table_info({table_name})").fetchall())
+    placeholders = ", ".join("?" for _ in range(column_count))
+    local.executemany(
+        f"INSERT INTO {table_name} VALUES ({placeholders})",
+        remote.execute(f"SELECT * FROM {table_name}"),
+    )
+
+    # Build indexes after loading the rows.
+    for (index_sql,) in remote.execute(
+        """
+        SELECT sql FROM sqlite_master
+        WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+        """,
+        (table_name,),
+    ).fetchall():
+        local.execute(index_sql)
@@ -15,6 +15,69 @@ class Settings(BaseSettings):
     esri_password: str
 
     pls_sqlite_conn_str: str = "pls.db"
+    # Build the database in a scratch database and write it out to
+    # pls_sqlite_conn_str with VACUUM INTO once the ETL has finished.
+    # The scratch database is in memory unless a file path is given.
+    pls_sqlite_fast_build: bool = False
+    pls_sqlite_build_path: str = ":memory:"
+    # Start from a page-level copy of the previous ETL's database instead of
+    # copying the carried-over tables row by row.
+    pls_sqlite_clone_previous: bool = False
+    # Only extract addresses whose lifecycle changed since the previous run and
+    # carry everything else over, with a full rebuild every interval.
+    pls_incremental_sparql: bool = False
+    pls_full_rebuild_interval_days: int = 7
+    # Copy roads and parcels already in the previous snapshot instead of
+    # querying their details again. Every reused row is still refetched once
+    # every pls_reuse_drift_sample_days runs.
+    pls_reuse_unchanged_rows: bool = False
+    pls_reuse_drift_sample_days: int = 30
+    # Copy a stage's tables forward from the previous snapshot instead of
+    # querying SPARQL/ESRI when its input fingerprint is unchanged.
+    skip_unchanged_stages: bool = False
+    # Discovered IRI keys held in memory per stage before spilling to disk.
+    discovery_memory_rows: int = 1_000_000
+    # Worker processes decoding SPARQL detail batches; 0 decodes in-process.
+    pls_decode_workers: int = 0
+    # JSON library for SPARQL and ESRI responses: auto, msgspec, orjson or json.
+    json_decoder: str = "auto"
+    # Run stages (run_stats stage names such as address, map_ids_to_integers
+    # or geocodes) under the profilers, cprofile and/or tracemalloc, and
+    # upload their reports next to pls.db.
+    profile_stages: list[str] = []
+    profilers: list[str] = ["cprofile"]
+    # Time the SQL statements of the ETL's connection, grouped by statement in
+    # run_stats.json, and log the query plan of statements slower than this.
+    sqlite_trace: bool = False
+    sqlite_slow_query_seconds: float = 10.0
+    # Number of slowest SPARQL detail batches, with their VALUES keys, in the
+    # run's sparql_slow_batches.json.
+    sparql_slow_batch_report_size: int = 20
+    # Serve the run's progress in the Prometheus format on this port at
+    # /metrics while the ETL runs.
+    metrics_port: int | None = None
+    # Record a Chrome trace-event timeline of the run's stages, HTTP requests,
+    # SQLite writes and S3 transfers, uploaded as timeline.json next to pls.db.
+    trace_timeline: bool = False
+    # Flag a stage in the logs and Kafka headers when one of its run_stats
+    # figures grows by more than this factor over the previous run's. Stages
+    # that took less than regression_min_wall_seconds last run are skipped.
+    regression_factors: dict[str, float] = {
+        "wall_seconds": 1.5,
+        "rows_written": 2.0,
+        "bytes_received": 2.0,
+    }
+    regression_min_wall_seconds: float = 60.0
+
+    # Record the SPARQL and ESRI requests and responses of the run to
+    # http_archive_path, uploaded next to pls.db, or replay a recorded run from
+    # it without touching the services: off, record or replay. Replays serve
+    # responses immediately unless http_archive_replay_latency is set, reuse the
+    # recorded start time and previous database, and neither update the latest
+    # manifest nor publish to Kafka.
+    http_archive_mode: str = "off"
+    http_archive_path: str = "http_archive.db"
+    http_archive_replay_latency: bool = False
 
     esri_geocode_rest_api_query_url: str = "https://qportal.information.qld.gov.au/arcgis/rest/services/LOC/Address_Geocodes_UAT/FeatureServer/0/query"
     esri_address_iri_pid_map_query_url: str = "https://qportal.information.qld.gov.au/arcgis/rest/services/LOC/Address_IRI_to_PID_UAT/FeatureServer/0/query"
@@ -31,7 +94,24 @@ class Settings(BaseSettings):
     timezone: str = "Australia/Brisbane"
 
     pls_s3_bucket_name: str = "pls-feature-service-etl"
+    # Keep downloaded previous snapshots in this directory (for example an EFS
+    # mount) and reuse them while the S3 object's ETag and size are unchanged.
+    previous_db_cache_dir: str | None = None
+    previous_db_cache_max_bytes: int = 5 * 1024**3
+    # Copy only the carried-over and reused tables of the previous snapshot
+    # with ranged S3 GETs instead of downloading the whole file. The tables are
+    # copied whole, not read lazily, and runs that build a changeset download
+    # the whole file. Requires apsw.
+    previous_db_range_reads: bool = False
     s3_presigned_url_expiry_seconds: int = 3600
+    # Upload a changeset.db of the rows inserted, updated and deleted since the
+    # previous snapshot next to pls.db.
+    build_changeset: bool = False
+    # Upload the snapshot as pls.db.zst instead of pls.db. Requires zstandard.
+    compress_artifact: bool = False
+    artifact_compression_level: int = 3
+    s3_transfer_chunk_size: int = 64 * 1024**2
+    s3_transfer_max_concurrency: int = 10
 
     kafka_topic: str
     kafka_bootstrap_server: str = "localhost:9092"
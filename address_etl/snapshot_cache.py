@@ -0,0 +1,73 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+from address_etl.s3 import S3, ZSTD_SUFFIX, download_file
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_path(cache_dir: str, bucket_name: str, key: str, etag: str) -> Path:
+    """Get the cache file path for a version of an S3 object."""
+    key_digest = hashlib.sha256(f"{bucket_name}/{key}".encode()).hexdigest()[:16]
+    return Path(cache_dir) / f"{key_digest}-{etag.strip('"')}.db"
+
+
+def evict_cache(cache_dir: str, max_bytes: int, keep: Path) -> None:
+    """Remove the least recently used cache files until the cache fits max_bytes."""
+    files = sorted(Path(cache_dir).glob("*.db"), key=lambda path: path.stat().st_mtime)
+    total_bytes = sum(path.stat().st_size for path in files)
+
+    for path in files:
+        if total_bytes <= max_bytes:
+            break
+        if path == keep:
+            continue
+
+        logger.info(f"Evicting {path} from the snapshot cache")
+        total_bytes -= path.stat().st_size
+        path.unlink(missing_ok=True)
+
+
+def get_cached_file(
+    bucket_name: str,
+    key: str,
+    cache_dir: str,
+    s3: S3,
+    max_bytes: int,
+) -> str:
+    """Get a local copy of an S3 object, downloading it only on a cache miss.
+
+    Cached copies are keyed by the object's ETag and validated against its
+    size, so a replaced object is always downloaded again. zstd compressed
+    objects are cached decompressed, so only their ETag is checked.
+    """
+    head = s3.head_object(bucket_name, key)
+    cache_path = get_cache_path(cache_dir, bucket_name, key, head["ETag"])
+    compressed = key.endswith(ZSTD_SUFFIX)
+    expected_size = head["ContentLength"]
+
+    if cache_path.exists() and (
+        compressed or cache_path.stat().st_size == expected_size
+    ):
+        logger.info(f"Using cached copy of {bucket_name}/{key} at {cache_path}")
+        # Mark as recently used for eviction.
+        cache_path.touch()
+        return str(cache_path)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        download_file(bucket_name, key, temp_path, s3)
+        downloaded_size = os.path.getsize(temp_path)
+        if not compressed and downloaded_size != expected_size:
+            raise RuntimeError(
+                f"Downloaded {downloaded_size} bytes for {bucket_name}/{key}, expected {expected_size}"
+            )
+        os.replace(temp_path, cache_path)
+    finally:
+        Path(temp_path).unlink(missing_ok=True)
+
+    evict_cache(cache_dir, max_bytes, keep=cache_path)
+    return str(cache_path)
@@ -0,0 +1,134 @@
+import heapq
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+
+from address_etl.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RequestTiming:
+    """Timing of a request from the httpcore trace events of its last attempt.
+
+    Pass trace as the request's "trace" extension. Transports that do not
+    emit trace events, such as mock transports, leave the times at zero.
+    """
+
+    attempts: int = 0
+    ttfb_seconds: float = 0.0
+    transfer_seconds: float = 0.0
+    _started: float = 0.0
+    _body_started: float = 0.0
+
+    def start_attempt(self) -> None:
+        self.attempts += 1
+        self.ttfb_seconds = self.transfer_seconds = 0.0
+
+    def trace(self, event_name: str, info: dict) -> None:
+        now = time.perf_counter()
+        if event_name.endswith("send_request_headers.started"):
+            self._started = now
+        elif event_name.endswith("receive_response_headers.complete"):
+            self.ttfb_seconds = now - self._started
+        elif event_name.endswith("receive_response_body.started"):
+            self._body_started = now
+        elif event_name.endswith("receive_response_body.complete"):
+            self.transfer_seconds = now - self._body_started
+
+
+@dataclass
+class BatchProfile:
+    stage: str | None
+    batch: int
+    ttfb_seconds: float
+    transfer_seconds: float
+    bytes: int
+    rows: int
+    decode_seconds: float
+    retries: int
+    keys: list = field(default_factory=list, repr=False)
+
+    @property
+    def total_seconds(self) -> float:
+        return self.ttfb_seconds + self.transfer_seconds + self.decode_seconds
+
+
+class SparqlProfiler:
+    """Per-batch timing of the SPARQL detail queries of a run.
+
+    Every batch's timing is kept, but the VALUES keys are only kept for the
+    settings.sparql_slow_batch_report_size slowest batches.
+    """
+
+    def __init__(self) -> None:
+        self.batches: list[BatchProfile] = []
+        self._slowest: list[tuple[float, int, BatchProfile]] = []
+
+    def reset(self) -> None:
+        """Forget the recorded batches, before another run in the same process."""
+        self.__init__()
+
+    def record(
+        self,
+        stage: str | None,
+        batch: int,
+        keys: list,
+        timing: RequestTiming,
+        content_length: int,
+        rows: int,
+        decode_seconds: float,
+    ) -> None:
+        profile = BatchProfile(
+            stage=stage,
+            batch=batch,
+            ttfb_seconds=timing.ttfb_seconds,
+            transfer_seconds=timing.transfer_seconds,
+            bytes=content_length,
+            rows=rows,
+            decode_seconds=decode_seconds,
+            retries=max(timing.attempts - 1, 0),
+        )
+        self.batches.append(profile)
+
+        entry = (profile.total_seconds, len(self.batches), profile)
+        if len(self._slowest) < settings.sparql_slow_batch_report_size:
+            heapq.heappush(self._slowest, entry)
+            profile.keys = keys
+        elif self._slowest and entry[0] > self._slowest[0][0]:
+            _, _, evicted = heapq.heapreplace(self._slowest, entry)
+            evicted.keys = []
+            profile.keys = keys
+
+    def slow_batches(self) -> list[BatchProfile]:
+        return [
+            profile
+            for _, _, profile in sorted(self._slowest, key=lambda entry: -entry[0])
+        ]
+
+    def report(self) -> dict:
+        """Ranked slow-batch report.
+
+        The keys of a batch can be replayed with the query module named by its
+        stage, for example address_etl.pls.queries.address.get_query(iris=keys).
+        """
+        for rank, profile in enumerate(self.slow_batches()[:5], start=1):
+            logger.info(
+                f"Slow SPARQL batch {rank}: {profile.stage} batch {profile.batch}, "
+                f"{profile.total_seconds:.2f} seconds "
+                f"(first byte {profile.ttfb_seconds:.2f}, "
+                f"transfer {profile.transfer_seconds:.2f}, "
+                f"decode {profile.decode_seconds:.2f}), {profile.rows} rows"
+            )
+
+        return {
+            "batches": len(self.batches),
+            "slow_batches": [
+                {**asdict(profile), "total_seconds": profile.total_seconds}
+                for profile in self.slow_batches()
+            ],
+        }
+
+
+sparql_profiler = SparqlProfiler()
@@ -0,0 +1,150 @@
+import logging
+import re
+import sqlite3
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from address_etl.settings import settings
+from address_etl.timeline import timeline
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+TOP_STATEMENTS = 50
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_whitespace = re.compile(r"\s+")
+
+
+@dataclass
+class StatementStats:
+    sql: str
+    count: int = 0
+    rows: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and replace literals with ? to group statements."""
+    return _whitespace.sub(" ", _literals.sub("?", sql)).strip()
+
+
+class SqlTrace:
+    """Execution time of the traced SQL statements, grouped by normalized SQL."""
+
+    def __init__(self) -> None:
+        self.statements: dict[str, StatementStats] = {}
+        self.explained: set[str] = set()
+        self.executions = 0
+        self.seconds = 0.0
+
+    def reset(self) -> None:
+        """Forget the recorded statements, before another run in the same process."""
+        self.__init__()
+
+    def record(
+        self,
+        cursor: sqlite3.Cursor,
+        sql: str,
+        parameters: Sequence | dict | None,
+        rows: int,
+        seconds: float,
+    ) -> None:
+        normalized = normalize_sql(sql)
+        stats = self.statements.get(normalized)
+        if stats is None:
+            stats = self.statements[normalized] = StatementStats(normalized)
+        stats.count += 1
+        stats.rows += max(rows, 0)
+        stats.total_seconds += seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        self.executions += 1
+        self.seconds += seconds
+
+        if seconds >= settings.sqlite_slow_query_seconds:
+            # rowcount is -1 for statements other than INSERT, UPDATE and DELETE.
+            affected = f", {rows} rows" if rows >= 0 else ""
+            logger.warning(
+                f"Slow SQL statement ({seconds:.2f} seconds{affected}): {normalized}"
+            )
+            # Only the first slow execution of a statement is explained.
+            if normalized not in self.explained:
+                self.explained.add(normalized)
+                log_query_plan(cursor.connection, sql, parameters)
+
+    def top_statements(self, limit: int = TOP_STATEMENTS) -> list[StatementStats]:
+        statements = sorted(
+            self.statements.values(),
+            key=lambda stats: stats.total_seconds,
+            reverse=True,
+        )
+        return statements[:limit]
+
+
+sql_trace = SqlTrace()
+
+
+class TracingCursor(sqlite3.Cursor):
+    """Cursor timing each execute and executemany call in sql_trace.
+
+    Its executemany calls are also spans of the timeline.
+
+    Timing at the cursor rather than with set_trace_callback keeps the
+    overhead to one measurement per call instead of one Python callback per
+    row of an executemany.
+    """
+
+    def execute(self, sql, parameters=(), /):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            if settings.sqlite_trace:
+                sql_trace.record(
+                    self, sql, parameters, self.rowcount, time.perf_counter() - start
+                )
+
+    def executemany(self, sql, seq_of_parameters, /):
+        if isinstance(seq_of_parameters, list | tuple) and seq_of_parameters:
+            parameters = seq_of_parameters[0]
+        else:
+            # Iterators are consumed by the statement, so there are no
+            # parameters left to explain it with.
+            parameters = None
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            end = time.perf_counter()
+            if timeline.enabled:
+                timeline.add_span(
+                    "executemany",
+                    "sqlite",
+                    start,
+                    end,
+                    {"sql": normalize_sql(sql), "rows": self.rowcount},
+                )
+            if settings.sqlite_trace:
+                sql_trace.record(self, sql, parameters, self.rowcount, end - start)
+
+
+def log_query_plan(
+    connection: sqlite3.Connection, sql: str, parameters: Sequence | dict | None
+) -> None:
+    if not sql.lstrip().upper().startswith(EXPLAINABLE_STATEMENTS):
+        return
+    if parameters is None and "?" in sql:
+        return
+
+    try:
+        # A plain cursor, so the EXPLAIN is not traced itself.
+        cursor = sqlite3.Cursor(connection)
+        cursor.row_factory = None
+        plan = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ()).fetchall()
+    except sqlite3.Error as error:
+        logger.warning(f"Could not explain slow SQL statement: {error}")
+        return
+
+    logger.warning("Query plan:\n" + "\n".join(f"  {row[3]}" for row in plan))
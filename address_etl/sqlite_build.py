@@ -0,0 +1,127 @@
+import logging
+import os
+import sqlite3
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 65536
+IN_MEMORY = ":memory:"
+
+
+def set_page_size(cursor: sqlite3.Cursor) -> None:
+    """Set the database page size.
+
+    SQLite only honours this before the first table is created (or on the next
+    VACUUM), so it must be issued on an empty database.
+    """
+    cursor.execute(f"PRAGMA page_size = {PAGE_SIZE}")
+
+
+def open_build_connection(
+    build_path: str = IN_MEMORY,
+    factory: type[sqlite3.Connection] = sqlite3.Connection,
+) -> sqlite3.Connection:
+    """Open a scratch database for a fast build.
+
+    The database is either held in memory or, for builds that do not fit in
+    memory, written to build_path with journaling and fsync disabled. Either
+    way it is not crash safe and must be written out with persist_database.
+    """
+    if build_path != IN_MEMORY:
+        Path(build_path).unlink(missing_ok=True)
+
+    logger.info(f"Opening fast build database {build_path}")
+    connection = sqlite3.connect(build_path, factory=factory, uri=True)
+    cursor = connection.cursor()
+    set_page_size(cursor)
+    cursor.execute("PRAGMA journal_mode = OFF")
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.close()
+    return connection
+
+
+def persist_database(connection: sqlite3.Connection, destination: str) -> None:
+    """Write the database to destination as a compact, defragmented file.
+
+    The copy is made with VACUUM INTO next to destination and atomically
+    renamed into place, so readers never see a partially written file.
+    """
+    temp_path = f"{destination}.tmp"
+    Path(destination).parent.mkdir(parents=True, exist_ok=True)
+    Path(temp_path).unlink(missing_ok=True)
+
+    logger.info(f"Writing database to {destination}")
+    connection.commit()
+    connection.execute("VACUUM INTO ?", (temp_path,))
+    os.replace(temp_path, destination)
+
+
+def checkpoint_database(connection: sqlite3.Connection) -> None:
+    """Move the writes still in the write-ahead log into the database file.
+
+    Bulk inserts run with journal_mode = WAL, where committed pages stay in the
+    -wal file until a checkpoint, so the database file on its own is missing
+    the run's last writes. Switching back to a rollback journal checkpoints the
+    log and removes it, leaving a self-contained file to upload.
+    """
+    connection.commit()
+    cursor = connection.cursor()
+    cursor.row_factory = None
+    journal_mode = cursor.execute("PRAGMA journal_mode = DELETE").fetchone()[0]
+    cursor.close()
+    if journal_mode != "delete":
+        raise RuntimeError(
+            f"Could not checkpoint the database, still in {journal_mode}"
+        )
+
+
+def read_only_uri(path: str) -> str:
+    """A URI that opens the database at path without ever writing to it.
+
+    immutable=1 also skips locking and the -wal and -shm files, so a snapshot
+    shared through the cache is read as it was downloaded and is never left
+    with journal files, even if it was written in WAL mode.
+    """
+    return f"{Path(path).resolve().as_uri()}?mode=ro&immutable=1"
+
+
+def attach_read_only(cursor: sqlite3.Cursor, path: str, schema_name: str) -> None:
+    """Attach the database at path to cursor's connection as schema_name, read-only.
+
+    The connection must be opened with uri=True.
+    """
+    cursor.execute(f"ATTACH DATABASE ? AS {schema_name}", (read_only_uri(path),))
+
+
+def clone_database(source_path: str, connection: sqlite3.Connection) -> None:
+    """Replace the database behind connection with a page-level copy of source_path.
+
+    The copy keeps the source's page size, and an in-memory database cannot be
+    vacuumed to another one, so a source with a different page size, such as a
+    snapshot written before PAGE_SIZE was set, is first rewritten with it.
+    """
+    source = sqlite3.connect(read_only_uri(source_path), uri=True)
+    converted_path = None
+    try:
+        page_size = source.execute("PRAGMA page_size").fetchone()[0]
+        if page_size != PAGE_SIZE:
+            converted_path = f"{source_path}.{PAGE_SIZE}"
+            logger.info(
+                f"Rewriting {source_path} from {page_size} to {PAGE_SIZE} byte pages"
+            )
+            Path(converted_path).unlink(missing_ok=True)
+            # VACUUM INTO keeps the page size of an immutable database.
+            source.close()
+            source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+            source.execute(f"PRAGMA page_size = {PAGE_SIZE}")
+            source.execute("VACUUM INTO ?", (converted_path,))
+            source.close()
+            source = sqlite3.connect(read_only_uri(converted_path), uri=True)
+
+        logger.info(f"Cloning {source_path} into the ETL database")
+        source.backup(connection)
+    finally:
+        source.close()
+        if converted_path is not None:
+            Path(converted_path).unlink(missing_ok=True)
@@ -15,7 +15,10 @@ def create_metadata_table(cursor: sqlite3.Cursor):
         CREATE TABLE metadata (
             id INTEGER PRIMARY KEY CHECK (id = 1),
             start_time TEXT,
-            end_time TEXT
+            end_time TEXT,
+            full_rebuild_time TEXT,
+            stage_fingerprints TEXT,
+            row_hashes INTEGER
         )
     """
     )
@@ -32,7 +35,7 @@ def create_geocode_type_code_table(cursor: sqlite3.Cursor):
     logger.info("Creating geocode_type_code table")
     cursor.execute(
         """
-        CREATE TABLE geocode_type_code (
+        CREATE TABLE IF NOT EXISTS geocode_type_code (
             geocode_type_iri TEXT PRIMARY KEY,
             geocode_type_code TEXT NOT NULL
         )
@@ -46,7 +49,7 @@ def create_address_iri_pid_map_table(cursor: sqlite3.Cursor):
     logger.info("Creating address_iri_pid_map table")
     cursor.execute(
         """
-        CREATE TABLE address_iri_pid_map (
+        CREATE TABLE IF NOT EXISTS address_iri_pid_map (
             address_iri TEXT PRIMARY KEY,
             address_pid TEXT NOT NULL
         )
@@ -54,8 +57,37 @@ def create_address_iri_pid_map_table(cursor: sqlite3.Cursor):
     )
     cursor.execute(
         """
-        CREATE INDEX idx_address_iri_pid_map_address_pid
+        CREATE INDEX IF NOT EXISTS idx_address_iri_pid_map_address_pid
         ON address_iri_pid_map (address_pid)
         """
     )
     cursor.connection.commit()
+
+
+def create_run_stats_table(cursor: sqlite3.Cursor):
+    """Create the run stats table.
+
+    This table stores the wall time, rows written, HTTP traffic, retries, peak
+    RSS, commits and traced SQL time of each stage of the ETL run that built
+    the database.
+    """
+    logger.info("Creating run_stats table")
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS run_stats (
+            id INTEGER PRIMARY KEY,
+            stage TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            wall_seconds REAL NOT NULL,
+            rows_written INTEGER NOT NULL,
+            http_requests INTEGER NOT NULL,
+            bytes_received INTEGER NOT NULL,
+            retries INTEGER NOT NULL,
+            peak_rss_bytes INTEGER NOT NULL,
+            commits INTEGER NOT NULL,
+            sql_statements INTEGER NOT NULL,
+            sql_seconds REAL NOT NULL
+        )
+    """
+    )
+    cursor.connection.commit()
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import httpx
+
+from address_etl.settings import settings
+
+PROCESS_NAME = "address_etl"
+
+
+class Timeline:
+    """Spans of a run in the Chrome trace-event format.
+
+    Spans are complete ("X") events on the track of the thread that ran them,
+    so the JSON of to_dict opens in Perfetto or chrome://tracing with stages,
+    HTTP requests, SQLite writes and S3 transfers overlapping on their own
+    threads. Nothing is recorded unless settings.trace_timeline is enabled.
+    """
+
+    def __init__(self) -> None:
+        self.events: list[dict] = []
+        self.threads: dict[int, str] = {}
+        self.origin = time.perf_counter()
+
+    def reset(self) -> None:
+        """Forget the recorded spans, before another run in the same process."""
+        self.__init__()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.trace_timeline
+
+    def add_span(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        end: float,
+        args: dict | None = None,
+    ) -> None:
+        """Record a span between two time.perf_counter readings."""
+        if not self.enabled:
+            return
+
+        thread_id = threading.get_native_id()
+        if thread_id not in self.threads:
+            self.threads[thread_id] = threading.current_thread().name
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self.origin) * 1_000_000,
+            "dur": (end - start) * 1_000_000,
+            "pid": os.getpid(),
+            "tid": thread_id,
+        }
+        if args:
+            event["args"] = args
+        # list.append is atomic, so the S3 transfer threads can record without
+        # a lock.
+        self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, time.perf_counter(), args)
+
+    def http_request_started(self, request: httpx.Request) -> None:
+        """httpx request hook, paired with http_response_received."""
+        request.extensions["timeline_start"] = time.perf_counter()
+
+    def http_response_received(self, response: httpx.Response) -> None:
+        """httpx response hook ending the request's span once its body is read.
+
+        Registered after run_stats.record_http_response, which reads the body.
+        """
+        request = response.request
+        start = request.extensions.get("timeline_start")
+        if start is None:
+            return
+        self.add_span(
+            f"{request.method} {request.url.host}",
+            "http",
+            start,
+            time.perf_counter(),
+            {
+                "url": str(request.url.copy_with(query=None)),
+                "status": response.status_code,
+            },
+        )
+
+    def trace_boto_client(self, client) -> None:
+        """Add a span for each API call of a boto3 client.
+
+        Managed transfers make their part requests from the transfer's worker
+        threads, so each part shows on the track of the thread sending it.
+        """
+        client.meta.events.register("before-call", self._boto_call_started)
+        client.meta.events.register("after-call", self._boto_call_finished)
+
+    def _boto_call_started(self, context: dict, **kwargs) -> None:
+        context["timeline_start"] = time.perf_counter()
+
+    def _boto_call_finished(self, model, context: dict, **kwargs) -> None:
+        start = context.get("timeline_start")
+        if start is not None:
+            self.add_span(model.name, "s3", start, time.perf_counter())
+
+    def to_dict(self) -> dict:
+        pid = os.getpid()
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": pid,
+                "args": {"name": PROCESS_NAME},
+            },
+            *(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": thread_id,
+                    "args": {"name": name},
+                }
+                for thread_id, name in list(self.threads.items())
+            ),
+        ]
+        return {"traceEvents": metadata + list(self.events), "displayTimeUnit": "ms"}
+
+
+timeline = Timeline()
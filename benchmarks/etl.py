@@ -0,0 +1,308 @@
+"""Benchmark main_pls.main end to end against synthetic stand-in services.
+
+Usage:
+
+    uv run --with "moto[s3,dynamodb]" python benchmarks/etl.py --addresses 100000
+
+A child process serves stand-ins for the SPARQL endpoint and the ESRI token,
+layer, count and query endpoints from synthetic data scaled to --addresses,
+with --latency-ms added to every request and --error-rate of the retried
+requests answered with a 503. S3 and DynamoDB are mocked in-process with moto,
+or with --aws local the MinIO and LocalStack services of docker-compose.yml
+are used (create the bucket and lock table with the Taskfile tasks). Kafka
+messages go to a fake producer.
+
+Other ETL settings, such as PLS_DECODE_WORKERS, are read from the environment
+as usual. Each run's wall time, rows written, throughput and peak RSS per stage
+are printed, and written with the commit to --output. Pass the output of an
+earlier commit as --baseline to compare the stage times.
+
+To replay a run recorded with HTTP_ARCHIVE_MODE=record, pass the same --port
+to both runs, since the archive is keyed by URL.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import UTC, datetime
+from pathlib import Path
+
+import stand_ins
+from rich.console import Console
+from rich.table import Table
+
+# main_pls is a script at the root of the repository, not part of the package.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+BUCKET_NAME = "pls-feature-service-etl"
+LOCK_TABLE_NAME = "address-etl-lock"
+
+
+class BenchmarkProducer:
+    """Kafka producer keeping its messages in memory."""
+
+    def __init__(self) -> None:
+        self.messages = []
+        self.callbacks = []
+
+    def produce(self, topic, value=None, headers=None, callback=None) -> None:
+        self.messages.append({"topic": topic, "value": value, "headers": headers})
+        if callback is not None:
+            self.callbacks.append(callback)
+
+    def poll(self, timeout: float | None = None) -> int:
+        return 0
+
+    def flush(self, timeout: float | None = None) -> int:
+        for callback in self.callbacks:
+            callback(None, None)
+        self.callbacks = []
+        return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--addresses", type=int, default=20000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=0,
+        help="Port of the stand-ins, fixed to replay an HTTP archive of a run.",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=1,
+        help="Runs after the first start from the previous run's snapshot.",
+    )
+    parser.add_argument("--aws", choices=("moto", "local"), default="moto")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--verbose", action="store_true", help="Show the ETL's logs.")
+    return parser.parse_args()
+
+
+def configure_environment(port: int, work_dir: str, aws: str) -> set[str]:
+    """Point the ETL's settings at the stand-ins and return the names set."""
+    base_url = f"http://127.0.0.1:{port}"
+    environment = {
+        "SPARQL_ENDPOINT": f"{base_url}{stand_ins.SPARQL_PATH}",
+        "GEOCODE_TYPE_SPARQL_ENDPOINT": f"{base_url}{stand_ins.SPARQL_PATH}",
+        "ESRI_AUTH_URL": f"{base_url}{stand_ins.ESRI_AUTH_PATH}",
+        "ESRI_GEOCODE_REST_API_QUERY_URL": (
+            f"{base_url}{stand_ins.GEOCODE_LAYER_PATH}/query"
+        ),
+        "ESRI_ADDRESS_IRI_PID_MAP_QUERY_URL": (
+            f"{base_url}{stand_ins.ADDRESS_PID_LAYER_PATH}/query"
+        ),
+        "ESRI_USERNAME": "benchmark",
+        "ESRI_PASSWORD": "benchmark",
+        "KAFKA_TOPIC": "benchmark",
+        "PLS_S3_BUCKET_NAME": BUCKET_NAME,
+        "LOCK_TABLE_NAME": LOCK_TABLE_NAME,
+        "PLS_SQLITE_CONN_STR": str(Path(work_dir) / "pls.db"),
+        "DEBUG": "false",
+        "USE_MINIO": "true" if aws == "local" else "false",
+    }
+    if aws == "moto":
+        environment |= {
+            "AWS_ACCESS_KEY_ID": "benchmark",
+            "AWS_SECRET_ACCESS_KEY": "benchmark",
+            "AWS_DEFAULT_REGION": "us-east-1",
+        }
+    os.environ.update(environment)
+    return set(environment)
+
+
+def create_aws_resources() -> None:
+    import boto3
+
+    boto3.client("s3").create_bucket(Bucket=BUCKET_NAME)
+    boto3.client("dynamodb").create_table(
+        TableName=LOCK_TABLE_NAME,
+        BillingMode="PAY_PER_REQUEST",
+        AttributeDefinitions=[{"AttributeName": "lock_id", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "lock_id", "KeyType": "HASH"}],
+    )
+
+
+def git_commit() -> dict:
+    """The commit benchmarked, and whether tracked files were modified."""
+
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout
+
+    try:
+        commit = git("rev-parse", "HEAD").strip()
+        status = git("status", "--porcelain", "--untracked-files=no")
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": bool(status.strip())}
+
+
+def run_etl(run_stats, database_path: Path) -> dict:
+    import main_pls
+    from address_etl.profiling import profile_files
+    from address_etl.sparql_profile import sparql_profiler
+    from address_etl.sql_trace import sql_trace
+    from address_etl.timeline import timeline
+
+    # Each run starts from an empty task, like a scheduled ECS run, so the
+    # reports uploaded by a run only cover that run.
+    database_path.unlink(missing_ok=True)
+    run_stats.stages.clear()
+    sparql_profiler.reset()
+    sql_trace.reset()
+    timeline.reset()
+    profile_files.clear()
+    start = time.perf_counter()
+    main_pls.main()
+    wall_seconds = time.perf_counter() - start
+    return {
+        "wall_seconds": wall_seconds,
+        "stages": [
+            {
+                "stage": stats.stage,
+                "wall_seconds": stats.wall_seconds,
+                "rows_written": stats.rows_written,
+                "rows_per_second": (
+                    stats.rows_written / stats.wall_seconds
+                    if stats.wall_seconds
+                    else 0.0
+                ),
+                "http_requests": stats.http_requests,
+                "bytes_received": stats.bytes_received,
+                "retries": stats.retries,
+                "peak_rss_bytes": stats.peak_rss_bytes,
+            }
+            for stats in run_stats.stages
+        ],
+    }
+
+
+def print_run(console: Console, number: int, run: dict, baseline: dict | None) -> None:
+    table = Table(title=f"Run {number}: {run['wall_seconds']:.2f} seconds")
+    table.add_column("stage", no_wrap=True)
+    columns = ["seconds", "rows", "rows/s", "requests", "retries", "MiB in", "RSS MiB"]
+    if baseline is not None:
+        columns.extend(("baseline seconds", "change"))
+        baseline_seconds = {
+            stage["stage"]: stage["wall_seconds"] for stage in baseline["stages"]
+        }
+    for column in columns:
+        table.add_column(column, justify="right")
+
+    for stage in run["stages"]:
+        cells = [
+            stage["stage"],
+            f"{stage['wall_seconds']:.2f}",
+            str(stage["rows_written"]),
+            f"{stage['rows_per_second']:.0f}",
+            str(stage["http_requests"]),
+            str(stage["retries"]),
+            f"{stage['bytes_received'] / 1024**2:.1f}",
+            f"{stage['peak_rss_bytes'] / 1024**2:.0f}",
+        ]
+        if baseline is not None:
+            before = baseline_seconds.get(stage["stage"])
+            if before:
+                change = (stage["wall_seconds"] - before) / before
+                cells.extend((f"{before:.2f}", f"{change:+.0%}"))
+            else:
+                cells.extend(("", ""))
+        table.add_row(*cells)
+    console.print(table)
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    server = context.Process(
+        target=stand_ins.serve,
+        args=(
+            args.addresses,
+            args.latency_ms / 1000,
+            args.error_rate,
+            args.seed,
+            args.port,
+            sender,
+        ),
+        daemon=True,
+    )
+    server.start()
+    port = receiver.recv()
+
+    with ExitStack() as stack:
+        work_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        configured = configure_environment(port, work_dir, args.aws)
+        # The ETL modules read their settings on import.
+        from address_etl import kafka
+        from address_etl.run_stats import run_stats
+        from address_etl.settings import Settings
+
+        if args.aws == "moto":
+            from moto import mock_aws
+
+            stack.enter_context(mock_aws())
+            create_aws_resources()
+        kafka._producer = BenchmarkProducer()
+
+        database_path = Path(work_dir) / "pls.db"
+        runs = [run_etl(run_stats, database_path) for _ in range(args.runs)]
+    server.terminate()
+
+    console = Console()
+    # Keep the table readable when the output is piped to a file.
+    console.width = max(console.width, 120)
+    baseline_runs = baseline["runs"] if baseline else []
+    for number, run in enumerate(runs, start=1):
+        previous = baseline_runs[number - 1] if number <= len(baseline_runs) else None
+        print_run(console, number, run, previous)
+
+    if args.output:
+        result = {
+            **git_commit(),
+            "started_at": datetime.now(UTC).isoformat(),
+            "python": platform.python_version(),
+            "addresses": args.addresses,
+            "latency_ms": args.latency_ms,
+            "error_rate": args.error_rate,
+            "aws": args.aws,
+            # The ETL settings changed from their defaults for this benchmark.
+            "settings": {
+                name: value
+                for name, value in os.environ.items()
+                if name.lower() in Settings.model_fields and name not in configured
+            },
+            "runs": runs,
+        }
+        args.output.write_text(json.dumps(result, indent=2))
+        console.print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare the JSON decoders on SPARQL results payloads.
+
+Usage:
+
+    uv run python benchmarks/json_decode.py [payload.json ...]
+
+Pass SPARQL JSON responses recorded from the detail queries, for example
+with curl against the endpoint. Without arguments, a synthetic address
+payload of 5000 bindings is used. Decoders that are not installed are
+skipped.
+"""
+
+import importlib.util
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# address_etl.settings requires these, but the benchmark never uses them.
+os.environ.setdefault("SPARQL_ENDPOINT", "http://localhost")
+os.environ.setdefault("ESRI_USERNAME", "")
+os.environ.setdefault("ESRI_PASSWORD", "")
+os.environ.setdefault("KAFKA_TOPIC", "")
+
+from address_etl import json_decode
+from address_etl.json_decode import JSON_DECODERS, iter_sparql_records
+
+REPEAT = 20
+
+
+def synthetic_payload(count: int = 5000) -> bytes:
+    def term(value: str) -> dict[str, str]:
+        return {"type": "literal", "value": value}
+
+    bindings = []
+    for i in range(count):
+        address = f"https://example.com/address/{i}"
+        parcel = f"https://example.com/parcel/{i}"
+        road = f"https://example.com/road/{i % 100}"
+        bindings.append(
+            {
+                "addr_id": term(f"{address}/{road}/{parcel}"),
+                "addr_iri": {"type": "uri", "value": address},
+                "parcel_id": term(parcel),
+                "addr_status_code": term("P"),
+                "street_no_first": term(str(i % 500)),
+                "road_id": term(road),
+                "site_id": term(f"{parcel}|{address}"),
+                "address_standard": term("QLD"),
+            }
+        )
+    payload = {"head": {"vars": []}, "results": {"bindings": bindings}}
+    return json.dumps(payload).encode()
+
+
+def main(paths: list[str]) -> None:
+    payloads = [Path(path).read_bytes() for path in paths] or [synthetic_payload()]
+    size = sum(len(payload) for payload in payloads)
+    print(f"{len(payloads)} payloads, {size / 1024**2:.1f} MiB, {REPEAT} repeats")
+
+    for name in JSON_DECODERS:
+        if importlib.util.find_spec(name) is None:
+            print(f"{name:>8}: not installed")
+            continue
+
+        json_decode.settings.json_decoder = name
+        json_decode.get_json_decoder.cache_clear()
+        json_decode.get_typed_decoder.cache_clear()
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            for payload in payloads:
+                for _record in iter_sparql_records(payload):
+                    pass
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:>8}: {elapsed / REPEAT * 1000:.1f} ms per pass, "
+            f"{size * REPEAT / elapsed / 1024**2:.1f} MiB/s"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,516 @@
+"""Micro-benchmarks of the ETL's inner loops, compared with stored baselines.
+
+Usage:
+
+    uv run python benchmarks/micro.py [--filter geocode] [--save]
+
+Each benchmark runs a hot function on synthetic data sized like one batch of
+a full Queensland run (or, for the whole-table steps, a scaled down table set
+by --scale). Set-up is not timed. The median of --repeat runs is compared with
+benchmarks/baselines/micro.json, and benchmarks slower than --threshold times
+their baseline are reported, exiting with status 1. Baselines depend on the
+machine, so record them with --save on the machine that runs the comparison,
+before the change being judged.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+# address_etl.settings requires these, but the benchmarks never use them.
+os.environ.setdefault("SPARQL_ENDPOINT", "http://localhost")
+os.environ.setdefault("ESRI_USERNAME", "")
+os.environ.setdefault("ESRI_PASSWORD", "")
+os.environ.setdefault("KAFKA_TOPIC", "")
+
+from address_etl.address_iri_pid_map import load_address_pid_mappings
+from address_etl.geocode import (
+    GeocodeLayerSchema,
+    insert_geocodes,
+    normalize_geocode_feature,
+)
+from address_etl.id_map import text_to_id_for_pk
+from address_etl.pls.decode import address_row, decode_rows
+from address_etl.pls.queries import (
+    address,
+    parcel,
+    place_name,
+    road,
+    site,
+)
+from address_etl.pls.tables import (
+    BATCH_SIZE,
+    attach_address_pids,
+    create_tables,
+    optimize_sqlite_for_bulk_inserts,
+    update_geocode_site_id,
+)
+from address_etl.run_stats import run_stats
+from address_etl.sqlite_build import open_build_connection
+from address_etl.sqlite_dict_factory import dict_row_factory
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "micro.json"
+BASE_IRI = "https://linked.data.gov.au/dataset/qld-addr"
+GEOCODE_TYPE_IRI = "https://linked.data.gov.au/def/geocode-types/property-centroid"
+
+# The rows of the whole-table benchmarks at --scale 1.
+TABLE_ROWS = 100_000
+
+
+@dataclass
+class Benchmark:
+    """A function timed on the state returned by a fresh, untimed set-up."""
+
+    name: str
+    setup: Callable[[], Any]
+    run: Callable[[Any], Any]
+    # Rows processed per run, for the throughput column.
+    rows: int
+
+
+def address_iri(i: int) -> str:
+    return f"{BASE_IRI}/address/{i}"
+
+
+def parcel_iri(i: int) -> str:
+    return f"{BASE_IRI}/parcel/{i // 2}SP{i % 997}"
+
+
+def road_iri(i: int) -> str:
+    return f"{BASE_IRI}/road/{i // 40}"
+
+
+def site_id(i: int) -> str:
+    return f"{parcel_iri(i)}|{address_iri(i)}"
+
+
+def connect(path: str = ":memory:") -> sqlite3.Connection:
+    connection = sqlite3.connect(path)
+    connection.row_factory = dict_row_factory
+    return connection
+
+
+def pls_database() -> sqlite3.Cursor:
+    cursor = connect().cursor()
+    create_tables(cursor)
+    # Rows are inserted without the parent rows their foreign keys refer to.
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    return cursor
+
+
+def geocode_schema() -> GeocodeLayerSchema:
+    return GeocodeLayerSchema(
+        object_id_field="objectid",
+        address_pid_field="pid",
+        geocode_type_field="type",
+        geocode_source_field="source",
+        geocode_status_field=None,
+        last_edited_field="last_edited_date",
+    )
+
+
+def esri_features(count: int) -> list[dict]:
+    return [
+        {
+            "attributes": {
+                "objectid": i,
+                "pid": 1_000_000 + i,
+                "type": GEOCODE_TYPE_IRI,
+                "source": "QLD",
+                "last_edited_date": 1767225600000,
+            },
+            "geometry": {"x": 153.0 + i * 1e-6, "y": -27.5 - i * 1e-6},
+        }
+        for i in range(count)
+    ]
+
+
+def address_bindings(count: int) -> list[dict[str, dict[str, str]]]:
+    def term(value: str) -> dict[str, str]:
+        return {"type": "literal", "value": value}
+
+    return [
+        {
+            "addr_id": term(f"{address_iri(i)}/{road_iri(i)}/{parcel_iri(i)}"),
+            "addr_iri": {"type": "uri", "value": address_iri(i)},
+            "parcel_id": term(parcel_iri(i)),
+            "addr_status_code": term("P"),
+            "unit_type": term("UNIT"),
+            "unit_no": term(str(i % 20 + 1)),
+            "street_no_first": term(str(i % 500 + 1)),
+            "road_id": term(road_iri(i)),
+            "site_id": term(site_id(i)),
+            "address_standard": term("QLD"),
+        }
+        for i in range(count)
+    ]
+
+
+def normalize_geocodes_setup(size: int):
+    return esri_features(size), geocode_schema(), {GEOCODE_TYPE_IRI: "PC"}
+
+
+def normalize_geocodes(state) -> None:
+    features, schema, codes = state
+    for feature in features:
+        normalize_geocode_feature(feature, schema, codes)
+
+
+def insert_geocodes_setup(size: int):
+    """An ESRI page where half the geocodes are already in the database."""
+    cursor = pls_database()
+    features = [
+        normalize_geocode_feature(feature, geocode_schema(), {GEOCODE_TYPE_IRI: "PC"})
+        for feature in esri_features(size)
+    ]
+    insert_geocodes(cursor, features[::2])
+    cursor.connection.commit()
+    return cursor, features
+
+
+def run_insert_geocodes(state) -> None:
+    cursor, features = state
+    insert_geocodes(cursor, features)
+    cursor.connection.commit()
+
+
+def decode_address_rows_setup(size: int):
+    """A SPARQL JSON response of one address batch and its PID mappings."""
+    content = json.dumps({"results": {"bindings": address_bindings(size)}}).encode()
+    # One in fifty addresses has no PID mapping yet.
+    lookup = {address_iri(i): str(1_000_000 + i) for i in range(size) if i % 50 != 0}
+    return content, lookup
+
+
+def run_decode_address_rows(state) -> None:
+    content, lookup = state
+    rows, _ = decode_rows(address_row, content)
+    for _ in attach_address_pids(rows, lookup, []):
+        pass
+
+
+def address_pid_map_setup(size: int):
+    cursor = pls_database()
+    cursor.executemany(
+        "INSERT INTO address_iri_pid_map (address_iri, address_pid) VALUES (?, ?)",
+        ((address_iri(i), str(1_000_000 + i)) for i in range(size)),
+    )
+    cursor.connection.commit()
+    return cursor, [address_iri(i) for i in range(0, size, size // BATCH_SIZE)]
+
+
+def load_batch_pid_mappings(state) -> None:
+    cursor, batch = state
+    load_address_pid_mappings(cursor, batch)
+
+
+def load_all_pid_mappings(state) -> None:
+    cursor, _ = state
+    load_address_pid_mappings(cursor)
+
+
+def text_to_id_setup(size: int):
+    """lf_parcel rows of a first run, so every identifier is new."""
+    cursor = pls_database()
+    cursor.executemany(
+        "INSERT INTO lf_parcel (parcel_id, plan_no, lot_no) VALUES (?, ?, ?)",
+        ((parcel_iri(i * 2), f"SP{i % 997}", str(i)) for i in range(size)),
+    )
+    cursor.connection.commit()
+    return cursor
+
+
+def run_text_to_id(cursor: sqlite3.Cursor) -> None:
+    text_to_id_for_pk("lf_parcel_id_map", "lf_parcel", "parcel_id", cursor)
+
+
+def geocode_site_id_setup(size: int):
+    """Addresses with geocodes, a tenth of them not yet linked to their site."""
+    cursor = pls_database()
+    cursor.executemany(
+        "INSERT INTO lf_address (addr_id, address_pid, parcel_id, addr_status_code, "
+        "road_id, site_id, address_standard) VALUES (?, ?, ?, 'P', ?, ?, 'QLD')",
+        (
+            (address_iri(i), str(i), parcel_iri(i), road_iri(i), site_id(i))
+            for i in range(size)
+        ),
+    )
+    cursor.executemany(
+        "INSERT INTO lf_geocode_sp_survey_point (geocode_id, geocode_type, "
+        "address_pid, site_id, centoid_lat, centoid_lon) VALUES (?, 'PC', ?, ?, 0, 0)",
+        ((str(i), str(i), None if i % 10 == 0 else site_id(i)) for i in range(size)),
+    )
+    cursor.connection.commit()
+    return cursor
+
+
+def run_update_geocode_site_id(cursor: sqlite3.Cursor) -> None:
+    update_geocode_site_id(cursor)
+    # The stage is recorded on every run; keep the singleton from growing.
+    run_stats.stages.clear()
+
+
+def query_keys(size: int) -> dict[str, list]:
+    return {
+        "address": [
+            {
+                "addr_iri": address_iri(i),
+                "parcel_id": parcel_iri(i),
+                "road": road_iri(i),
+                "locality_code": "10001",
+                "_road_name": f"Synthetic {i // 40}",
+            }
+            for i in range(size)
+        ],
+        "road": [
+            {
+                "road": road_iri(i * 40),
+                "locality_code": "10001",
+                "_road_name": f"Synthetic {i}",
+            }
+            for i in range(size)
+        ],
+        "parcel": [parcel_iri(i * 2) for i in range(size)],
+        "site": [
+            {"parcel_id": parcel_iri(i), "address": address_iri(i)} for i in range(size)
+        ],
+        "place_name": [
+            {"parcel_id": parcel_iri(i), "addr_iri": address_iri(i)}
+            for i in range(size)
+        ],
+        "addr_iris": [address_iri(i) for i in range(size)],
+    }
+
+
+def render_detail_queries(keys: dict[str, list]) -> None:
+    address.get_query(keys["address"])
+    road.get_query(keys["road"])
+    parcel.get_query(keys["parcel"])
+    site.get_query(keys["site"])
+    place_name.get_query(keys["place_name"])
+
+
+def render_discovery_queries(keys: dict[str, list]) -> None:
+    for module in (address, road, site, place_name):
+        module.get_query_iris_only(addr_iris=keys["addr_iris"])
+
+
+def bulk_insert_setup(profile: str, size: int):
+    """lf_address rows to insert into a database under a pragma profile.
+
+    The database is a file, since the journal and sync pragmas only matter on
+    disk: "default" is SQLite's defaults, "bulk" is
+    optimize_sqlite_for_bulk_inserts and "fast_build" is open_build_connection.
+    """
+    directory = tempfile.TemporaryDirectory()
+    path = str(Path(directory.name) / "pls.db")
+    if profile == "fast_build":
+        connection = open_build_connection(path)
+        connection.row_factory = dict_row_factory
+    else:
+        connection = connect(path)
+    cursor = connection.cursor()
+    create_tables(cursor)
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    if profile == "bulk":
+        optimize_sqlite_for_bulk_inserts(cursor)
+    rows = [
+        (
+            address_iri(i),
+            str(1_000_000 + i),
+            parcel_iri(i),
+            "P",
+            str(i % 500 + 1),
+            road_iri(i),
+            site_id(i),
+            "QLD",
+        )
+        for i in range(size)
+    ]
+    return directory, cursor, rows
+
+
+def run_bulk_insert(state) -> None:
+    directory, cursor, rows = state
+    for offset in range(0, len(rows), BATCH_SIZE):
+        cursor.executemany(
+            "INSERT INTO lf_address (addr_id, address_pid, parcel_id, "
+            "addr_status_code, street_no_first, road_id, site_id, address_standard) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows[offset : offset + BATCH_SIZE],
+        )
+        cursor.connection.commit()
+    cursor.connection.close()
+    directory.cleanup()
+
+
+def benchmarks(scale: float) -> list[Benchmark]:
+    table_rows = max(int(TABLE_ROWS * scale), BATCH_SIZE)
+
+    return [
+        Benchmark(
+            "normalize_geocode_feature",
+            lambda: normalize_geocodes_setup(BATCH_SIZE),
+            normalize_geocodes,
+            BATCH_SIZE,
+        ),
+        Benchmark(
+            "insert_geocodes",
+            lambda: insert_geocodes_setup(BATCH_SIZE),
+            run_insert_geocodes,
+            BATCH_SIZE,
+        ),
+        Benchmark(
+            "decode_rows[address]",
+            lambda: decode_address_rows_setup(BATCH_SIZE),
+            run_decode_address_rows,
+            BATCH_SIZE,
+        ),
+        Benchmark(
+            "load_address_pid_mappings[batch]",
+            lambda: address_pid_map_setup(table_rows),
+            load_batch_pid_mappings,
+            BATCH_SIZE,
+        ),
+        Benchmark(
+            "load_address_pid_mappings[all]",
+            lambda: address_pid_map_setup(table_rows),
+            load_all_pid_mappings,
+            table_rows,
+        ),
+        Benchmark(
+            "queries.get_query",
+            lambda: query_keys(BATCH_SIZE),
+            render_detail_queries,
+            5 * BATCH_SIZE,
+        ),
+        Benchmark(
+            "queries.get_query_iris_only",
+            lambda: query_keys(BATCH_SIZE),
+            render_discovery_queries,
+            4 * BATCH_SIZE,
+        ),
+        Benchmark(
+            "text_to_id_for_pk",
+            lambda: text_to_id_setup(table_rows),
+            run_text_to_id,
+            table_rows,
+        ),
+        Benchmark(
+            "update_geocode_site_id",
+            lambda: geocode_site_id_setup(table_rows),
+            run_update_geocode_site_id,
+            table_rows,
+        ),
+        *(
+            Benchmark(
+                f"bulk_insert[{profile}]",
+                lambda profile=profile: bulk_insert_setup(profile, table_rows),
+                run_bulk_insert,
+                table_rows,
+            )
+            for profile in ("default", "bulk", "fast_build")
+        ),
+    ]
+
+
+def time_benchmark(benchmark: Benchmark, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        state = benchmark.setup()
+        start = time.perf_counter()
+        benchmark.run(state)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help=f"Scale the {TABLE_ROWS} rows of the whole-table benchmarks.",
+    )
+    parser.add_argument(
+        "--filter", default="", help="Run the benchmarks whose name contains this."
+    )
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--save", action="store_true", help="Record the results as the baseline."
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if stored.get("scale", args.scale) != args.scale:
+        print(f"Baseline was recorded at --scale {stored['scale']}; not comparing")
+        stored = {}
+    baseline = stored.get("benchmarks", {})
+
+    results = {}
+    slower = []
+    print(f"{'benchmark':<34} {'median ms':>10} {'rows/s':>12} {'baseline':>10}")
+    for benchmark in benchmarks(args.scale):
+        if args.filter not in benchmark.name:
+            continue
+        timings = time_benchmark(benchmark, args.repeat)
+        median = statistics.median(timings)
+        results[benchmark.name] = {
+            "median_seconds": median,
+            "min_seconds": min(timings),
+            "rows": benchmark.rows,
+        }
+
+        comparison = ""
+        before = baseline.get(benchmark.name)
+        if before:
+            factor = median / before["median_seconds"]
+            comparison = f"{factor:.2f}x"
+            if factor > args.threshold:
+                slower.append(benchmark.name)
+                comparison += " slower"
+        print(
+            f"{benchmark.name:<34} {median * 1000:>10.1f} "
+            f"{benchmark.rows / median:>12,.0f} {comparison:>10}"
+        )
+
+    if args.save:
+        # Keep the baselines of benchmarks left out by --filter.
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "sqlite": sqlite3.sqlite_version,
+                    "machine": platform.machine(),
+                    "scale": args.scale,
+                    "benchmarks": baseline | results,
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        print(f"Wrote {args.baseline}")
+    elif slower:
+        print(f"Slower than {args.threshold}x the baseline: {', '.join(slower)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,418 @@
+"""Synthetic stand-ins for the SPARQL endpoint and the ESRI services.
+
+Used by benchmarks/etl.py. The server answers the ETL's discovery and detail
+SPARQL queries and the ESRI token, layer, count and query requests from
+synthetic data scaled to a number of addresses. Queries are recognised by the
+variables they select, and detail queries are answered for the keys in their
+VALUES block, so the data stays consistent across stages.
+"""
+
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+BASE_IRI = "https://example.com/benchmark"
+SPARQL_PATH = "/sparql"
+ESRI_AUTH_PATH = "/arcgis/sharing/rest/generateToken"
+GEOCODE_LAYER_PATH = "/arcgis/rest/services/Geocodes/FeatureServer/0"
+ADDRESS_PID_LAYER_PATH = "/arcgis/rest/services/AddressPids/FeatureServer/0"
+LAST_EDIT_DATE = 1767225600000
+
+ADDRESSES_PER_PARCEL = 2
+ADDRESSES_PER_ROAD = 40
+ROADS_PER_LOCALITY = 25
+LOCALITIES_PER_LGA = 20
+PLACE_NAME_EVERY = 10
+
+_values = re.compile(r"VALUES\s*(\([^)]*\)|\?\w+)\s*\{(.*?)\}", re.DOTALL)
+_row = re.compile(r"\(([^)]*)\)")
+_term = re.compile(r'<([^>]*)>|"([^"]*)"')
+
+
+def uri(value: str) -> dict[str, str]:
+    return {"type": "uri", "value": value}
+
+
+def literal(value: str) -> dict[str, str]:
+    return {"type": "literal", "value": value}
+
+
+def iri_index(iri: str) -> int:
+    return int(iri.rsplit("/", 1)[1])
+
+
+def parse_values(query: str) -> list[tuple[str, ...]] | None:
+    """The rows of the query's first VALUES block, or None without one."""
+    match = _values.search(query)
+    if match is None:
+        return None
+
+    variables, body = match.groups()
+    if variables.startswith("("):
+        return [
+            tuple(iri or text for iri, text in _term.findall(row))
+            for row in _row.findall(body)
+        ]
+    return [(iri or text,) for iri, text in _term.findall(body)]
+
+
+class SyntheticData:
+    """Addresses numbered 0 to addresses - 1 with their parcels, roads and localities.
+
+    Every address has a PID mapping and a geocode, and every tenth address
+    has a place name.
+    """
+
+    def __init__(self, addresses: int) -> None:
+        self.addresses = addresses
+        self.roads = self.road(addresses - 1) + 1
+        self.localities = self.locality(self.roads - 1) + 1
+        self.lgas = (self.localities - 1) // LOCALITIES_PER_LGA + 1
+
+    def parcel(self, i: int) -> int:
+        return i // ADDRESSES_PER_PARCEL
+
+    def road(self, i: int) -> int:
+        return i // ADDRESSES_PER_ROAD
+
+    def locality(self, road: int) -> int:
+        return road // ROADS_PER_LOCALITY
+
+    def address_iri(self, i: int) -> str:
+        return f"{BASE_IRI}/address/{i}"
+
+    def parcel_iri(self, parcel: int) -> str:
+        return f"{BASE_IRI}/parcel/{parcel}"
+
+    def road_iri(self, road: int) -> str:
+        return f"{BASE_IRI}/road/{road}"
+
+    def road_name(self, road: int) -> str:
+        return f"Synthetic {road}"
+
+    def locality_code(self, locality: int) -> str:
+        return str(10000 + locality)
+
+    def la_code(self, lga: int) -> str:
+        return str(100 + lga)
+
+    def address_pid(self, i: int) -> str:
+        return str(1_000_000 + i)
+
+    def address_indices(self, keys: list[tuple[str, ...]] | None) -> list[int]:
+        """Addresses a discovery query is restricted to by its VALUES block."""
+        if keys is None:
+            return list(range(self.addresses))
+
+        indices = set()
+        for iri, *_ in keys:
+            if "/address/" in iri:
+                indices.add(iri_index(iri))
+            elif "/parcel/" in iri:
+                first = iri_index(iri) * ADDRESSES_PER_PARCEL
+                indices.update(range(first, first + ADDRESSES_PER_PARCEL))
+        return sorted(i for i in indices if i < self.addresses)
+
+    def road_key(self, road: int) -> dict:
+        return {
+            "road": uri(self.road_iri(road)),
+            "locality_code": literal(self.locality_code(self.locality(road))),
+            "_road_name": literal(self.road_name(road)),
+        }
+
+    def address_key(self, i: int) -> dict:
+        return {
+            "addr_iri": uri(self.address_iri(i)),
+            "parcel_id": uri(self.parcel_iri(self.parcel(i))),
+            **self.road_key(self.road(i)),
+        }
+
+    def local_auth(self) -> list[dict]:
+        return [
+            {"la_code": literal(self.la_code(lga)), "lga_name": literal(f"LGA {lga}")}
+            for lga in range(self.lgas)
+        ]
+
+    def locality_rows(self) -> list[dict]:
+        return [
+            {
+                "locality_code": literal(self.locality_code(locality)),
+                "locality_name": literal(f"LOCALITY {locality}"),
+                "locality_type": literal("L"),
+                "la_code": literal(self.la_code(locality // LOCALITIES_PER_LGA)),
+                "state": literal("QLD"),
+                "status": literal("G"),
+            }
+            for locality in range(self.localities)
+        ]
+
+    def road_discovery(self, indices: list[int]) -> list[dict]:
+        return [self.road_key(road) for road in sorted({self.road(i) for i in indices})]
+
+    def road_detail(self, road: str, locality_code: str, road_name: str) -> dict:
+        return {
+            "road_id": literal(f"{road}/{locality_code}/{road_name.upper()}"),
+            "road_name": literal(road_name.upper()),
+            "road_name_type": literal("ST"),
+            "locality_code": literal(locality_code),
+            "road_cat_desc": literal("P"),
+        }
+
+    def parcel_discovery(self, indices: list[int]) -> list[dict]:
+        parcels = sorted({self.parcel(i) for i in indices})
+        return [{"parcel_id": uri(self.parcel_iri(parcel))} for parcel in parcels]
+
+    def parcel_detail(self, parcel_id: str) -> dict:
+        parcel = iri_index(parcel_id)
+        return {
+            "parcel_id": uri(parcel_id),
+            "plan_no": literal(f"SP{parcel // 100}"),
+            "lot_no": literal(str(parcel % 100 + 1)),
+        }
+
+    def site_discovery(self, indices: list[int]) -> list[dict]:
+        return [
+            {
+                "parcel_id": uri(self.parcel_iri(self.parcel(i))),
+                "address": uri(self.address_iri(i)),
+            }
+            for i in indices
+        ]
+
+    def site_detail(self, parcel_id: str, address: str) -> dict:
+        return {
+            "site_id": literal(f"{parcel_id}|{address}"),
+            "site_type": literal("P"),
+            "parcel_id": uri(parcel_id),
+        }
+
+    def place_name_discovery(self, indices: list[int]) -> list[dict]:
+        return [
+            {
+                "parcel_id": uri(self.parcel_iri(self.parcel(i))),
+                "addr_iri": uri(self.address_iri(i)),
+            }
+            for i in indices
+            if i % PLACE_NAME_EVERY == 0
+        ]
+
+    def place_name_detail(self, parcel_id: str, addr_iri: str) -> dict:
+        i = iri_index(addr_iri)
+        return {
+            "place_name_id": literal(
+                f"{BASE_IRI}/place-name/{i}|{parcel_id}|{addr_iri}"
+            ),
+            "pl_name_status_code": literal("P"),
+            "pl_name_type_code": literal("PROP"),
+            "pl_name": literal(f"PLACE {i}"),
+            "site_id": literal(f"{parcel_id}|{addr_iri}"),
+        }
+
+    def address_discovery(self, indices: list[int]) -> list[dict]:
+        return [self.address_key(i) for i in indices]
+
+    def address_detail(
+        self,
+        addr_iri: str,
+        parcel_id: str,
+        road: str,
+        locality_code: str,
+        road_name: str,
+    ) -> dict:
+        i = iri_index(addr_iri)
+        road_id = f"{road}/{locality_code}/{road_name.upper()}"
+        return {
+            "addr_iri": uri(addr_iri),
+            "parcel_id": uri(parcel_id),
+            "addr_id": literal(f"{addr_iri}/{road_id}/{parcel_id}"),
+            "addr_status_code": literal("P"),
+            "street_no_first": literal(str(i % ADDRESSES_PER_ROAD + 1)),
+            "road_id": literal(road_id),
+            "site_id": literal(f"{parcel_id}|{addr_iri}"),
+            "address_standard": literal("RURAL" if i % 7 == 0 else "URBAN"),
+        }
+
+    def graph_counts(self, graphs: list[tuple[str, ...]]) -> list[dict]:
+        return [
+            {"graph": uri(graph), "count": literal(str(self.addresses * 20))}
+            for (graph,) in graphs
+        ]
+
+    def answer_sparql(self, query: str) -> list[dict]:
+        """The bindings of the ETL query, recognised by the variables it selects."""
+        select = query[query.index("SELECT") : query.index("WHERE")]
+        keys = parse_values(query)
+        if "?lga_name" in select:
+            return self.local_auth()
+        if "?locality_name" in select:
+            return self.locality_rows()
+        if "?count" in select:
+            return self.graph_counts(keys or [])
+        if "?changed_time" in query or "?code" in select:
+            # Nothing has changed since the previous run, and the geocode
+            # types are already codes.
+            return []
+        if "AS ?road_id" in select:
+            return [self.road_detail(*key) for key in keys]
+        if "?plan_no" in select:
+            return [self.parcel_detail(*key) for key in keys]
+        if "?site_type" in select:
+            return [self.site_detail(*key) for key in keys]
+        if "?place_name_id" in select:
+            return [self.place_name_detail(*key) for key in keys]
+        if "?addr_status_code" in select:
+            return [self.address_detail(*key) for key in keys]
+
+        indices = self.address_indices(keys)
+        if "?addr_iri" in select and "?road" in select:
+            return self.address_discovery(indices)
+        if "?road" in select:
+            return self.road_discovery(indices)
+        if "?addr_iri" in select:
+            return self.place_name_discovery(indices)
+        if "?address" in select:
+            return self.site_discovery(indices)
+        if "?parcel_id" in select:
+            return self.parcel_discovery(indices)
+        raise ValueError(f"Unrecognised SPARQL query selecting {select.strip()}")
+
+    def layer(self, path: str) -> dict:
+        if path == GEOCODE_LAYER_PATH:
+            fields = ("objectid", "address_pid", "geocode_type", "last_edited_date")
+        else:
+            fields = ("objectid", "iri", "pid", "last_edited_date")
+        return {
+            "objectIdField": "objectid",
+            "fields": [{"name": name} for name in fields],
+            "editingInfo": {"lastEditDate": LAST_EDIT_DATE},
+        }
+
+    def features(self, path: str, offset: int, count: int) -> list[dict]:
+        indices = range(offset, min(offset + count, self.addresses))
+        if path == GEOCODE_LAYER_PATH:
+            return [
+                {
+                    "attributes": {
+                        "objectid": i + 1,
+                        "address_pid": self.address_pid(i),
+                        "geocode_type": "PC" if i % 3 else "BC",
+                    },
+                    "geometry": {
+                        "x": 153.0 + i % 1000 / 10000,
+                        "y": -27.0 - i // 1000 / 10000,
+                    },
+                }
+                for i in indices
+            ]
+        return [
+            {
+                "attributes": {
+                    "objectid": i + 1,
+                    "iri": self.address_iri(i),
+                    "pid": self.address_pid(i),
+                }
+            }
+            for i in indices
+        ]
+
+    def answer_esri(self, path: str, params: dict[str, str]) -> dict:
+        if path == ESRI_AUTH_PATH:
+            return {"token": "benchmark", "expires": LAST_EDIT_DATE}
+        if path in (GEOCODE_LAYER_PATH, ADDRESS_PID_LAYER_PATH):
+            return self.layer(path)
+
+        layer_path = path.removesuffix("/query")
+        if params.get("returnCountOnly") == "true":
+            # Incremental runs ask for the features edited since the previous
+            # run, and nothing has been.
+            return {"count": self.addresses if params["where"] == "1=1" else 0}
+        return {
+            "features": self.features(
+                layer_path,
+                int(params.get("resultOffset", 0)),
+                int(params.get("resultRecordCount", self.addresses)),
+            )
+        }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    data: SyntheticData
+    latency: float = 0.0
+    error_rate: float = 0.0
+    random: random.Random
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        self.answer(url.path, {k: v[-1] for k, v in parse_qs(url.query).items()}, b"")
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if self.headers.get("Content-Type", "").startswith(
+            "application/x-www-form-urlencoded"
+        ):
+            params |= {k: v[-1] for k, v in parse_qs(body.decode()).items()}
+        self.answer(url.path, params, body)
+
+    def answer(self, path: str, params: dict[str, str], body: bytes) -> None:
+        time.sleep(self.latency)
+        if path == SPARQL_PATH:
+            query = params.get("query") or body.decode()
+            retried = True
+        else:
+            query = None
+            # Only the feature pages are retried by the ETL.
+            retried = path.endswith("/query") and "resultOffset" in params
+        if retried and self.random.random() < self.error_rate:
+            self.send_error(503, "Injected error")
+            return
+
+        try:
+            if query is not None:
+                payload = {
+                    "head": {"vars": []},
+                    "results": {"bindings": self.data.answer_sparql(query)},
+                }
+            else:
+                payload = self.data.answer_esri(path, params)
+        except (ValueError, KeyError) as error:
+            self.send_error(400, str(error))
+            return
+
+        content = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def serve(
+    addresses: int, latency: float, error_rate: float, seed: int, port: int, ready
+) -> None:
+    """Serve the stand-ins on port, or any free port for 0, until terminated.
+
+    Runs in a child process, so the servers do not compete with the ETL for
+    the GIL. The port is sent on the ready connection once listening.
+    """
+    handler = type(
+        "Handler",
+        (StandInHandler,),
+        {
+            "data": SyntheticData(addresses),
+            "latency": latency,
+            "error_rate": error_rate,
+            "random": random.Random(seed),
+        },
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    ready.send(server.server_address[1])
+    server.serve_forever()
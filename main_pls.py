@@ -1,6 +1,9 @@
+import json
 import logging
+import os
 import sqlite3
 import time
+from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
 
@@ -9,20 +12,71 @@ import pytz
 
 from address_etl.address_iri_pid_map import import_address_pid_mappings
 from address_etl.dynamodb_lock import get_lock
+from address_etl.fingerprint import StageFingerprints
 from address_etl.geocode import import_geocodes
+from address_etl.http_archive import close_http_archive, pinned_value
 from address_etl.kafka import publish_presigned_url
-from address_etl.metadata import metadata_write_end_time, metadata_write_start_time
+from address_etl.metadata import (
+    metadata_read_full_rebuild_time,
+    metadata_read_row_hashes,
+    metadata_read_stage_fingerprints,
+    metadata_read_start_time,
+    metadata_write_end_time,
+    metadata_write_full_rebuild_time,
+    metadata_write_row_hashes,
+    metadata_write_stage_fingerprints,
+    metadata_write_start_time,
+)
+from address_etl.metrics_server import start_metrics_server
+from address_etl.pls.changeset import (
+    build_changeset,
+    clear_row_hashes,
+    populate_row_hashes,
+    register_row_hash,
+)
+from address_etl.pls.incremental import (
+    is_incremental_run,
+    populate_tables_incremental,
+)
 from address_etl.pls.tables import (
+    CARRIED_OVER_TABLES,
+    INCREMENTAL_CARRIED_OVER_TABLES,
     create_tables,
+    get_reused_tables,
     populate_tables,
     prune_geocodes_without_addresses,
+    reset_rebuilt_tables,
 )
-from address_etl.s3 import S3, download_file, get_latest_file, upload_file
+from address_etl.profiling import profile_files
+from address_etl.regressions import Regression, find_regressions, read_stage_totals
+from address_etl.run_stats import RunStatsConnection, run_stats, write_run_stats
+from address_etl.s3 import (
+    S3,
+    ZSTD_SUFFIX,
+    download_file,
+    get_latest_file,
+    upload_compressed_file,
+    upload_file,
+    write_latest_manifest,
+)
+from address_etl.s3_vfs import copy_tables_from_s3
 from address_etl.settings import settings
+from address_etl.snapshot_cache import get_cached_file
+from address_etl.sparql_profile import sparql_profiler
+from address_etl.sqlite_build import (
+    IN_MEMORY,
+    attach_read_only,
+    checkpoint_database,
+    clone_database,
+    open_build_connection,
+    persist_database,
+)
 from address_etl.sqlite_dict_factory import dict_row_factory
 from address_etl.time_convert import utc_to_brisbane_time
+from address_etl.timeline import timeline
 
 PREVIOUS_DB_PATH = "/tmp/pls_previous.db"
+CHANGESET_DB_PATH = "/tmp/pls_changeset.db"
 S3_FILE_PREFIX_KEY = "pls-etl/"
 LOCK_ID = "address-etl-pls"
 
@@ -43,8 +97,13 @@ def build_artifact_headers(
     s3_bucket: str,
     s3_key: str,
     presigned_url_expiry_seconds: int,
+    content_encoding: str = "identity",
+    artifact_size_bytes: int | None = None,
+    artifact_uncompressed_size_bytes: int | None = None,
+    changeset_s3_key: str | None = None,
+    regressions: list[Regression] | None = None,
 ) -> dict[str, str]:
-    return {
+    headers = {
         "etl-name": "pls",
         "etl-started-at": format_kafka_timestamp(etl_started_at),
         "etl-finished-at": format_kafka_timestamp(etl_finished_at),
@@ -53,7 +112,129 @@ def build_artifact_headers(
         "s3-bucket": s3_bucket,
         "s3-key": s3_key,
         "presigned-url-expiry-seconds": str(presigned_url_expiry_seconds),
+        "artifact-content-encoding": content_encoding,
+    }
+    if artifact_size_bytes is not None:
+        headers["artifact-size-bytes"] = str(artifact_size_bytes)
+    if artifact_uncompressed_size_bytes is not None:
+        headers["artifact-uncompressed-size-bytes"] = str(
+            artifact_uncompressed_size_bytes
+        )
+    if changeset_s3_key is not None:
+        headers["changeset-s3-key"] = changeset_s3_key
+    if regressions:
+        headers["performance-regressions"] = ", ".join(map(str, regressions))
+    return headers
+
+
+def get_previous_tables_to_read() -> tuple[str, ...]:
+    """The tables read from the previous ETL's database with the enabled options.
+
+    The previous database is attached to the ETL's sqlite3 connection, which
+    cannot read through the S3 VFS, so these tables are copied in full. The
+    carried-over tables are copied into the new database whole anyway; what is
+    saved are the tables rebuilt every run that the options do not reuse.
+    """
+    table_names = ["metadata", "run_stats", *CARRIED_OVER_TABLES]
+    if settings.pls_incremental_sparql:
+        table_names.extend(INCREMENTAL_CARRIED_OVER_TABLES)
+    table_names.extend(get_reused_tables())
+    return tuple(dict.fromkeys(table_names))
+
+
+def upload_artifact(s3: S3, s3_key: str, file_path: str) -> tuple[str, str, int]:
+    """Upload an ETL artifact, compressing it with zstd if configured.
+
+    Returns the uploaded S3 key, its presigned URL and the uploaded size in bytes.
+    """
+    if settings.compress_artifact:
+        s3_key += ZSTD_SUFFIX
+        presigned_url, size = upload_compressed_file(
+            settings.pls_s3_bucket_name,
+            s3_key,
+            file_path,
+            s3,
+            compression_level=settings.artifact_compression_level,
+            presigned_url_expiry_seconds=settings.s3_presigned_url_expiry_seconds,
+        )
+        return s3_key, presigned_url, size
+
+    presigned_url = upload_file(
+        settings.pls_s3_bucket_name,
+        s3_key,
+        file_path,
+        s3,
+        presigned_url_expiry_seconds=settings.s3_presigned_url_expiry_seconds,
+    )
+    return s3_key, presigned_url, os.path.getsize(file_path)
+
+
+def upload_run_stats(
+    s3: S3,
+    s3_key: str,
+    *,
+    etl_started_at: datetime,
+    etl_finished_at: datetime,
+    artifact_s3_key: str,
+    regressions: list[Regression] | None = None,
+) -> None:
+    """Upload the run's stage stats as JSON next to the snapshot."""
+    report = {
+        "etl-started-at": format_kafka_timestamp(etl_started_at),
+        "etl-finished-at": format_kafka_timestamp(etl_finished_at),
+        "s3-key": artifact_s3_key,
+        **run_stats.to_dict(),
+        "regressions": [
+            {**asdict(regression), "factor": regression.factor}
+            for regression in regressions or []
+        ],
     }
+    logger.info(f"Uploading run stats to {s3_key}")
+    s3.create_object(
+        settings.pls_s3_bucket_name, s3_key, json.dumps(report, indent=2).encode()
+    )
+
+
+def upload_profiles(s3: S3, s3_prefix: str) -> None:
+    """Upload the reports of the profiled stages under s3_prefix."""
+    for path in profile_files:
+        logger.info(f"Uploading profile {path} to {s3_prefix}")
+        s3.create_object(
+            settings.pls_s3_bucket_name, f"{s3_prefix}{path.name}", path.read_bytes()
+        )
+
+
+def upload_sparql_slow_batches(s3: S3, s3_key: str) -> None:
+    """Upload the ranked report of the run's slowest SPARQL batches."""
+    if not sparql_profiler.batches:
+        return
+
+    logger.info(f"Uploading SPARQL slow-batch report to {s3_key}")
+    s3.create_object(
+        settings.pls_s3_bucket_name,
+        s3_key,
+        json.dumps(sparql_profiler.report(), indent=2).encode(),
+    )
+
+
+def upload_timeline(s3: S3, s3_key: str) -> None:
+    """Upload the run's Chrome trace-event timeline, to open in Perfetto."""
+    if not timeline.events:
+        return
+
+    logger.info(f"Uploading timeline to {s3_key}")
+    s3.create_object(
+        settings.pls_s3_bucket_name, s3_key, json.dumps(timeline.to_dict()).encode()
+    )
+
+
+def upload_http_archive(s3: S3, s3_key: str) -> None:
+    """Upload the run's recorded HTTP exchanges, to replay the run elsewhere."""
+    if settings.http_archive_mode != "record":
+        return
+
+    close_http_archive()
+    upload_file(settings.pls_s3_bucket_name, s3_key, settings.http_archive_path, s3)
 
 
 def main():
@@ -79,13 +260,26 @@ def main():
 
     with lock.acquire():
         etl_started_at = datetime.now(pytz.UTC)
+        # Whether the run is incremental depends on its start time.
+        etl_started_at = etl_started_at.fromisoformat(
+            pinned_value("etl_started_at", etl_started_at.isoformat())
+        )
         etl_started_at_brisbane = utc_to_brisbane_time(etl_started_at)
         etl_started_at_str = etl_started_at_brisbane.strftime("%Y-%m-%dT%H:%M:%S%z")
 
-        # Create database directory.
-        Path(settings.pls_sqlite_conn_str).parent.mkdir(parents=True, exist_ok=True)
-        connection = sqlite3.connect(settings.pls_sqlite_conn_str)
+        if settings.pls_sqlite_fast_build:
+            connection = open_build_connection(
+                settings.pls_sqlite_build_path, factory=RunStatsConnection
+            )
+        else:
+            # Create database directory.
+            Path(settings.pls_sqlite_conn_str).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                settings.pls_sqlite_conn_str, factory=RunStatsConnection, uri=True
+            )
         connection.row_factory = dict_row_factory
+        run_stats.attach(connection)
+        register_row_hash(connection)
 
         # Create S3 client.
         s3 = S3(settings)
@@ -94,131 +288,331 @@ def main():
                 f"S3 bucket {settings.pls_s3_bucket_name} does not exist."
             )
 
+        metrics_server = None
+        if settings.metrics_port is not None:
+            metrics_server = start_metrics_server(settings.metrics_port)
+
         try:
             cursor = connection.cursor()
-            create_tables(cursor)
-            metadata_write_start_time(cursor, etl_started_at_str)
             # Get the previous ETL's sqlite database from S3
             previous_db = get_latest_file(
                 settings.pls_s3_bucket_name, s3, prefix=S3_FILE_PREFIX_KEY
             )
+            # The ESRI where clauses and reused rows depend on the previous run.
+            previous_db = pinned_value("previous_db", previous_db or "") or None
             previous_etl_start_time = None
-            if previous_db:
-                download_file(
-                    settings.pls_s3_bucket_name, previous_db, PREVIOUS_DB_PATH, s3
-                )
+            previous_full_rebuild_time = None
+            fingerprints = StageFingerprints()
+            previous_row_hashes = False
+            previous_stage_totals = {}
+            incremental = False
+            previous_db_path = PREVIOUS_DB_PATH
+            if previous_db and previous_db.endswith(ZSTD_SUFFIX):
+                # Compressed snapshots cannot be read with range requests.
+                range_reads = False
+            elif settings.build_changeset:
+                # The changeset diffs every row of the hashed tables, which
+                # is most of the file, so one download is cheaper.
+                range_reads = False
+            else:
+                range_reads = settings.previous_db_range_reads
 
-                # Attach the previous ETL's sqlite database to the connection.
-                cursor.execute("ATTACH DATABASE ? AS previous", (PREVIOUS_DB_PATH,))
+            with run_stats.stage("previous_db_download"):
+                if previous_db and range_reads:
+                    copy_tables_from_s3(
+                        s3,
+                        settings.pls_s3_bucket_name,
+                        previous_db,
+                        PREVIOUS_DB_PATH,
+                        get_previous_tables_to_read(),
+                    )
+                elif previous_db and settings.previous_db_cache_dir:
+                    previous_db_path = get_cached_file(
+                        settings.pls_s3_bucket_name,
+                        previous_db,
+                        settings.previous_db_cache_dir,
+                        s3,
+                        settings.previous_db_cache_max_bytes,
+                    )
+                elif previous_db:
+                    download_file(
+                        settings.pls_s3_bucket_name, previous_db, PREVIOUS_DB_PATH, s3
+                    )
 
-                # Get the previous ETL's start time from the metadata table.
-                cursor.execute("SELECT start_time FROM previous.metadata")
-                previous_etl_start_time = datetime.fromisoformat(
-                    cursor.fetchone()["start_time"]
-                )
+            with run_stats.stage("previous_db_copy"):
+                if previous_db and settings.pls_sqlite_clone_previous:
+                    # Start from a page-level copy of the previous ETL's database
+                    # and only rebuild the tables that are repopulated each run.
+                    clone_database(previous_db_path, connection)
+                    previous_stage_totals = read_stage_totals(cursor)
+                    previous_etl_start_time = metadata_read_start_time(cursor)
+                    previous_full_rebuild_time = metadata_read_full_rebuild_time(cursor)
+                    fingerprints = StageFingerprints(
+                        metadata_read_stage_fingerprints(cursor)
+                    )
+                    previous_row_hashes = metadata_read_row_hashes(cursor)
+                    incremental = is_incremental_run(
+                        previous_full_rebuild_time, etl_started_at
+                    )
+                    reset_rebuilt_tables(
+                        cursor,
+                        keep=INCREMENTAL_CARRIED_OVER_TABLES if incremental else (),
+                    )
+                    metadata_write_start_time(cursor, etl_started_at_str)
+                else:
+                    create_tables(cursor)
+                    metadata_write_start_time(cursor, etl_started_at_str)
 
-                # Load the previous ETL's geocodes into the geocode table.
-                cursor.execute(
-                    """
-                    INSERT INTO lf_geocode_sp_survey_point
-                    SELECT
-                        geocode_id,
-                        geocode_type,
-                        address_pid,
-                        NULL,
-                        centoid_lat,
-                        centoid_lon,
-                        NULL
-                    FROM previous.lf_geocode_sp_survey_point
-                    """
-                )
-                cursor.connection.commit()
-
-                # Load the previous ETL's mapping tables
-                map_id_tables = (
-                    "lf_road_id_map",
-                    "lf_parcel_id_map",
-                    "lf_site_id_map",
-                    "lf_place_name_id_map",
-                    "lf_address_id_map",
-                )
-                for table in map_id_tables:
-                    logger.info(f"Loading {table} from previous ETL")
+                if previous_db and not settings.pls_sqlite_clone_previous:
+                    # Attach the previous ETL's sqlite database to the connection.
+                    attach_read_only(cursor, previous_db_path, "previous")
+                    previous_stage_totals = read_stage_totals(cursor, "previous")
+
+                    # Get the previous ETL's start time from the metadata table.
+                    previous_etl_start_time = metadata_read_start_time(
+                        cursor, "previous"
+                    )
+                    previous_full_rebuild_time = metadata_read_full_rebuild_time(
+                        cursor, "previous"
+                    )
+                    fingerprints = StageFingerprints(
+                        metadata_read_stage_fingerprints(cursor, "previous")
+                    )
+                    previous_row_hashes = metadata_read_row_hashes(cursor, "previous")
+                    incremental = is_incremental_run(
+                        previous_full_rebuild_time, etl_started_at
+                    )
+
+                    # Load the previous ETL's geocodes into the geocode table.
+                    # The site_id link is carried over so that only geocodes whose
+                    # address changed need to be relinked later in the run.
                     cursor.execute(
-                        f"""
-                        INSERT INTO {table}
-                        SELECT * FROM previous.{table}
+                        """
+                        INSERT INTO lf_geocode_sp_survey_point
+                        SELECT
+                            geocode_id,
+                            geocode_type,
+                            address_pid,
+                            site_id,
+                            centoid_lat,
+                            centoid_lon,
+                            NULL
+                        FROM previous.lf_geocode_sp_survey_point
                         """
                     )
                     cursor.connection.commit()
 
-                cursor.execute(
-                    """
-                    SELECT name FROM previous.sqlite_master
-                    WHERE type = 'table' AND name = 'geocode_type_code'
-                    """
-                )
-                if cursor.fetchone():
+                    # Load the previous ETL's mapping tables
+                    map_id_tables = (
+                        "lf_road_id_map",
+                        "lf_parcel_id_map",
+                        "lf_site_id_map",
+                        "lf_place_name_id_map",
+                        "lf_address_id_map",
+                    )
+                    for table in map_id_tables:
+                        logger.info(f"Loading {table} from previous ETL")
+                        cursor.execute(
+                            f"""
+                            INSERT INTO {table}
+                            SELECT * FROM previous.{table}
+                            """
+                        )
+                        cursor.connection.commit()
+
                     cursor.execute(
                         """
-                        INSERT INTO geocode_type_code
-                        SELECT * FROM previous.geocode_type_code
+                        SELECT name FROM previous.sqlite_master
+                        WHERE type = 'table' AND name = 'geocode_type_code'
                         """
                     )
-                    cursor.connection.commit()
+                    if cursor.fetchone():
+                        cursor.execute(
+                            """
+                            INSERT INTO geocode_type_code
+                            SELECT * FROM previous.geocode_type_code
+                            """
+                        )
+                        cursor.connection.commit()
 
-                cursor.execute(
-                    """
-                    SELECT name FROM previous.sqlite_master
-                    WHERE type = 'table' AND name = 'address_iri_pid_map'
-                    """
-                )
-                if cursor.fetchone():
                     cursor.execute(
                         """
-                        INSERT INTO address_iri_pid_map
-                        SELECT * FROM previous.address_iri_pid_map
+                        SELECT name FROM previous.sqlite_master
+                        WHERE type = 'table' AND name = 'address_iri_pid_map'
                         """
                     )
+                    if cursor.fetchone():
+                        cursor.execute(
+                            """
+                            INSERT INTO address_iri_pid_map
+                            SELECT * FROM previous.address_iri_pid_map
+                            """
+                        )
+                        cursor.connection.commit()
+
+                    if incremental:
+                        # Incremental runs only refresh the changed addresses.
+                        for table in INCREMENTAL_CARRIED_OVER_TABLES:
+                            logger.info(f"Loading {table} from previous ETL")
+                            cursor.execute(
+                                f"""
+                                INSERT INTO {table}
+                                SELECT * FROM previous.{table}
+                                """
+                            )
+                            cursor.connection.commit()
+
+                    cursor.execute("DETACH DATABASE previous")
                     cursor.connection.commit()
 
-                cursor.execute("DETACH DATABASE previous")
-                cursor.connection.commit()
+            if incremental:
+                logger.info(
+                    f"Running incremental SPARQL extraction, last full rebuild at {previous_full_rebuild_time}"
+                )
+                metadata_write_full_rebuild_time(
+                    cursor,
+                    previous_full_rebuild_time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                )
+            else:
+                metadata_write_full_rebuild_time(cursor, etl_started_at_str)
 
-            import_address_pid_mappings(cursor, previous_etl_start_time)
-            import_geocodes(cursor, previous_etl_start_time)
-            populate_tables(cursor)
+            import_address_pid_mappings(
+                cursor, previous_etl_start_time, fingerprints=fingerprints
+            )
+            import_geocodes(cursor, previous_etl_start_time, fingerprints=fingerprints)
+            if incremental:
+                populate_tables_incremental(cursor, previous_etl_start_time)
+                # Incremental runs update roads without fingerprinting their
+                # graphs, so the fingerprint of the last full run still
+                # describes the graphs the table is in sync with.
+                fingerprints.carry_forward(("road",))
+            else:
+                populate_tables(
+                    cursor,
+                    previous_db_path=previous_db_path if previous_db else None,
+                    fingerprints=fingerprints,
+                )
             prune_geocodes_without_addresses(cursor)
+            if settings.build_changeset:
+                populate_row_hashes(cursor)
+            elif previous_row_hashes:
+                # Only the rows carried over from the previous snapshot can
+                # have hashes, and only if that run built a changeset.
+                clear_row_hashes(cursor)
+            metadata_write_row_hashes(cursor, settings.build_changeset)
+            metadata_write_stage_fingerprints(cursor, fingerprints.current)
 
             etl_finished_at = datetime.now(pytz.UTC)
             etl_finished_at_brisbane = utc_to_brisbane_time(etl_finished_at)
             etl_finished_at_str = etl_finished_at_brisbane.strftime("%Y-%m-%dT%H:%M:%S%z")
             metadata_write_end_time(cursor, etl_finished_at_str)
 
-            s3_key = f"{S3_FILE_PREFIX_KEY}{etl_finished_at_str}/pls.db"
-            presigned_url = upload_file(
-                settings.pls_s3_bucket_name,
-                s3_key,
-                settings.pls_sqlite_conn_str,
+            changeset_path = None
+            if previous_db and settings.build_changeset:
+                changeset_path = CHANGESET_DB_PATH
+                with run_stats.stage("changeset"):
+                    build_changeset(cursor, previous_db_path, changeset_path)
+
+            # The stages from here on are only in the run_stats.json report.
+            write_run_stats(cursor, run_stats)
+
+            with run_stats.stage("persist"):
+                if settings.pls_sqlite_fast_build:
+                    persist_database(connection, settings.pls_sqlite_conn_str)
+                else:
+                    # The last writes are still in the write-ahead log.
+                    checkpoint_database(connection)
+
+            with run_stats.stage("upload"):
+                s3_key, presigned_url, artifact_size = upload_artifact(
+                    s3,
+                    f"{S3_FILE_PREFIX_KEY}{etl_finished_at_str}/pls.db",
+                    settings.pls_sqlite_conn_str,
+                )
+                changeset_s3_key = None
+                if changeset_path:
+                    changeset_s3_key, _, _ = upload_artifact(
+                        s3,
+                        f"{S3_FILE_PREFIX_KEY}{etl_finished_at_str}/changeset.db",
+                        changeset_path,
+                    )
+            upload_profiles(s3, f"{S3_FILE_PREFIX_KEY}{etl_finished_at_str}/profiles/")
+            upload_sparql_slow_batches(
+                s3,
+                f"{S3_FILE_PREFIX_KEY}{etl_finished_at_str}/sparql_slow_batches.json",
+            )
+            regressions = None
+            if previous_stage_totals and previous_full_rebuild_time is not None:
+                # Incremental and full runs are only compared with their kind.
+                previous_incremental = (
+                    previous_full_rebuild_time != previous_etl_start_time
+                )
+                if previous_incremental == incremental:
+                    regressions = find_regressions(
+                        previous_stage_totals, run_stats.stages
+                    )
+            upload_run_stats(
                 s3,
-                presigned_url_expiry_seconds=settings.s3_presigned_url_expiry_seconds,
+                f"{S3_FILE_PREFIX_KEY}{etl_finished_at_str}/run_stats.json",
+                etl_started_at=etl_started_at,
+                etl_finished_at=etl_finished_at,
+                artifact_s3_key=s3_key,
+                regressions=regressions,
+            )
+            upload_timeline(
+                s3, f"{S3_FILE_PREFIX_KEY}{etl_finished_at_str}/timeline.json"
             )
-            artifact_uploaded_at = datetime.now(pytz.UTC)
-            publish_presigned_url(
-                presigned_url,
-                build_artifact_headers(
-                    etl_started_at=etl_started_at,
-                    etl_finished_at=etl_finished_at,
-                    artifact_uploaded_at=artifact_uploaded_at,
-                    duration_seconds=(etl_finished_at - etl_started_at).total_seconds(),
-                    s3_bucket=settings.pls_s3_bucket_name,
-                    s3_key=s3_key,
-                    presigned_url_expiry_seconds=settings.s3_presigned_url_expiry_seconds,
-                ),
+            upload_http_archive(
+                s3, f"{S3_FILE_PREFIX_KEY}{etl_finished_at_str}/http_archive.db"
             )
+            if settings.http_archive_mode == "replay":
+                # A replayed run is not the latest data, so later runs do not
+                # start from it and consumers are not told about it.
+                logger.info(
+                    f"Replayed {settings.http_archive_path}; not updating the "
+                    "latest manifest or publishing to Kafka"
+                )
+            else:
+                write_latest_manifest(
+                    settings.pls_s3_bucket_name, S3_FILE_PREFIX_KEY, s3_key, s3
+                )
+                artifact_uploaded_at = datetime.now(pytz.UTC)
+                publish_presigned_url(
+                    presigned_url,
+                    build_artifact_headers(
+                        etl_started_at=etl_started_at,
+                        etl_finished_at=etl_finished_at,
+                        artifact_uploaded_at=artifact_uploaded_at,
+                        duration_seconds=(
+                            etl_finished_at - etl_started_at
+                        ).total_seconds(),
+                        s3_bucket=settings.pls_s3_bucket_name,
+                        s3_key=s3_key,
+                        presigned_url_expiry_seconds=settings.s3_presigned_url_expiry_seconds,
+                        content_encoding="zstd"
+                        if settings.compress_artifact
+                        else "identity",
+                        artifact_size_bytes=artifact_size,
+                        artifact_uncompressed_size_bytes=os.path.getsize(
+                            settings.pls_sqlite_conn_str
+                        ),
+                        changeset_s3_key=changeset_s3_key,
+                        regressions=regressions,
+                    ),
+                )
         finally:
             logger.info("Closing connection to SQLite database")
+            if metrics_server is not None:
+                metrics_server.shutdown()
+                metrics_server.server_close()
+            run_stats.attach(None)
+            close_http_archive()
             connection.close()
+            if (
+                settings.pls_sqlite_fast_build
+                and settings.pls_sqlite_build_path != IN_MEMORY
+            ):
+                Path(settings.pls_sqlite_build_path).unlink(missing_ok=True)
 
 
 if __name__ == "__main__":
@@ -44,3 +44,19 @@ def test_get_query_filters_to_current_non_private_addresses():
 
 def test_debug_parcel_iris_list_has_expected_size():
     assert len(DEBUG_PARCEL_IRIS) == 100
+
+
+def test_get_query_changed_iris_filters_on_lifecycle_times():
+    query = address.get_query_changed_iris("2025-01-05T10:00:00+10:00")
+
+    assert "time:hasBeginning/time:inXSDDateTime ?changed_time" in query
+    assert "time:hasEnd/time:inXSDDateTime ?changed_time" in query
+    assert 'FILTER(?changed_time >= "2025-01-05T10:00:00+10:00"^^xsd:dateTime)' in query
+
+
+def test_get_query_iris_only_restricts_to_address_iris():
+    query = address.get_query_iris_only(addr_iris=["https://example.com/address/1"])
+
+    assert "VALUES ?addr_iri {" in query
+    assert "<https://example.com/address/1>" in query
+    assert "VALUES ?addr_iri {" not in address.get_query_iris_only()
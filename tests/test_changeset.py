@@ -0,0 +1,147 @@
+import sqlite3
+
+from address_etl.metadata import metadata_read_row_hashes, metadata_write_row_hashes
+from address_etl.pls.changeset import (
+    build_changeset,
+    clear_row_hashes,
+    populate_row_hashes,
+    register_row_hash,
+    row_hash,
+)
+from address_etl.pls.tables import create_tables
+from address_etl.sqlite_dict_factory import dict_row_factory
+from address_etl.tables import create_metadata_table
+
+
+def create_database(path, local_auths):
+    db = sqlite3.connect(path)
+    db.row_factory = dict_row_factory
+    register_row_hash(db)
+    cursor = db.cursor()
+    create_tables(cursor)
+    cursor.executemany("INSERT INTO local_auth VALUES (?, ?, NULL)", local_auths)
+    db.commit()
+    return db
+
+
+def test_row_hash_is_deterministic_and_type_sensitive():
+    assert row_hash(1, "a", None) == row_hash(1, "a", None)
+    assert row_hash(1, "a") != row_hash("1", "a")
+
+
+def test_build_changeset_records_inserts_updates_and_deletes(tmp_path):
+    previous_path = str(tmp_path / "previous.db")
+    changeset_path = str(tmp_path / "changeset.db")
+
+    previous = create_database(
+        previous_path, [(1, "Brisbane"), (2, "Logan"), (3, "Ipswich")]
+    )
+    populate_row_hashes(previous.cursor())
+    previous.close()
+
+    current = create_database(
+        ":memory:", [(1, "Brisbane"), (2, "Logan City"), (4, "Redland")]
+    )
+    try:
+        cursor = current.cursor()
+        populate_row_hashes(cursor)
+        build_changeset(cursor, previous_path, changeset_path)
+    finally:
+        current.close()
+
+    changeset = sqlite3.connect(changeset_path)
+    try:
+        assert changeset.execute(
+            "SELECT change_type, la_code, la_name FROM local_auth ORDER BY la_code"
+        ).fetchall() == [("update", 2, "Logan City"), ("insert", 4, "Redland")]
+        assert changeset.execute(
+            "SELECT la_code FROM local_auth_deleted"
+        ).fetchall() == [(3,)]
+        assert changeset.execute("SELECT count(*) FROM lf_address").fetchone() == (0,)
+    finally:
+        changeset.close()
+
+
+def test_build_changeset_hashes_previous_rows_without_hashes(tmp_path):
+    previous_path = str(tmp_path / "previous.db")
+    changeset_path = str(tmp_path / "changeset.db")
+
+    create_database(previous_path, [(1, "Brisbane"), (2, "Logan")]).close()
+
+    current = create_database(":memory:", [(1, "Brisbane"), (2, "Logan City")])
+    try:
+        cursor = current.cursor()
+        populate_row_hashes(cursor)
+        build_changeset(cursor, previous_path, changeset_path)
+    finally:
+        current.close()
+
+    changeset = sqlite3.connect(changeset_path)
+    try:
+        assert changeset.execute(
+            "SELECT change_type, la_code FROM local_auth"
+        ).fetchall() == [("update", 2)]
+    finally:
+        changeset.close()
+
+
+def test_build_changeset_hashes_previous_rows_with_their_own_columns(tmp_path):
+    previous_path = str(tmp_path / "previous.db")
+    changeset_path = str(tmp_path / "changeset.db")
+
+    create_database(previous_path, [(1, "Brisbane")]).close()
+
+    current = create_database(":memory:", [(1, "Brisbane")])
+    try:
+        cursor = current.cursor()
+        cursor.execute("ALTER TABLE local_auth ADD COLUMN la_short_name TEXT")
+        populate_row_hashes(cursor)
+        build_changeset(cursor, previous_path, changeset_path)
+    finally:
+        current.close()
+
+    changeset = sqlite3.connect(changeset_path)
+    try:
+        assert changeset.execute(
+            "SELECT change_type, la_code FROM local_auth"
+        ).fetchall() == [("update", 1)]
+    finally:
+        changeset.close()
+
+
+def test_clear_row_hashes_leaves_no_stale_hashes():
+    db = create_database(":memory:", [(1, "Brisbane"), (2, "Logan")])
+    try:
+        cursor = db.cursor()
+        populate_row_hashes(cursor)
+        cursor.execute("UPDATE local_auth SET la_name = 'Logan City' WHERE la_code = 2")
+
+        clear_row_hashes(cursor)
+
+        cursor.execute(
+            "SELECT count(*) AS hashed FROM local_auth WHERE hash IS NOT NULL"
+        )
+        assert cursor.fetchone() == {"hashed": 0}
+    finally:
+        db.close()
+
+
+def test_metadata_row_hashes_round_trip():
+    db = sqlite3.connect(":memory:")
+    db.row_factory = dict_row_factory
+    try:
+        cursor = db.cursor()
+        cursor.execute("CREATE TABLE metadata (id INTEGER PRIMARY KEY)")
+        # Snapshots that predate the column may have row hashes.
+        assert metadata_read_row_hashes(cursor)
+
+        cursor.execute("DROP TABLE metadata")
+        create_metadata_table(cursor)
+        cursor.execute("INSERT INTO metadata (id) VALUES (1)")
+        metadata_write_row_hashes(cursor, False)
+        assert not metadata_read_row_hashes(cursor)
+
+        metadata_write_row_hashes(cursor, True)
+        assert metadata_read_row_hashes(cursor)
+    finally:
+        db.close()
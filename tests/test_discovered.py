@@ -0,0 +1,49 @@
+from address_etl.pls.discovered import DiscoveredIris
+
+
+def rows(count):
+    return [
+        (f"https://example.com/address/{i}", "https://example.com/road/1")
+        for i in range(count)
+    ]
+
+
+def test_discovered_iris_slices_to_dicts_and_shares_repeated_values():
+    iris = DiscoveredIris(("addr_iri", "road"), memory_rows=100)
+    iris.extend(rows(3))
+
+    assert len(iris) == 3
+    assert iris[1:3] == [
+        {
+            "addr_iri": "https://example.com/address/1",
+            "road": "https://example.com/road/1",
+        },
+        {
+            "addr_iri": "https://example.com/address/2",
+            "road": "https://example.com/road/1",
+        },
+    ]
+    assert iris._rows[0][1] is iris._rows[2][1]
+
+
+def test_discovered_iris_spills_to_disk_and_reads_across_the_boundary():
+    with DiscoveredIris(("addr_iri", "road"), memory_rows=4) as iris:
+        iris.extend(rows(10))
+        assert len(iris) == 10
+        assert len(iris._rows) == 2
+        assert iris._interned == {}
+        assert [iri["addr_iri"] for iri in iris[6:9]] == [
+            "https://example.com/address/6",
+            "https://example.com/address/7",
+            "https://example.com/address/8",
+        ]
+        assert [iri["addr_iri"] for iri in iris] == [row[0] for row in rows(10)]
+        assert iris[-1]["addr_iri"] == "https://example.com/address/9"
+    assert iris._spill is None
+
+
+def test_discovered_iris_single_column_returns_values():
+    iris = DiscoveredIris(("parcel_id",), memory_rows=2)
+    iris.extend([("p1",), ("p2",), ("p3",)])
+
+    assert iris[0:3] == ["p1", "p2", "p3"]
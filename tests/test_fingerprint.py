@@ -0,0 +1,157 @@
+import sqlite3
+
+import httpx
+import pytest
+
+from address_etl import address_iri_pid_map, fingerprint, geocode
+from address_etl.fingerprint import (
+    StageFingerprints,
+    get_graph_triple_counts_query,
+    get_layer_fingerprint,
+)
+from address_etl.metadata import (
+    metadata_read_stage_fingerprints,
+    metadata_write_stage_fingerprints,
+    metadata_write_start_time,
+)
+from address_etl.pls import tables
+from address_etl.sqlite_dict_factory import dict_row_factory
+from address_etl.tables import create_metadata_table
+
+
+def test_stage_fingerprints_skip_only_matching_stages_when_enabled(monkeypatch):
+    fingerprints = StageFingerprints({"locality": "a", "road": "b"})
+
+    monkeypatch.setattr(fingerprint.settings, "skip_unchanged_stages", False)
+    assert not fingerprints.is_unchanged("locality", "a")
+
+    monkeypatch.setattr(fingerprint.settings, "skip_unchanged_stages", True)
+    assert fingerprints.is_unchanged("locality", "a")
+    assert not fingerprints.is_unchanged("road", "c")
+    assert not fingerprints.is_unchanged("geocodes", None)
+    assert fingerprints.current == {"locality": "a", "road": "c"}
+
+
+def test_stage_fingerprints_carry_forward_stages_not_fingerprinted():
+    fingerprints = StageFingerprints({"locality": "a", "road": "b", "geocodes": "c"})
+    fingerprints.current["road"] = "d"
+
+    fingerprints.carry_forward(("locality", "road", "parcel"))
+
+    assert fingerprints.current == {"locality": "a", "road": "d"}
+
+
+def test_get_layer_fingerprint_uses_last_edit_date():
+    assert get_layer_fingerprint({"editingInfo": {"lastEditDate": 1700000000000}}) == (
+        "1700000000000"
+    )
+    assert get_layer_fingerprint({"fields": []}) is None
+
+
+def test_get_graph_triple_counts_query_lists_graphs():
+    query = get_graph_triple_counts_query(["urn:qali:graph:roads"])
+
+    assert "<urn:qali:graph:roads>" in query
+    assert "GROUP BY ?graph" in query
+
+
+def test_metadata_stage_fingerprints_round_trip():
+    db = sqlite3.connect(":memory:")
+    db.row_factory = dict_row_factory
+    try:
+        cursor = db.cursor()
+        create_metadata_table(cursor)
+        metadata_write_start_time(cursor, "2025-01-10T10:00:00+1000")
+        assert metadata_read_stage_fingerprints(cursor) == {}
+
+        metadata_write_stage_fingerprints(cursor, {"road": "x=1", "geocodes": "2"})
+        assert metadata_read_stage_fingerprints(cursor) == {
+            "geocodes": "2",
+            "road": "x=1",
+        }
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize(
+    ("module", "import_stage", "stage"),
+    [
+        (geocode, geocode.import_geocodes, "geocodes"),
+        (
+            address_iri_pid_map,
+            address_iri_pid_map.import_address_pid_mappings,
+            "address_iri_pid_map",
+        ),
+    ],
+)
+def test_skipped_esri_import_only_reads_the_layer_definition(
+    monkeypatch, module, import_stage, stage
+):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path.endswith("/generateToken"):
+            return httpx.Response(200, json={"token": "token"})
+        return httpx.Response(
+            200,
+            json={
+                "fields": [
+                    {"name": name} for name in ("objectid", "pid", "iri", "type")
+                ],
+                "editingInfo": {"lastEditDate": 1700000000000},
+            },
+        )
+
+    monkeypatch.setattr(fingerprint.settings, "skip_unchanged_stages", True)
+    monkeypatch.setattr(
+        module,
+        "create_http_client",
+        lambda: httpx.Client(transport=httpx.MockTransport(handler)),
+    )
+    fingerprints = StageFingerprints({stage: "1700000000000"})
+
+    import_stage(None, fingerprints=fingerprints)
+
+    assert len(requests) == 2
+    assert requests[0].endswith("/generateToken")
+    assert not requests[1].endswith("/query")
+
+
+def test_populate_tables_records_road_fingerprint_without_skipping(monkeypatch):
+    monkeypatch.setattr(fingerprint.settings, "skip_unchanged_stages", False)
+    monkeypatch.setattr(tables, "create_http_client", httpx.Client)
+    monkeypatch.setattr(
+        tables, "get_graph_fingerprint", lambda client, graphs: "urn:roads=10"
+    )
+    reused = []
+    monkeypatch.setattr(
+        tables,
+        "populate_road_tables",
+        lambda client, cursor, reuse_previous: reused.append(reuse_previous),
+    )
+    for name in (
+        "populate_locality_tables",
+        "populate_parcel_tables",
+        "populate_site_tables",
+        "populate_place_name_tables",
+        "populate_address_tables",
+    ):
+        monkeypatch.setattr(tables, name, lambda client, cursor, **kwargs: None)
+    for name in (
+        "create_road_indexes",
+        "create_parcel_indexes",
+        "create_site_indexes",
+        "create_place_name_indexes",
+        "create_address_indexes",
+        "prune_addresses_without_pid_mapping",
+        "update_geocode_site_id",
+        "map_ids_to_integers",
+    ):
+        monkeypatch.setattr(tables, name, lambda cursor: None)
+    fingerprints = StageFingerprints({"road": "urn:roads=10"})
+
+    tables.populate_tables(None, fingerprints=fingerprints)
+
+    assert fingerprints.current == {"road": "urn:roads=10"}
+    assert reused == [False]
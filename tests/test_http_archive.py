@@ -0,0 +1,124 @@
+import gzip
+import sqlite3
+import zlib
+
+import httpx
+import pytest
+
+from address_etl import http_archive as http_archive_module
+from address_etl.crud import CountingTransport
+from address_etl.http_archive import (
+    HttpArchive,
+    RecordingTransport,
+    ReplayTransport,
+    create_http_transport,
+)
+
+
+def esri_service():
+    attempts = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("generateToken"):
+            return httpx.Response(200, json={"token": "secret"})
+
+        # The first query of each page is answered with a 503, then its retry.
+        page = request.url.params["resultOffset"]
+        attempts[page] = attempts.get(page, 0) + 1
+        if attempts[page] == 1:
+            return httpx.Response(503, text="busy")
+        return httpx.Response(
+            200,
+            headers={"Content-Encoding": "gzip"},
+            content=gzip.compress(b'{"features": []}'),
+        )
+
+    return handler
+
+
+def run_requests(client: httpx.Client, password: str) -> list[tuple[int, bytes]]:
+    token = client.post(
+        "https://esri.example.com/generateToken",
+        data={"username": "etl", "password": password, "f": "json"},
+    ).json()["token"]
+    responses = []
+    for offset in ("0", "2000"):
+        for _ in range(2):
+            response = client.get(
+                "https://esri.example.com/query",
+                params={"resultOffset": offset, "token": token, "f": "json"},
+            )
+            responses.append((response.status_code, response.content))
+    return responses
+
+
+def test_replay_serves_the_recorded_run(tmp_path):
+    path = str(tmp_path / "http_archive.db")
+    archive = HttpArchive(path, "record")
+    with httpx.Client(
+        transport=RecordingTransport(httpx.MockTransport(esri_service()), archive)
+    ) as client:
+        recorded = run_requests(client, password="hunter2")
+    archive.close()
+
+    assert recorded == [
+        (503, b"busy"),
+        (200, b'{"features": []}'),
+        (503, b"busy"),
+        (200, b'{"features": []}'),
+    ]
+    with sqlite3.connect(path) as connection:
+        # Identical responses are stored once, and credentials are not stored.
+        assert connection.execute("SELECT COUNT(*) FROM bodies").fetchone() == (3,)
+        urls = [row[0] for row in connection.execute("SELECT url FROM exchanges")]
+        bodies = [
+            zlib.decompress(row[0])
+            for row in connection.execute("SELECT content FROM bodies")
+        ]
+    assert not any("token" in url or "hunter2" in url for url in urls)
+    assert b'{"token": "redacted"}' in bodies
+    assert not any(b"secret" in body for body in bodies)
+
+    archive = HttpArchive(path, "replay")
+    with httpx.Client(transport=ReplayTransport(archive)) as client:
+        assert run_requests(client, password="other") == recorded
+        with pytest.raises(RuntimeError, match="No recorded response"):
+            client.get("https://esri.example.com/query", params={"resultOffset": "1"})
+    archive.close()
+
+
+def test_pin_replays_the_first_recorded_value(tmp_path):
+    path = str(tmp_path / "http_archive.db")
+    archive = HttpArchive(path, "record")
+    assert archive.pin("previous_db", "pls-etl/1/pls.db") == "pls-etl/1/pls.db"
+    assert archive.pin("previous_db", "pls-etl/2/pls.db") == "pls-etl/1/pls.db"
+    archive.close()
+
+    archive = HttpArchive(path, "replay")
+    assert archive.pin("previous_db", "pls-etl/3/pls.db") == "pls-etl/1/pls.db"
+    with pytest.raises(RuntimeError, match="No recorded etl_started_at"):
+        archive.pin("etl_started_at", "2026-10-19T00:00:00+00:00")
+    archive.close()
+
+
+def test_create_http_transport_follows_the_archive_mode(monkeypatch, tmp_path):
+    settings = http_archive_module.settings
+    monkeypatch.setattr(settings, "http_archive_path", str(tmp_path / "a.db"))
+    monkeypatch.setattr(http_archive_module, "_archive", None)
+
+    monkeypatch.setattr(settings, "http_archive_mode", "replay")
+    with pytest.raises(FileNotFoundError):
+        create_http_transport()
+
+    monkeypatch.setattr(settings, "http_archive_mode", "record")
+    transport = CountingTransport(create_http_transport())
+    assert isinstance(transport.transport, RecordingTransport)
+    http_archive_module.close_http_archive()
+
+    monkeypatch.setattr(settings, "http_archive_mode", "replay")
+    assert isinstance(create_http_transport(), ReplayTransport)
+    http_archive_module.close_http_archive()
+
+    monkeypatch.setattr(settings, "http_archive_mode", "playback")
+    with pytest.raises(ValueError):
+        create_http_transport()
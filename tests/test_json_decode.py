@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+from address_etl import json_decode
+from address_etl.json_decode import (
+    decode_esri_feature_set,
+    decode_esri_layer_definition,
+    get_json_decoder,
+    iter_sparql_records,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_decoder_cache():
+    get_json_decoder.cache_clear()
+    json_decode.get_typed_decoder.cache_clear()
+    yield
+    get_json_decoder.cache_clear()
+    json_decode.get_typed_decoder.cache_clear()
+
+
+def test_iter_sparql_records_flattens_bindings(monkeypatch):
+    monkeypatch.setattr(json_decode.settings, "json_decoder", "json")
+    content = json.dumps(
+        {
+            "head": {"vars": ["site_id", "parent_site_id"]},
+            "results": {
+                "bindings": [
+                    {
+                        "site_id": {"type": "literal", "value": "site-1"},
+                        "parent_site_id": {"type": "literal", "value": "site-0"},
+                    },
+                    {"site_id": {"type": "literal", "value": "site-2"}},
+                ]
+            },
+        }
+    ).encode()
+
+    records = list(iter_sparql_records(content))
+
+    assert get_json_decoder() == "json"
+    assert records == [
+        {"site_id": "site-1", "parent_site_id": "site-0"},
+        {"site_id": "site-2"},
+    ]
+    assert records[1].get("parent_site_id") is None
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b'{"head": {"vars": []}, "results": {"bindings": []}}',
+        b'{"results": {"bindings" : [\n ] }, "head": {"vars": ["bindings"]}}',
+    ],
+)
+def test_iter_sparql_records_reads_empty_results(monkeypatch, content):
+    monkeypatch.setattr(json_decode.settings, "json_decoder", "json")
+    assert list(iter_sparql_records(content)) == []
+
+
+def test_iter_sparql_records_parses_pretty_printed_results(monkeypatch):
+    monkeypatch.setattr(json_decode.settings, "json_decoder", "json")
+    content = json.dumps(
+        {
+            "head": {"vars": ["a"]},
+            "results": {
+                "bindings": [
+                    {"a": {"type": "literal", "value": "x, ]"}},
+                    {"a": {"type": "uri", "value": "https://example.com/a"}},
+                ]
+            },
+        },
+        indent=4,
+    ).encode()
+
+    assert list(iter_sparql_records(content)) == [
+        {"a": "x, ]"},
+        {"a": "https://example.com/a"},
+    ]
+
+
+def test_decode_esri_feature_set_keeps_features_and_errors():
+    content = json.dumps(
+        {
+            "features": [
+                {"attributes": {"objectid": 1}, "geometry": {"x": 153.0, "y": -27.4}}
+            ]
+        }
+    ).encode()
+    assert decode_esri_feature_set(content)["features"][0]["attributes"] == {
+        "objectid": 1
+    }
+
+    error = decode_esri_feature_set(b'{"error": {"code": 498}}')
+    assert "features" not in error
+    assert error["error"]["code"] == 498
+
+
+@pytest.mark.parametrize("decoder", ["json", "orjson", "msgspec"])
+def test_decode_esri_layer_definition_keeps_fields_and_object_id_field(
+    monkeypatch, decoder
+):
+    pytest.importorskip(decoder)
+    monkeypatch.setattr(json_decode.settings, "json_decoder", decoder)
+    content = json.dumps(
+        {
+            "objectIdField": "objectid",
+            "fields": [{"name": "objectid", "type": "esriFieldTypeOID"}],
+            "editingInfo": {"lastEditDate": 1700000000000},
+        }
+    ).encode()
+
+    layer = decode_esri_layer_definition(content)
+
+    assert layer["objectIdField"] == "objectid"
+    assert layer["fields"][0]["name"] == "objectid"
+    assert layer["editingInfo"]["lastEditDate"] == 1700000000000
+
+
+def test_get_json_decoder_rejects_unknown_decoders(monkeypatch):
+    monkeypatch.setattr(json_decode.settings, "json_decoder", "yaml")
+    with pytest.raises(ValueError):
+        get_json_decoder()
@@ -1,3 +1,4 @@
+import json
 from contextlib import contextmanager
 from datetime import datetime
 
@@ -27,11 +28,14 @@ class FakeLock:
 
 class FakeS3:
     def __init__(self, _settings):
-        pass
+        self.objects = {}
 
     def bucket_exists(self, _bucket_name: str) -> bool:
         return True
 
+    def create_object(self, bucket_name: str, key: str, body: bytes) -> None:
+        self.objects[(bucket_name, key)] = body
+
 
 def test_main_publishes_uploaded_presigned_url_to_kafka(
     monkeypatch,
@@ -42,6 +46,7 @@ def test_main_publishes_uploaded_presigned_url_to_kafka(
         "metadata_end": None,
         "upload": None,
         "publish": None,
+        "manifest": None,
     }
 
     start_time = datetime(2026, 4, 23, 2, 0, 0, tzinfo=pytz.UTC)
@@ -70,19 +75,44 @@ def test_main_publishes_uploaded_presigned_url_to_kafka(
             "headers": headers,
         }
 
+    def fake_write_latest_manifest(bucket_name, prefix, key, s3):
+        recorded["manifest"] = {
+            "bucket_name": bucket_name,
+            "prefix": prefix,
+            "key": key,
+        }
+
     monkeypatch.setattr(main_pls, "datetime", FakeDatetime)
     monkeypatch.setattr(main_pls, "utc_to_brisbane_time", lambda dt: dt)
     monkeypatch.setattr(main_pls, "metadata_write_start_time", fake_metadata_write_start_time)
     monkeypatch.setattr(main_pls, "metadata_write_end_time", fake_metadata_write_end_time)
+    monkeypatch.setattr(
+        main_pls, "metadata_write_full_rebuild_time", lambda cursor, value: None
+    )
+    monkeypatch.setattr(
+        main_pls, "metadata_write_stage_fingerprints", lambda cursor, value: None
+    )
+    monkeypatch.setattr(
+        main_pls, "metadata_write_row_hashes", lambda cursor, value: None
+    )
     monkeypatch.setattr(main_pls, "upload_file", fake_upload_file)
     monkeypatch.setattr(main_pls, "publish_presigned_url", fake_publish_presigned_url)
+    monkeypatch.setattr(main_pls, "write_latest_manifest", fake_write_latest_manifest)
     monkeypatch.setattr(main_pls, "get_latest_file", lambda *args, **kwargs: None)
     monkeypatch.setattr(main_pls, "create_tables", lambda cursor: None)
-    monkeypatch.setattr(main_pls, "import_address_pid_mappings", lambda cursor, previous: None)
-    monkeypatch.setattr(main_pls, "import_geocodes", lambda cursor, previous: None)
-    monkeypatch.setattr(main_pls, "populate_tables", lambda cursor: None)
+    monkeypatch.setattr(
+        main_pls, "import_address_pid_mappings", lambda cursor, previous, **kwargs: None
+    )
+    monkeypatch.setattr(
+        main_pls, "import_geocodes", lambda cursor, previous, **kwargs: None
+    )
+    monkeypatch.setattr(main_pls, "populate_tables", lambda cursor, **kwargs: None)
     monkeypatch.setattr(main_pls, "prune_geocodes_without_addresses", lambda cursor: None)
-    monkeypatch.setattr(main_pls, "S3", FakeS3)
+    monkeypatch.setattr(main_pls, "populate_row_hashes", lambda cursor: None)
+    monkeypatch.setattr(main_pls, "clear_row_hashes", lambda cursor: None)
+    monkeypatch.setattr(main_pls, "write_run_stats", lambda cursor, stats: None)
+    s3 = FakeS3(main_pls.settings)
+    monkeypatch.setattr(main_pls, "S3", lambda _settings: s3)
     monkeypatch.setattr(main_pls, "get_lock", lambda lock_id, table: FakeLock())
     monkeypatch.setattr(main_pls.boto3, "resource", lambda *args, **kwargs: FakeDynamoResource())
 
@@ -102,6 +132,21 @@ def test_main_publishes_uploaded_presigned_url_to_kafka(
         "file_path": str(tmp_path / "pls.db"),
         "presigned_url_expiry_seconds": 3600,
     }
+    assert recorded["manifest"] == {
+        "bucket_name": "pls-feature-service-etl",
+        "prefix": "pls-etl/",
+        "key": "pls-etl/2026-04-23T02:02:30+0000/pls.db",
+    }
+    run_stats_report = json.loads(
+        s3.objects[
+            (
+                "pls-feature-service-etl",
+                "pls-etl/2026-04-23T02:02:30+0000/run_stats.json",
+            )
+        ]
+    )
+    assert run_stats_report["s3-key"] == "pls-etl/2026-04-23T02:02:30+0000/pls.db"
+    assert "upload" in [stage["stage"] for stage in run_stats_report["stages"]]
     assert recorded["publish"] == {
         "presigned_url": "https://example.com/presigned",
         "headers": {
@@ -113,5 +158,8 @@ def test_main_publishes_uploaded_presigned_url_to_kafka(
             "s3-bucket": "pls-feature-service-etl",
             "s3-key": "pls-etl/2026-04-23T02:02:30+0000/pls.db",
             "presigned-url-expiry-seconds": "3600",
+            "artifact-content-encoding": "identity",
+            "artifact-size-bytes": "0",
+            "artifact-uncompressed-size-bytes": "0",
         },
     }
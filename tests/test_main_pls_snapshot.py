@@ -0,0 +1,225 @@
+import shutil
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+import main_pls
+from address_etl.pls.tables import optimize_sqlite_for_bulk_inserts
+from address_etl.run_stats import run_stats
+
+
+class FakeDynamoResource:
+    def Table(self, _name):
+        return object()
+
+
+class FakeLock:
+    @contextmanager
+    def acquire(self):
+        yield
+
+
+class FakeS3:
+    def __init__(self, _settings):
+        pass
+
+    def bucket_exists(self, _bucket_name: str) -> bool:
+        return True
+
+    def create_object(self, bucket_name: str, key: str, body: bytes) -> None:
+        pass
+
+
+class Bucket:
+    """An S3 bucket holding the uploaded files in a directory."""
+
+    def __init__(self, path):
+        self.path = path
+        self.path.mkdir()
+        self.latest = None
+
+    def upload_file(self, bucket_name, key, file_path, s3, **kwargs) -> str:
+        # Only the database file is uploaded, not its -wal or -shm files.
+        shutil.copyfile(file_path, self.path / key.replace("/", "_"))
+        return f"https://example.com/{key}"
+
+    def download_file(self, bucket_name, key, file_path, s3) -> None:
+        shutil.copyfile(self.path / key.replace("/", "_"), file_path)
+
+    def write_latest_manifest(self, bucket_name, prefix, key, s3) -> None:
+        self.latest = key
+
+    def get_latest_file(self, bucket_name, s3, prefix="") -> str | None:
+        return self.latest
+
+    @contextmanager
+    def open_latest(self):
+        connection = sqlite3.connect(self.path / self.latest.replace("/", "_"))
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+
+@pytest.fixture
+def bucket(monkeypatch, tmp_path):
+    bucket = Bucket(tmp_path / "bucket")
+    monkeypatch.setattr(main_pls, "upload_file", bucket.upload_file)
+    monkeypatch.setattr(main_pls, "download_file", bucket.download_file)
+    monkeypatch.setattr(main_pls, "write_latest_manifest", bucket.write_latest_manifest)
+    monkeypatch.setattr(main_pls, "get_latest_file", bucket.get_latest_file)
+    monkeypatch.setattr(main_pls, "S3", FakeS3)
+    monkeypatch.setattr(main_pls, "get_lock", lambda lock_id, table: FakeLock())
+    monkeypatch.setattr(
+        main_pls.boto3, "resource", lambda *args, **kwargs: FakeDynamoResource()
+    )
+    monkeypatch.setattr(main_pls, "publish_presigned_url", lambda url, headers: None)
+    monkeypatch.setattr(main_pls, "PREVIOUS_DB_PATH", str(tmp_path / "previous.db"))
+    monkeypatch.setattr(main_pls.settings, "use_minio", False)
+    monkeypatch.setattr(main_pls.settings, "pls_sqlite_fast_build", False)
+    monkeypatch.setattr(
+        main_pls.settings, "pls_sqlite_conn_str", str(tmp_path / "work" / "pls.db")
+    )
+    monkeypatch.setattr(
+        main_pls, "import_address_pid_mappings", lambda cursor, previous, **kwargs: None
+    )
+    monkeypatch.setattr(
+        main_pls, "import_geocodes", lambda cursor, previous, **kwargs: None
+    )
+    monkeypatch.setattr(main_pls, "populate_tables", lambda cursor, **kwargs: None)
+    monkeypatch.setattr(
+        main_pls, "prune_geocodes_without_addresses", lambda cursor: None
+    )
+    yield bucket
+    run_stats.stages.clear()
+
+
+def run_etl(monkeypatch, tmp_path, day: int) -> None:
+    """Run the ETL in a fresh working directory, like a scheduled task."""
+    shutil.rmtree(tmp_path / "work", ignore_errors=True)
+    run_stats.stages.clear()
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2026, 5, day, 2, 0, 0, tzinfo=pytz.UTC) + timedelta(
+                seconds=next(ticks)
+            )
+
+    ticks = iter(range(100))
+    monkeypatch.setattr(main_pls, "datetime", FakeDatetime)
+    main_pls.main()
+
+
+def test_second_run_keeps_geocode_site_links_of_the_uploaded_snapshot(
+    monkeypatch, tmp_path, bucket
+):
+    def import_geocodes(cursor, previous, **kwargs):
+        # Bulk inserts run in WAL mode, leaving the writes in the -wal file.
+        optimize_sqlite_for_bulk_inserts(cursor)
+        cursor.execute(
+            """
+            INSERT INTO lf_geocode_sp_survey_point
+            VALUES ('geocode-1', 'PC', '100', 'site-1', -27.5, 153.0, NULL)
+            """
+        )
+        cursor.connection.commit()
+
+    monkeypatch.setattr(main_pls, "import_geocodes", import_geocodes)
+    run_etl(monkeypatch, tmp_path, day=1)
+
+    monkeypatch.setattr(
+        main_pls, "import_geocodes", lambda cursor, previous, **kwargs: None
+    )
+    run_etl(monkeypatch, tmp_path, day=2)
+
+    with bucket.open_latest() as snapshot:
+        assert bucket.latest.startswith("pls-etl/2026-05-02")
+        assert snapshot.execute(
+            "SELECT geocode_id, site_id FROM lf_geocode_sp_survey_point"
+        ).fetchall() == [("geocode-1", "site-1")]
+
+
+def test_second_run_reads_stage_fingerprints_of_the_uploaded_snapshot(
+    monkeypatch, tmp_path, bucket
+):
+    previous_fingerprints = []
+
+    def populate_tables(cursor, fingerprints, **kwargs):
+        optimize_sqlite_for_bulk_inserts(cursor)
+        previous_fingerprints.append(fingerprints.previous)
+        fingerprints.is_unchanged("locality", "urn:qali:graph:geographical-names=10")
+
+    monkeypatch.setattr(main_pls, "populate_tables", populate_tables)
+    run_etl(monkeypatch, tmp_path, day=1)
+    run_etl(monkeypatch, tmp_path, day=2)
+
+    assert previous_fingerprints == [
+        {},
+        {"locality": "urn:qali:graph:geographical-names=10"},
+    ]
+
+
+def test_uploaded_snapshot_holds_the_run_stats_of_its_run(
+    monkeypatch, tmp_path, bucket
+):
+    previous_stage_totals = []
+
+    def populate_tables(cursor, **kwargs):
+        optimize_sqlite_for_bulk_inserts(cursor)
+        with run_stats.stage("address"):
+            pass
+
+    monkeypatch.setattr(main_pls, "populate_tables", populate_tables)
+    monkeypatch.setattr(
+        main_pls,
+        "find_regressions",
+        lambda previous, stages: previous_stage_totals.append(previous) or [],
+    )
+    run_etl(monkeypatch, tmp_path, day=1)
+
+    with bucket.open_latest() as snapshot:
+        assert snapshot.execute("SELECT end_time FROM metadata").fetchone()[0]
+        stages = [row[0] for row in snapshot.execute("SELECT stage FROM run_stats")]
+    assert "address" in stages
+
+    run_etl(monkeypatch, tmp_path, day=2)
+    assert len(previous_stage_totals) == 1
+    assert previous_stage_totals[0]["address"]["rows_written"] == 0
+
+
+def test_row_hashes_are_only_cleared_after_a_run_that_populated_them(
+    monkeypatch, tmp_path, bucket
+):
+    cleared = []
+    monkeypatch.setattr(main_pls, "clear_row_hashes", cleared.append)
+    monkeypatch.setattr(main_pls.settings, "build_changeset", False)
+    run_etl(monkeypatch, tmp_path, day=1)
+    run_etl(monkeypatch, tmp_path, day=2)
+    assert cleared == []
+
+    monkeypatch.setattr(main_pls.settings, "build_changeset", True)
+    monkeypatch.setattr(main_pls, "CHANGESET_DB_PATH", str(tmp_path / "changeset.db"))
+    monkeypatch.setattr(
+        main_pls,
+        "build_changeset",
+        lambda cursor, previous_db_path, path: sqlite3.connect(path).close(),
+    )
+    run_etl(monkeypatch, tmp_path, day=3)
+    monkeypatch.setattr(main_pls.settings, "build_changeset", False)
+    run_etl(monkeypatch, tmp_path, day=4)
+    assert len(cleared) == 1
+
+
+def test_previous_tables_to_read_only_include_reused_tables(monkeypatch):
+    monkeypatch.setattr(main_pls.settings, "pls_incremental_sparql", False)
+    monkeypatch.setattr(main_pls.settings, "pls_reuse_unchanged_rows", False)
+    monkeypatch.setattr(main_pls.settings, "skip_unchanged_stages", True)
+
+    table_names = main_pls.get_previous_tables_to_read()
+
+    assert "lf_road" in table_names
+    assert not {"lf_parcel", "lf_address", "lf_site", "locality"} & set(table_names)
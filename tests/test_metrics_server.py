@@ -0,0 +1,56 @@
+import sqlite3
+
+import httpx
+
+from address_etl import metrics_server
+from address_etl.metrics_server import render_metrics, start_metrics_server
+from address_etl.run_stats import RunStats, RunStatsConnection
+
+
+def test_render_metrics_reports_progress_of_current_stage(monkeypatch):
+    connection = sqlite3.connect(":memory:", factory=RunStatsConnection)
+    connection.execute("CREATE TABLE t (a)")
+    stats = RunStats()
+    stats.attach(connection)
+    monkeypatch.setattr(metrics_server, "run_stats", stats)
+
+    with stats.stage("road"):
+        connection.executemany("INSERT INTO t VALUES (?)", [(1,), (2,), (3,)])
+        stats.record_progress(1, 4, decode_queue_depth=2)
+        stats.record_retry("sparql")
+        stats.record_retry("esri")
+        stats.record_retry("sparql")
+        text = render_metrics()
+
+    assert 'address_etl_stage_info{stage="road"} 1' in text
+    assert "address_etl_stage_batches_done 1" in text
+    assert "address_etl_stage_batches_total 4" in text
+    assert "address_etl_rows_written_total 3" in text
+    assert "address_etl_decode_queue_depth 2" in text
+    assert 'address_etl_http_retries_total{source="esri"} 1' in text
+    assert 'address_etl_http_retries_total{source="sparql"} 2' in text
+    assert "# TYPE address_etl_http_retries_total counter" in text
+    rows_per_second = next(
+        line for line in text.splitlines() if line.startswith("address_etl_stage_rows")
+    )
+    assert float(rows_per_second.split()[1]) > 0
+
+    text = render_metrics()
+    assert "address_etl_stage_info{" not in text
+    assert "address_etl_resident_memory_bytes 0" not in text
+
+
+def test_metrics_server_serves_metrics_path():
+    server = start_metrics_server(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with httpx.Client() as client:
+            response = client.get(f"{url}/metrics")
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/plain")
+            assert "# TYPE address_etl_rows_written_total counter" in response.text
+
+            assert client.get(f"{url}/other").status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
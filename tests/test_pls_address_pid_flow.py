@@ -1,7 +1,9 @@
 import sqlite3
 
+from address_etl.geocode import insert_geocodes
+from address_etl.pls.decode import address_row
 from address_etl.pls.tables import (
-    build_address_insert_data,
+    attach_address_pids,
     create_tables,
     prune_addresses_without_pid_mapping,
     prune_geocodes_without_addresses,
@@ -20,31 +22,26 @@ def connection():
     return db
 
 
-def test_build_address_insert_data_skips_unmapped_addresses():
-    rows = [
-        {
-            "addr_iri": {"value": "https://example.com/address/1"},
-            "addr_id": {"value": "addr-1"},
-            "parcel_id": {"value": "parcel-1"},
-            "addr_status_code": {"value": "C"},
-            "road_id": {"value": "road-1"},
-            "site_id": {"value": "site-1"},
-            "address_standard": {"value": "STD"},
-        },
-        {
-            "addr_iri": {"value": "https://example.com/address/2"},
-            "addr_id": {"value": "addr-2"},
-            "parcel_id": {"value": "parcel-2"},
-            "addr_status_code": {"value": "C"},
-            "road_id": {"value": "road-2"},
-            "site_id": {"value": "site-2"},
-            "address_standard": {"value": "STD"},
-        },
-    ]
+def address_record(i):
+    return {
+        "addr_iri": f"https://example.com/address/{i}",
+        "addr_id": f"addr-{i}",
+        "parcel_id": f"parcel-{i}",
+        "addr_status_code": "C",
+        "road_id": f"road-{i}",
+        "site_id": f"site-{i}",
+        "address_standard": "STD",
+    }
+
+
+def test_attach_address_pids_skips_unmapped_addresses():
+    rows = [address_row(address_record(1)), address_row(address_record(2))]
+    missing_iris = []
 
-    insert_data, missing_iris = build_address_insert_data(
-        rows,
-        {"https://example.com/address/1": "100"},
+    insert_data = list(
+        attach_address_pids(
+            rows, {"https://example.com/address/1": "100"}, missing_iris
+        )
     )
 
     assert insert_data == [
@@ -72,6 +69,20 @@ def test_build_address_insert_data_skips_unmapped_addresses():
     assert missing_iris == ["https://example.com/address/2"]
 
 
+def test_attach_address_pids_streams_rows_and_records_missing_iris():
+    rows = iter([address_row(address_record(1)), address_row(address_record(2))])
+    missing_iris = []
+
+    insert_data = attach_address_pids(
+        rows, {"https://example.com/address/1": "100"}, missing_iris
+    )
+
+    assert next(insert_data)[:2] == ("addr-1", "100")
+    assert missing_iris == []
+    assert list(insert_data) == []
+    assert missing_iris == ["https://example.com/address/2"]
+
+
 def test_prune_addresses_without_pid_mapping():
     db = connection()
     try:
@@ -238,3 +249,129 @@ def test_update_geocode_site_id_and_prune_geocodes_without_addresses():
         ]
     finally:
         db.close()
+
+
+def test_update_geocode_site_id_only_relinks_stale_geocodes():
+    db = connection()
+    try:
+        cursor = db.cursor()
+        cursor.executemany(
+            """
+            INSERT INTO lf_address (
+                addr_id,
+                address_pid,
+                parcel_id,
+                addr_status_code,
+                road_id,
+                site_id,
+                address_standard
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                ("addr-1", "100", "parcel-1", "C", "road-1", "site-1", "STD"),
+                ("addr-2", "200", "parcel-2", "C", "road-2", "site-2b", "STD"),
+            ],
+        )
+        cursor.executemany(
+            """
+            INSERT INTO lf_geocode_sp_survey_point (
+                geocode_id,
+                geocode_type,
+                address_pid,
+                site_id,
+                centoid_lat,
+                centoid_lon,
+                hash
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                ("geo-1", "PC", "100", "site-1", -27.0, 153.0, None),
+                ("geo-2", "PC", "200", "site-2a", -28.0, 152.0, None),
+                ("geo-3", "PC", "100", None, -29.0, 151.0, None),
+            ],
+        )
+        db.commit()
+
+        update_geocode_site_id(cursor)
+
+        assert cursor.execute(
+            """
+            SELECT geocode_id, site_id
+            FROM lf_geocode_sp_survey_point
+            ORDER BY geocode_id
+            """
+        ).fetchall() == [
+            {"geocode_id": "geo-1", "site_id": "site-1"},
+            {"geocode_id": "geo-2", "site_id": "site-2b"},
+            {"geocode_id": "geo-3", "site_id": "site-1"},
+        ]
+    finally:
+        db.close()
+
+
+def test_insert_geocodes_keeps_site_id_unless_address_pid_changes():
+    db = connection()
+    try:
+        cursor = db.cursor()
+        cursor.executemany(
+            """
+            INSERT INTO lf_geocode_sp_survey_point (
+                geocode_id,
+                geocode_type,
+                address_pid,
+                site_id,
+                centoid_lat,
+                centoid_lon
+            ) VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                ("geo-1", "PC", "100", "site-1", -27.0, 153.0),
+                ("geo-2", "PC", "200", "site-2", -28.0, 152.0),
+            ],
+        )
+        db.commit()
+
+        insert_geocodes(
+            cursor,
+            [
+                {
+                    "attributes": {
+                        "objectid": "geo-1",
+                        "address_pid": "100",
+                        "geocode_type": "DF",
+                    },
+                    "geometry": {"x": 153.5, "y": -27.5},
+                },
+                {
+                    "attributes": {
+                        "objectid": "geo-2",
+                        "address_pid": "300",
+                        "geocode_type": "PC",
+                    },
+                    "geometry": {"x": 152.0, "y": -28.0},
+                },
+            ],
+        )
+
+        assert cursor.execute(
+            """
+            SELECT geocode_id, geocode_type, address_pid, site_id
+            FROM lf_geocode_sp_survey_point
+            ORDER BY geocode_id
+            """
+        ).fetchall() == [
+            {
+                "geocode_id": "geo-1",
+                "geocode_type": "DF",
+                "address_pid": "100",
+                "site_id": "site-1",
+            },
+            {
+                "geocode_id": "geo-2",
+                "geocode_type": "PC",
+                "address_pid": "300",
+                "site_id": None,
+            },
+        ]
+    finally:
+        db.close()
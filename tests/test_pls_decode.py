@@ -0,0 +1,98 @@
+import json
+
+import httpx
+import pytest
+
+from address_etl.pls import decode
+from address_etl.pls.decode import decode_rows, iter_decoded_batches, parcel_row
+from address_etl.sparql_profile import SparqlProfiler
+
+
+def parcel_binding(i):
+    return {
+        "parcel_id": {"value": f"https://example.com/parcel/{i}"},
+        "plan_no": {"value": f"RP{i}"},
+        "lot_no": {"value": str(i)},
+    }
+
+
+def parcel_client(requests):
+    def handler(request):
+        query = request.content.decode()
+        requests.append(query)
+        ids = [int(i) for i in query.split(",")]
+        return httpx.Response(
+            200,
+            json={"results": {"bindings": [parcel_binding(i) for i in ids]}},
+        )
+
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def get_query(iris):
+    return ",".join(str(i) for i in iris)
+
+
+def test_decode_rows_transforms_raw_response():
+    content = json.dumps(
+        {"results": {"bindings": [parcel_binding(1), parcel_binding(2)]}}
+    ).encode()
+
+    rows, decode_seconds = decode_rows(parcel_row, content)
+    assert rows == [
+        ("https://example.com/parcel/1", "RP1", "1"),
+        ("https://example.com/parcel/2", "RP2", "2"),
+    ]
+    assert decode_seconds >= 0
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_iter_decoded_batches_yields_batches_in_order(monkeypatch, workers):
+    monkeypatch.setattr(decode.settings, "pls_decode_workers", workers)
+    profiler = SparqlProfiler()
+    monkeypatch.setattr(decode, "sparql_profiler", profiler)
+    requests = []
+
+    with parcel_client(requests) as client:
+        batches = [
+            (batch_number, batch_iris, list(rows))
+            for batch_number, batch_iris, rows in iter_decoded_batches(
+                client, list(range(7)), 3, get_query, parcel_row
+            )
+        ]
+
+    assert requests == ["0,1,2", "3,4,5", "6"]
+    assert [batch_number for batch_number, _, _ in batches] == [1, 2, 3]
+    assert [batch_iris for _, batch_iris, _ in batches] == [[0, 1, 2], [3, 4, 5], [6]]
+    assert [row[2] for _, _, rows in batches for row in rows] == [
+        str(i) for i in range(7)
+    ]
+    assert [(batch.batch, batch.rows) for batch in profiler.batches] == [
+        (1, 3),
+        (2, 3),
+        (3, 1),
+    ]
+
+
+def test_iter_decoded_batches_decodes_serial_batches_lazily(monkeypatch):
+    monkeypatch.setattr(decode.settings, "pls_decode_workers", 0)
+    profiler = SparqlProfiler()
+    monkeypatch.setattr(decode, "sparql_profiler", profiler)
+
+    with parcel_client([]) as client:
+        batches = iter_decoded_batches(client, list(range(5)), 3, get_query, parcel_row)
+        _, _, rows = next(batches)
+        assert next(rows) == ("https://example.com/parcel/0", "RP0", "0")
+        assert rows.count == 1
+        assert list(rows)[-1][0] == "https://example.com/parcel/2"
+        assert profiler.batches == []
+
+        _, _, rows = next(batches)
+        assert [(batch.batch, batch.rows) for batch in profiler.batches] == [(1, 3)]
+        assert len(list(rows)) == 2
+        assert list(batches) == []
+
+    assert [(batch.batch, batch.rows) for batch in profiler.batches] == [
+        (1, 3),
+        (2, 2),
+    ]
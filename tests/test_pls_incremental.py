@@ -0,0 +1,274 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytz
+
+from address_etl.id_map import text_to_id_for_pk
+from address_etl.metadata import (
+    metadata_read_full_rebuild_time,
+    metadata_write_full_rebuild_time,
+    metadata_write_start_time,
+)
+from address_etl.pls import incremental
+from address_etl.pls.incremental import (
+    delete_changed_address_rows,
+    is_incremental_run,
+    prune_unreferenced_rows,
+    relink_refetched_geocodes,
+    replace_refetched_rows,
+)
+from address_etl.pls.tables import create_tables
+from address_etl.sqlite_dict_factory import dict_row_factory
+
+
+def connection():
+    db = sqlite3.connect(":memory:")
+    db.row_factory = dict_row_factory
+    cursor = db.cursor()
+    create_tables(cursor)
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    db.commit()
+    return db
+
+
+def test_is_incremental_run_forces_periodic_full_rebuild(monkeypatch):
+    now = datetime(2025, 1, 10, tzinfo=pytz.UTC)
+    monkeypatch.setattr(incremental.settings, "pls_incremental_sparql", True)
+    monkeypatch.setattr(incremental.settings, "pls_full_rebuild_interval_days", 7)
+
+    assert is_incremental_run(now - timedelta(days=2), now)
+    assert not is_incremental_run(now - timedelta(days=8), now)
+    assert not is_incremental_run(None, now)
+
+    monkeypatch.setattr(incremental.settings, "pls_incremental_sparql", False)
+    assert not is_incremental_run(now - timedelta(days=2), now)
+
+
+def test_metadata_full_rebuild_time_round_trip():
+    db = connection()
+    try:
+        cursor = db.cursor()
+        metadata_write_start_time(cursor, "2025-01-10T10:00:00+1000")
+        assert metadata_read_full_rebuild_time(cursor) is None
+
+        metadata_write_full_rebuild_time(cursor, "2025-01-05T10:00:00+1000")
+        assert metadata_read_full_rebuild_time(cursor) == datetime.fromisoformat(
+            "2025-01-05T10:00:00+10:00"
+        )
+    finally:
+        db.close()
+
+
+def test_delete_changed_address_rows_removes_addresses_sites_and_place_names():
+    db = connection()
+    try:
+        cursor = db.cursor()
+        cursor.executemany(
+            "INSERT INTO lf_address_id_map (iri) VALUES (?)",
+            [
+                ("https://example.com/a1/road-1/https://example.com/p1",),
+                ("https://example.com/a10/road-1/https://example.com/p2",),
+            ],
+        )
+        cursor.executemany(
+            "INSERT INTO lf_site_id_map (iri) VALUES (?)",
+            [
+                ("https://example.com/p1|https://example.com/a1",),
+                ("https://example.com/p2|https://example.com/a10",),
+            ],
+        )
+        cursor.executemany(
+            "INSERT INTO lf_site (site_id, site_type, parcel_id) VALUES (?, 'P', ?)",
+            [("1", "1"), ("2", "2")],
+        )
+        cursor.executemany(
+            "INSERT INTO lf_place_name VALUES (?, 'P', 'PROP', ?, ?, NULL)",
+            [("1", "Place One", "1"), ("2", "Place Ten", "2")],
+        )
+        cursor.executemany(
+            """
+            INSERT INTO lf_address (addr_id, address_pid, parcel_id, addr_status_code, road_id, site_id, address_standard)
+            VALUES (?, ?, ?, 'C', '1', ?, 'STD')
+            """,
+            [("1", "100", "1", "1"), ("2", "200", "2", "2")],
+        )
+        db.commit()
+
+        delete_changed_address_rows(cursor, ["https://example.com/a1"])
+
+        cursor.execute("SELECT addr_id FROM lf_address")
+        assert [row["addr_id"] for row in cursor.fetchall()] == ["2"]
+        cursor.execute("SELECT site_id FROM lf_site")
+        assert [row["site_id"] for row in cursor.fetchall()] == ["2"]
+        cursor.execute("SELECT place_name_id FROM lf_place_name")
+        assert [row["place_name_id"] for row in cursor.fetchall()] == ["2"]
+    finally:
+        db.close()
+
+
+def test_replace_refetched_rows_keeps_the_mapped_id():
+    db = connection()
+    try:
+        cursor = db.cursor()
+        cursor.executemany(
+            "INSERT INTO lf_road_id_map (iri) VALUES (?)",
+            [("road-1",), ("road-2",)],
+        )
+        cursor.executemany(
+            """
+            INSERT INTO lf_road (road_id, road_name, locality_code, road_cat_desc)
+            VALUES (?, ?, '1', 'P')
+            """,
+            [("1", "OLD NAME"), ("2", "UNCHANGED"), ("road-1", "NEW NAME")],
+        )
+        db.commit()
+
+        replace_refetched_rows(cursor)
+        text_to_id_for_pk("lf_road_id_map", "lf_road", "road_id", cursor)
+
+        cursor.execute("SELECT road_id, road_name FROM lf_road ORDER BY road_id")
+        assert cursor.fetchall() == [
+            {"road_id": "1", "road_name": "NEW NAME"},
+            {"road_id": "2", "road_name": "UNCHANGED"},
+        ]
+    finally:
+        db.close()
+
+
+def test_prune_unreferenced_rows_removes_roads_and_parcels_of_retired_addresses():
+    db = connection()
+    try:
+        cursor = db.cursor()
+        cursor.executemany(
+            "INSERT INTO lf_address_id_map (iri) VALUES (?)",
+            [
+                ("https://example.com/a1/road-1/https://example.com/p1",),
+                ("https://example.com/a2/road-2/https://example.com/p2",),
+                ("https://example.com/a3/road-2/https://example.com/p3",),
+            ],
+        )
+        cursor.executemany(
+            "INSERT INTO lf_site_id_map (iri) VALUES (?)",
+            [
+                ("https://example.com/p1|https://example.com/a1",),
+                ("https://example.com/p2|https://example.com/a2",),
+                ("https://example.com/p3|https://example.com/a3",),
+            ],
+        )
+        cursor.executemany(
+            "INSERT INTO lf_site (site_id, site_type, parcel_id) VALUES (?, 'P', ?)",
+            [("1", "1"), ("2", "2"), ("3", "3")],
+        )
+        cursor.executemany(
+            """
+            INSERT INTO lf_road (road_id, road_name, locality_code, road_cat_desc)
+            VALUES (?, 'ROAD', '1', 'P')
+            """,
+            [("1",), ("2",)],
+        )
+        cursor.executemany(
+            "INSERT INTO lf_parcel (parcel_id, plan_no, lot_no) VALUES (?, 'SP1', ?)",
+            [("1", "1"), ("2", "2"), ("3", "3")],
+        )
+        cursor.executemany(
+            """
+            INSERT INTO lf_address (addr_id, address_pid, parcel_id, addr_status_code, road_id, site_id, address_standard)
+            VALUES (?, ?, ?, 'C', ?, ?, 'STD')
+            """,
+            [
+                ("1", "100", "1", "1", "1"),
+                ("2", "200", "2", "2", "2"),
+                ("3", "300", "3", "2", "3"),
+            ],
+        )
+        cursor.executemany(
+            "INSERT INTO lf_parcel_id_map (iri) VALUES (?)",
+            [(f"https://example.com/p{i}",) for i in range(1, 4)],
+        )
+        db.commit()
+
+        # a1 was retired. a2 changed and its parcel was fetched again, and its
+        # road is still referenced by a3.
+        delete_changed_address_rows(
+            cursor, ["https://example.com/a1", "https://example.com/a2"]
+        )
+        cursor.execute(
+            """
+            INSERT INTO lf_parcel (parcel_id, plan_no, lot_no)
+            VALUES ('https://example.com/p2', 'SP1', '2')
+            """
+        )
+        replace_refetched_rows(cursor)
+        prune_unreferenced_rows(cursor)
+
+        cursor.execute("SELECT road_id FROM lf_road ORDER BY road_id")
+        assert [row["road_id"] for row in cursor.fetchall()] == ["2"]
+        cursor.execute("SELECT parcel_id FROM lf_parcel ORDER BY parcel_id")
+        assert [row["parcel_id"] for row in cursor.fetchall()] == [
+            "3",
+            "https://example.com/p2",
+        ]
+    finally:
+        db.close()
+
+
+def test_relink_refetched_geocodes_only_uses_unmapped_sites():
+    db = connection()
+    try:
+        cursor = db.cursor()
+        cursor.execute(
+            "INSERT INTO lf_site_id_map (iri) VALUES ('https://example.com/p1|https://example.com/a1')"
+        )
+        cursor.execute(
+            "INSERT INTO lf_site_id_map (iri) VALUES ('https://example.com/p2|https://example.com/a2')"
+        )
+        cursor.executemany(
+            """
+            INSERT INTO lf_address (addr_id, address_pid, parcel_id, addr_status_code, road_id, site_id, address_standard)
+            VALUES (?, ?, '1', 'C', '1', ?, 'STD')
+            """,
+            [
+                ("1", "100", "1"),
+                ("2", "200", "2"),
+                (
+                    "https://example.com/a3",
+                    "300",
+                    "https://example.com/p3|https://example.com/a3",
+                ),
+            ],
+        )
+        cursor.executemany(
+            """
+            INSERT INTO lf_geocode_sp_survey_point (geocode_id, geocode_type, address_pid, site_id, centoid_lat, centoid_lon)
+            VALUES (?, 'PC', ?, ?, -27.4, 153.0)
+            """,
+            [
+                ("g1", "100", "https://example.com/p1|https://example.com/a1"),
+                # Imported this run for an address carried over unchanged.
+                ("g2", "200", None),
+                ("g3", "300", None),
+            ],
+        )
+        db.commit()
+
+        relink_refetched_geocodes(cursor)
+
+        cursor.execute(
+            "SELECT geocode_id, site_id FROM lf_geocode_sp_survey_point ORDER BY geocode_id"
+        )
+        assert cursor.fetchall() == [
+            {
+                "geocode_id": "g1",
+                "site_id": "https://example.com/p1|https://example.com/a1",
+            },
+            {
+                "geocode_id": "g2",
+                "site_id": "https://example.com/p2|https://example.com/a2",
+            },
+            {
+                "geocode_id": "g3",
+                "site_id": "https://example.com/p3|https://example.com/a3",
+            },
+        ]
+    finally:
+        db.close()
@@ -0,0 +1,110 @@
+import sqlite3
+
+from address_etl.id_map import text_to_id_for_pk
+from address_etl.pls import tables
+from address_etl.pls.discovered import DiscoveredIris
+from address_etl.pls.tables import create_tables, reuse_previous_rows, road_key
+from address_etl.sqlite_dict_factory import dict_row_factory
+
+
+def create_database(path):
+    db = sqlite3.connect(path)
+    db.row_factory = dict_row_factory
+    cursor = db.cursor()
+    create_tables(cursor)
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    cursor.executemany(
+        "INSERT INTO lf_parcel_id_map (iri) VALUES (?)",
+        [(f"https://example.com/parcel/{i}",) for i in range(1, 5)],
+    )
+    db.commit()
+    return db
+
+
+def test_reuse_previous_rows_copies_known_iris_and_samples_for_drift(
+    tmp_path, monkeypatch
+):
+    previous_path = str(tmp_path / "previous.db")
+    previous = create_database(previous_path)
+    previous.executemany(
+        "INSERT INTO lf_parcel (parcel_id, plan_no, lot_no) VALUES (?, ?, ?)",
+        [(str(i), f"RP{i}", str(i)) for i in range(1, 5)],
+    )
+    previous.commit()
+    previous.close()
+
+    # Rows with an id in today's slot of the rotation are fetched again.
+    monkeypatch.setattr(tables.settings, "pls_reuse_drift_sample_days", 1)
+    db = create_database(":memory:")
+    try:
+        cursor = db.cursor()
+        cursor.execute("ATTACH DATABASE ? AS previous", (previous_path,))
+        remaining = reuse_previous_rows(
+            cursor,
+            "lf_parcel",
+            "parcel_id",
+            "lf_parcel_id_map",
+            ["https://example.com/parcel/2", "https://example.com/parcel/9"],
+        )
+        assert remaining == [
+            "https://example.com/parcel/2",
+            "https://example.com/parcel/9",
+        ]
+
+        monkeypatch.setattr(tables.settings, "pls_reuse_drift_sample_days", 10**9)
+        remaining = reuse_previous_rows(
+            cursor,
+            "lf_parcel",
+            "parcel_id",
+            "lf_parcel_id_map",
+            ["https://example.com/parcel/2", "https://example.com/parcel/9"],
+        )
+        assert remaining == ["https://example.com/parcel/9"]
+
+        text_to_id_for_pk("lf_parcel_id_map", "lf_parcel", "parcel_id", cursor)
+        cursor.execute("SELECT parcel_id, plan_no, lot_no FROM lf_parcel")
+        assert cursor.fetchall() == [
+            {"parcel_id": "2", "plan_no": "RP2", "lot_no": "2"}
+        ]
+    finally:
+        db.close()
+
+
+def test_reuse_previous_rows_keys_discovered_rows(tmp_path, monkeypatch):
+    road_id = "https://example.com/road/1/3000/MAIN"
+    previous_path = str(tmp_path / "previous.db")
+    previous = create_database(previous_path)
+    previous.execute("INSERT INTO lf_road_id_map (iri) VALUES (?)", (road_id,))
+    previous.execute(
+        "INSERT INTO lf_road (road_id, road_name, locality_code, road_cat_desc) "
+        "VALUES ('1', 'Main', '3000', 'S')"
+    )
+    previous.commit()
+    previous.close()
+
+    monkeypatch.setattr(tables.settings, "pls_reuse_drift_sample_days", 10**9)
+    db = create_database(":memory:")
+    try:
+        cursor = db.cursor()
+        cursor.execute("INSERT INTO lf_road_id_map (iri) VALUES (?)", (road_id,))
+        cursor.execute("ATTACH DATABASE ? AS previous", (previous_path,))
+        with DiscoveredIris(("road", "locality_code", "_road_name"), 1) as iris:
+            iris.extend(
+                [
+                    ("https://example.com/road/2", "3000", "High"),
+                    ("https://example.com/road/1", "3000", "Main"),
+                    ("https://example.com/road/3", "3001", "Low"),
+                ]
+            )
+            remaining = reuse_previous_rows(
+                cursor, "lf_road", "road_id", "lf_road_id_map", iris, key=road_key
+            )
+
+        assert [iri["road"] for iri in remaining] == [
+            "https://example.com/road/2",
+            "https://example.com/road/3",
+        ]
+        cursor.execute("SELECT road_id, road_name FROM lf_road")
+        assert cursor.fetchall() == [{"road_id": road_id, "road_name": "Main"}]
+    finally:
+        db.close()
@@ -0,0 +1,28 @@
+from address_etl import profiling
+from address_etl.profiling import profile_stage
+
+
+def test_profile_stage_writes_reports_for_listed_stages(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "profile_files", [])
+    monkeypatch.setattr(profiling.settings, "profile_stages", ["address"])
+    monkeypatch.setattr(profiling.settings, "profilers", ["cprofile", "tracemalloc"])
+
+    with profile_stage("road"):
+        pass
+    assert profiling.profile_files == []
+
+    with profile_stage("address"), profile_stage("address"):
+        [str(i) for i in range(1000)]
+
+    assert sorted(path.name for path in profiling.profile_files) == [
+        "address.prof",
+        "address.prof.txt",
+        "address.tracemalloc.txt",
+    ]
+    assert "function calls" in (tmp_path / "address.prof.txt").read_text()
+    assert (
+        (tmp_path / "address.tracemalloc.txt")
+        .read_text()
+        .startswith("Traced memory at the end of stage address")
+    )
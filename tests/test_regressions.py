@@ -0,0 +1,104 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+import pytz
+
+from address_etl import regressions as regressions_module
+from address_etl.regressions import find_regressions, read_stage_totals
+from address_etl.run_stats import RunStats, StageStats, write_run_stats
+from address_etl.sqlite_dict_factory import dict_row_factory
+from main_pls import build_artifact_headers
+
+
+def stage_stats(stage, wall_seconds, rows_written=0, bytes_received=0):
+    return StageStats(
+        stage=stage,
+        started_at="2026-04-23T02:00:00+00:00",
+        wall_seconds=wall_seconds,
+        rows_written=rows_written,
+        http_requests=0,
+        bytes_received=bytes_received,
+        retries=0,
+        peak_rss_bytes=0,
+        commits=0,
+        sql_statements=0,
+        sql_seconds=0.0,
+    )
+
+
+def test_read_stage_totals_sums_repeated_stages(tmp_path):
+    previous_path = tmp_path / "previous.db"
+    previous = sqlite3.connect(previous_path)
+    stats = RunStats()
+    stats.stages = [
+        stage_stats("address", 100.0, rows_written=10),
+        stage_stats("geocodes", 80.0, bytes_received=500),
+        stage_stats("address", 20.0, rows_written=5),
+    ]
+    write_run_stats(previous.cursor(), stats)
+    previous.close()
+
+    connection = sqlite3.connect(":memory:")
+    connection.row_factory = dict_row_factory
+    cursor = connection.cursor()
+    assert read_stage_totals(cursor) == {}
+
+    cursor.execute("ATTACH DATABASE ? AS previous", (str(previous_path),))
+    totals = read_stage_totals(cursor, "previous")
+    assert totals["address"]["wall_seconds"] == 120.0
+    assert totals["address"]["rows_written"] == 15
+    assert totals["geocodes"]["bytes_received"] == 500
+
+
+def test_find_regressions_flags_figures_beyond_their_factor(monkeypatch, caplog):
+    monkeypatch.setattr(
+        regressions_module.settings,
+        "regression_factors",
+        {"wall_seconds": 1.5, "bytes_received": 2.0},
+    )
+    monkeypatch.setattr(regressions_module.settings, "regression_min_wall_seconds", 60)
+    previous = {
+        "address": {"wall_seconds": 100.0, "bytes_received": 1000},
+        "geocodes": {"wall_seconds": 200.0, "bytes_received": 1000},
+        "road": {"wall_seconds": 10.0, "bytes_received": 0},
+    }
+
+    regressions = find_regressions(
+        previous,
+        [
+            stage_stats("address", 160.0, bytes_received=1500),
+            stage_stats("geocodes", 210.0, bytes_received=2500),
+            stage_stats("road", 100.0),
+            stage_stats("upload", 100.0),
+        ],
+    )
+
+    assert [str(regression) for regression in regressions] == [
+        "address wall_seconds 1.60x",
+        "geocodes bytes_received 2.50x",
+    ]
+    assert "Performance regression in stage address" in caplog.text
+
+    now = datetime(2026, 4, 23, 2, 0, 0, tzinfo=pytz.UTC)
+    headers = build_artifact_headers(
+        etl_started_at=now,
+        etl_finished_at=now,
+        artifact_uploaded_at=now,
+        duration_seconds=0,
+        s3_bucket="bucket",
+        s3_key="key",
+        presigned_url_expiry_seconds=0,
+        regressions=regressions,
+    )
+    assert headers["performance-regressions"] == (
+        "address wall_seconds 1.60x, geocodes bytes_received 2.50x"
+    )
+
+
+def test_find_regressions_rejects_unknown_metrics(monkeypatch):
+    monkeypatch.setattr(
+        regressions_module.settings, "regression_factors", {"peak_rss": 2.0}
+    )
+    with pytest.raises(ValueError):
+        find_regressions({}, [])
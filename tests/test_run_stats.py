@@ -0,0 +1,82 @@
+import os
+import sqlite3
+
+import httpx
+import pytest
+
+from address_etl.run_stats import (
+    RunStats,
+    RunStatsConnection,
+    run_stats,
+    write_run_stats,
+)
+from address_etl.sqlite_dict_factory import dict_row_factory
+
+
+def test_stage_records_counters_of_the_stage_only():
+    connection = sqlite3.connect(":memory:", factory=RunStatsConnection)
+    connection.execute("CREATE TABLE t (a)")
+    stats = RunStats()
+    stats.attach(connection)
+    client = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, text="ok")),
+        event_hooks={"response": [stats.record_http_response]},
+    )
+
+    client.get("http://example.com")
+    with stats.stage("insert"):
+        connection.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+        connection.commit()
+        client.get("http://example.com")
+        stats.record_retry("sparql")
+
+    [stage] = stats.stages
+    assert stage.stage == "insert"
+    assert stage.rows_written == 2
+    assert stage.http_requests == 1
+    assert stage.bytes_received == 2
+    assert stage.retries == 1
+    assert stage.peak_rss_bytes > 0
+    assert stage.wall_seconds >= 0
+    connection.close()
+
+
+@pytest.mark.skipif(
+    not os.path.exists("/proc/self/clear_refs"), reason="needs Linux /proc"
+)
+def test_stage_peak_rss_is_per_stage():
+    stats = RunStats()
+    size = 64 * 1024**2
+    with stats.stage("outer"):
+        data = bytearray(size)
+        data[::4096] = b"\1" * len(data[::4096])
+        del data
+        with stats.stage("inner"):
+            pass
+
+    inner, outer = stats.stages
+    assert outer.peak_rss_bytes - inner.peak_rss_bytes > size // 2
+
+
+def test_connection_commits_are_counted():
+    connection = sqlite3.connect(":memory:", factory=RunStatsConnection)
+    commits = run_stats.commits
+    connection.commit()
+    assert run_stats.commits == commits + 1
+    connection.close()
+
+
+def test_write_run_stats_replaces_previous_rows():
+    connection = sqlite3.connect(":memory:")
+    connection.row_factory = dict_row_factory
+    cursor = connection.cursor()
+    stats = RunStats()
+    with stats.stage("road"):
+        pass
+
+    write_run_stats(cursor, stats)
+    write_run_stats(cursor, stats)
+
+    cursor.execute("SELECT stage, rows_written, commits FROM run_stats")
+    assert cursor.fetchall() == [{"stage": "road", "rows_written": 0, "commits": 0}]
+    connection.close()
@@ -1,4 +1,4 @@
-from address_etl.s3 import S3, get_latest_file
+from address_etl.s3 import S3, get_latest_file, write_latest_manifest
 
 
 def test_get_latest_file(s3: S3):
@@ -18,7 +18,44 @@ def test_get_latest_file(s3: S3):
     result = get_latest_file("test-bucket", s3, "pls-etl/")
     assert result == "pls-etl/2025-05-28T00:00:00+1000/pls.db"
 
+    # Reports uploaded beside a newer database are not databases themselves.
+    s3.create_object(
+        "test-bucket", "pls-etl/2025-05-29T00:00:00+1000/timeline.json", b"{}"
+    )
+    s3.create_object(
+        "test-bucket", "pls-etl/2025-05-29T00:00:00+1000/pls.db.zst", b"\x28"
+    )
+    result = get_latest_file("test-bucket", s3, "pls-etl/")
+    assert result == "pls-etl/2025-05-29T00:00:00+1000/pls.db.zst"
+
     # Get latest file retrieves the objects sorted in desc lexigraphical order
     # So here, the z/ will be sorted first and match on the empty prefix
     result = get_latest_file("test-bucket", s3, "")
     assert result == "z/2025-05-28T00:00:00+1000/pls.db"
+
+
+def test_get_latest_file_reads_manifest(s3: S3):
+    s3.create_bucket("test-bucket")
+    s3.create_object(
+        "test-bucket", "pls-etl/2025-05-28T00:00:00+1000/pls.db", b"Hello, world!"
+    )
+    s3.create_object(
+        "test-bucket", "pls-etl/2025-05-27T00:00:00+1000/pls.db", b"Hello, world!"
+    )
+
+    write_latest_manifest(
+        "test-bucket", "pls-etl/", "pls-etl/2025-05-27T00:00:00+1000/pls.db", s3
+    )
+
+    result = get_latest_file("test-bucket", s3, "pls-etl/")
+    assert result == "pls-etl/2025-05-27T00:00:00+1000/pls.db"
+
+
+def test_get_latest_file_lists_past_first_page(s3: S3):
+    s3.create_bucket("test-bucket")
+    # List requests return at most 1000 keys per page.
+    for i in range(1100):
+        s3.create_object("test-bucket", f"pls-etl/{i:04d}/pls.db", b"")
+
+    result = get_latest_file("test-bucket", s3, "pls-etl/")
+    assert result == "pls-etl/1099/pls.db"
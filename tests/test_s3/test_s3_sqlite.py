@@ -1,7 +1,10 @@
+import os
 import sqlite3
 import tempfile
 
-from address_etl.s3 import S3, download_file, upload_file
+import pytest
+
+from address_etl.s3 import S3, download_file, upload_compressed_file, upload_file
 
 
 def test_sqlite_to_s3(s3: S3):
@@ -22,3 +25,38 @@ def test_sqlite_to_s3(s3: S3):
             conn = sqlite3.connect(temp_file.name)
             result = conn.execute("SELECT name FROM test")
             assert result.fetchone() == ("test",)
+
+
+def test_compressed_sqlite_to_s3(s3: S3):
+    pytest.importorskip("zstandard")
+
+    bucket_name = "test-bucket"
+    s3.create_bucket(bucket_name)
+
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as temp_file:
+        conn = sqlite3.connect(temp_file.name)
+        conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany(
+            "INSERT INTO test (name) VALUES (?)",
+            [
+                (f"https://linked.data.gov.au/dataset/qld-addr/{i}",)
+                for i in range(1000)
+            ],
+        )
+        conn.commit()
+
+        _presigned_url, compressed_size = upload_compressed_file(
+            bucket_name, "test.sqlite.zst", temp_file.name, s3
+        )
+        assert (
+            compressed_size
+            == s3.head_object(bucket_name, "test.sqlite.zst")["ContentLength"]
+        )
+        assert compressed_size < os.path.getsize(temp_file.name)
+
+        with tempfile.NamedTemporaryFile(suffix=".sqlite") as temp_file:
+            download_file(bucket_name, "test.sqlite.zst", temp_file.name, s3)
+
+            conn = sqlite3.connect(temp_file.name)
+            result = conn.execute("SELECT COUNT(*) FROM test")
+            assert result.fetchone() == (1000,)
@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+
+from address_etl.s3 import S3, upload_file
+
+pytest.importorskip("apsw")
+
+from address_etl.s3_vfs import copy_tables_from_s3
+
+
+def test_copy_tables_from_s3_with_range_requests(s3: S3, tmp_path):
+    bucket_name = "test-bucket"
+    s3.create_bucket(bucket_name)
+
+    source_path = tmp_path / "pls.db"
+    source = sqlite3.connect(source_path)
+    source.execute("CREATE TABLE metadata (id INTEGER PRIMARY KEY, start_time TEXT)")
+    source.execute(
+        "INSERT INTO metadata (start_time) VALUES ('2026-04-22T12:00:00+1000')"
+    )
+    source.execute("CREATE TABLE lf_address (addr_id TEXT PRIMARY KEY)")
+    source.commit()
+    source.close()
+    upload_file(bucket_name, "pls-etl/pls.db", str(source_path), s3)
+
+    destination = tmp_path / "previous.db"
+    copy_tables_from_s3(
+        s3, bucket_name, "pls-etl/pls.db", str(destination), ("metadata",)
+    )
+
+    local = sqlite3.connect(destination)
+    try:
+        assert local.execute("SELECT start_time FROM metadata").fetchall() == [
+            ("2026-04-22T12:00:00+1000",)
+        ]
+        assert (
+            local.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'lf_address'"
+            ).fetchall()
+            == []
+        )
+    finally:
+        local.close()
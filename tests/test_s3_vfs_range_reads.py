@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("apsw")
+
+from address_etl.s3_vfs import S3RangeReader, copy_tables_from_s3
+
+
+class FakeS3:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.ranges = []
+
+    def head_object(self, bucket_name: str, key: str) -> dict:
+        return {"ContentLength": len(self.body)}
+
+    def get_object_range(self, bucket_name: str, key: str, start: int, end: int):
+        self.ranges.append((start, end))
+        return self.body[start : end + 1]
+
+
+def test_range_reader_serves_reads_across_blocks_from_cache():
+    s3 = FakeS3(bytes(range(256)) * 4)
+    reader = S3RangeReader(s3, "bucket", "key", block_size=100, cache_bytes=1000)
+
+    assert reader.read(30, 90) == (bytes(range(256)) * 4)[90:120]
+    assert reader.read(10, 95) == (bytes(range(256)) * 4)[95:105]
+    assert reader.read(100, 1000) == (bytes(range(256)) * 4)[1000:]
+    assert s3.ranges == [(0, 99), (100, 199), (1000, 1023)]
+
+
+def test_copy_tables_from_s3_copies_only_requested_tables(tmp_path):
+    source_path = tmp_path / "source.db"
+    source = sqlite3.connect(source_path)
+    source.execute(
+        "CREATE TABLE lf_road_id_map (id INTEGER PRIMARY KEY AUTOINCREMENT, iri TEXT UNIQUE)"
+    )
+    source.execute("CREATE INDEX idx_lf_road_id_map_iri ON lf_road_id_map (iri)")
+    source.executemany(
+        "INSERT INTO lf_road_id_map (iri) VALUES (?)",
+        [(f"https://example.com/road/{i}",) for i in range(1000)],
+    )
+    source.execute("CREATE TABLE lf_address (addr_id TEXT PRIMARY KEY)")
+    source.commit()
+    source.close()
+
+    destination = tmp_path / "previous.db"
+    copy_tables_from_s3(
+        FakeS3(source_path.read_bytes()),
+        "bucket",
+        "pls-etl/2026-04-23T02:02:30+0000/pls.db",
+        str(destination),
+        ("lf_road_id_map", "address_iri_pid_map"),
+        block_size=4096,
+    )
+
+    local = sqlite3.connect(destination)
+    try:
+        assert local.execute(
+            "SELECT COUNT(*), MAX(id) FROM lf_road_id_map"
+        ).fetchone() == (
+            1000,
+            1000,
+        )
+        assert (
+            local.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'lf_address'"
+            ).fetchall()
+            == []
+        )
+    finally:
+        local.close()
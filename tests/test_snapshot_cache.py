@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from address_etl.snapshot_cache import evict_cache, get_cache_path, get_cached_file
+
+
+class FakeS3:
+    def __init__(self, objects: dict[str, tuple[str, bytes]]):
+        self.objects = objects
+        self.downloads = []
+
+    def head_object(self, bucket_name: str, key: str) -> dict:
+        etag, body = self.objects[key]
+        return {"ETag": f'"{etag}"', "ContentLength": len(body)}
+
+    def download_object_to_file(self, bucket_name: str, key: str, file_path: str):
+        self.downloads.append(key)
+        with open(file_path, "wb") as file:
+            file.write(self.objects[key][1])
+
+
+def test_get_cached_file_downloads_only_on_miss(tmp_path):
+    s3 = FakeS3({"pls-etl/a/pls.db": ("etag-1", b"snapshot")})
+
+    first = get_cached_file("bucket", "pls-etl/a/pls.db", str(tmp_path), s3, 1024)
+    second = get_cached_file("bucket", "pls-etl/a/pls.db", str(tmp_path), s3, 1024)
+
+    assert first == second
+    assert s3.downloads == ["pls-etl/a/pls.db"]
+    with open(first, "rb") as file:
+        assert file.read() == b"snapshot"
+
+
+def test_get_cached_file_downloads_again_when_etag_changes(tmp_path):
+    s3 = FakeS3({"pls-etl/a/pls.db": ("etag-1", b"snapshot")})
+    first = get_cached_file("bucket", "pls-etl/a/pls.db", str(tmp_path), s3, 1024)
+
+    s3.objects["pls-etl/a/pls.db"] = ("etag-2", b"replaced")
+    second = get_cached_file("bucket", "pls-etl/a/pls.db", str(tmp_path), s3, 1024)
+
+    assert first != second
+    assert s3.downloads == ["pls-etl/a/pls.db", "pls-etl/a/pls.db"]
+
+
+def test_get_cached_file_rejects_truncated_download(tmp_path):
+    class TruncatingS3(FakeS3):
+        def head_object(self, bucket_name: str, key: str) -> dict:
+            return {"ETag": '"etag-1"', "ContentLength": 100}
+
+    s3 = TruncatingS3({"key": ("etag-1", b"short")})
+
+    with pytest.raises(RuntimeError, match="expected 100"):
+        get_cached_file("bucket", "key", str(tmp_path), s3, 1024)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_evict_cache_removes_least_recently_used_files(tmp_path):
+    paths = [
+        get_cache_path(str(tmp_path), "bucket", f"key-{i}", "etag") for i in range(3)
+    ]
+    for i, path in enumerate(paths):
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (i, i))
+
+    evict_cache(str(tmp_path), 20, keep=paths[0])
+
+    assert [path.exists() for path in paths] == [True, False, True]
@@ -0,0 +1,44 @@
+from address_etl import sparql_profile
+from address_etl.sparql_profile import RequestTiming, SparqlProfiler
+
+
+def timing(ttfb_seconds, attempts=1):
+    request_timing = RequestTiming(attempts=attempts)
+    request_timing.ttfb_seconds = ttfb_seconds
+    return request_timing
+
+
+def test_slow_batch_report_keeps_keys_of_the_slowest_batches(monkeypatch):
+    monkeypatch.setattr(sparql_profile.settings, "sparql_slow_batch_report_size", 2)
+    profiler = SparqlProfiler()
+
+    for batch, seconds in enumerate([1.0, 5.0, 2.0, 4.0], start=1):
+        profiler.record(
+            "address", batch, [f"key-{batch}"], timing(seconds, batch), 100, 10, 0.5
+        )
+
+    report = profiler.report()
+    assert report["batches"] == 4
+    assert [
+        (batch["batch"], batch["keys"], batch["retries"], batch["total_seconds"])
+        for batch in report["slow_batches"]
+    ] == [(2, ["key-2"], 1, 5.5), (4, ["key-4"], 3, 4.5)]
+    assert [batch.keys for batch in profiler.batches] == [[], ["key-2"], [], ["key-4"]]
+
+
+def test_request_timing_from_trace_events(monkeypatch):
+    clock = iter([1.0, 1.5, 1.6, 2.6])
+    monkeypatch.setattr(sparql_profile.time, "perf_counter", lambda: next(clock))
+    request_timing = RequestTiming()
+    request_timing.start_attempt()
+
+    for event in (
+        "http11.send_request_headers.started",
+        "http11.receive_response_headers.complete",
+        "http11.receive_response_body.started",
+        "http11.receive_response_body.complete",
+    ):
+        request_timing.trace(event, {})
+
+    assert request_timing.ttfb_seconds == 0.5
+    assert request_timing.transfer_seconds == 1.0
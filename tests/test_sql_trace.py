@@ -0,0 +1,45 @@
+import logging
+import sqlite3
+
+from address_etl import sql_trace as sql_trace_module
+from address_etl.run_stats import RunStatsConnection
+from address_etl.sql_trace import SqlTrace, TracingCursor, normalize_sql
+
+
+def test_normalize_sql_groups_statements_by_shape():
+    assert normalize_sql("SELECT *\n  FROM t WHERE a = 1 AND b = 'x''y'") == (
+        "SELECT * FROM t WHERE a = ? AND b = ?"
+    )
+
+
+def test_tracing_cursor_aggregates_and_explains_slow_statements(monkeypatch, caplog):
+    trace = SqlTrace()
+    monkeypatch.setattr(sql_trace_module, "sql_trace", trace)
+    monkeypatch.setattr(sql_trace_module.settings, "sqlite_trace", True)
+    monkeypatch.setattr(sql_trace_module.settings, "sqlite_slow_query_seconds", 0)
+
+    connection = sqlite3.connect(":memory:", factory=RunStatsConnection)
+    cursor = connection.cursor()
+    assert isinstance(cursor, TracingCursor)
+
+    cursor.execute("CREATE TABLE t (a INTEGER PRIMARY KEY, b TEXT)")
+    cursor.executemany("INSERT INTO t (b) VALUES (?)", [("x",), ("y",)])
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        cursor.execute("SELECT b FROM t WHERE a = 1")
+        cursor.execute("SELECT b FROM t WHERE a = 2")
+
+    stats = trace.statements["SELECT b FROM t WHERE a = ?"]
+    assert stats.count == 2
+    assert trace.statements["INSERT INTO t (b) VALUES (?)"].rows == 2
+    assert trace.executions == 4
+    assert caplog.text.count("Query plan") == 1
+    assert "SEARCH t USING INTEGER PRIMARY KEY" in caplog.text
+    connection.close()
+
+
+def test_connection_cursors_are_plain_when_tracing_is_disabled(monkeypatch):
+    monkeypatch.setattr(sql_trace_module.settings, "sqlite_trace", False)
+    connection = sqlite3.connect(":memory:", factory=RunStatsConnection)
+    assert type(connection.cursor()) is sqlite3.Cursor
+    connection.close()
@@ -0,0 +1,194 @@
+import sqlite3
+
+from address_etl.metadata import metadata_read_start_time
+from address_etl.pls.tables import create_tables, reset_rebuilt_tables
+from address_etl.sqlite_build import (
+    PAGE_SIZE,
+    attach_read_only,
+    checkpoint_database,
+    clone_database,
+    open_build_connection,
+    persist_database,
+)
+from address_etl.sqlite_dict_factory import dict_row_factory
+
+
+def test_create_tables_sets_page_size_on_new_database(tmp_path):
+    connection = sqlite3.connect(tmp_path / "pls.db")
+    try:
+        create_tables(connection.cursor())
+        assert connection.execute("PRAGMA page_size").fetchone() == (PAGE_SIZE,)
+    finally:
+        connection.close()
+
+
+def test_persist_database_writes_compact_copy(tmp_path):
+    destination = tmp_path / "out" / "pls.db"
+    connection = open_build_connection()
+    connection.row_factory = dict_row_factory
+    try:
+        cursor = connection.cursor()
+        create_tables(cursor)
+        cursor.execute("INSERT INTO metadata (start_time) VALUES ('start')")
+        connection.commit()
+
+        persist_database(connection, str(destination))
+    finally:
+        connection.close()
+
+    assert not (tmp_path / "out" / "pls.db.tmp").exists()
+    persisted = sqlite3.connect(destination)
+    try:
+        assert persisted.execute("PRAGMA page_size").fetchone() == (PAGE_SIZE,)
+        assert persisted.execute("SELECT start_time FROM metadata").fetchall() == [
+            ("start",)
+        ]
+    finally:
+        persisted.close()
+
+
+def test_persist_database_replaces_existing_file(tmp_path):
+    destination = tmp_path / "pls.db"
+    destination.write_bytes(b"stale")
+
+    connection = open_build_connection(str(tmp_path / "build.db"))
+    try:
+        connection.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+        connection.execute("INSERT INTO test (id) VALUES (1)")
+        persist_database(connection, str(destination))
+    finally:
+        connection.close()
+
+    persisted = sqlite3.connect(destination)
+    try:
+        assert persisted.execute("SELECT id FROM test").fetchall() == [(1,)]
+    finally:
+        persisted.close()
+
+
+def test_checkpoint_database_leaves_a_self_contained_file(tmp_path):
+    path = tmp_path / "pls.db"
+    connection = sqlite3.connect(path)
+    connection.row_factory = dict_row_factory
+    try:
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+        connection.execute("INSERT INTO test (id) VALUES (1)")
+        connection.commit()
+        assert (tmp_path / "pls.db-wal").exists()
+
+        checkpoint_database(connection)
+
+        assert list(tmp_path.iterdir()) == [path]
+        copy_path = tmp_path / "copy.db"
+        copy_path.write_bytes(path.read_bytes())
+    finally:
+        connection.close()
+
+    copy = sqlite3.connect(copy_path)
+    try:
+        assert copy.execute("SELECT id FROM test").fetchall() == [(1,)]
+    finally:
+        copy.close()
+
+
+def test_attach_read_only_leaves_the_attached_file_unchanged(tmp_path):
+    snapshot_path = tmp_path / "cache" / "snapshot.db"
+    snapshot_path.parent.mkdir()
+    snapshot = sqlite3.connect(snapshot_path)
+    snapshot.execute("CREATE TABLE lf_road (road_id TEXT)")
+    snapshot.execute("INSERT INTO lf_road VALUES ('road-1')")
+    snapshot.commit()
+    snapshot.close()
+    content = snapshot_path.read_bytes()
+
+    connection = sqlite3.connect(tmp_path / "pls.db", uri=True)
+    try:
+        attach_read_only(connection.cursor(), str(snapshot_path), "previous")
+        # Bulk inserts switch every attached database to WAL mode.
+        connection.execute("PRAGMA journal_mode = WAL")
+        assert connection.execute(
+            "SELECT road_id FROM previous.lf_road"
+        ).fetchall() == [("road-1",)]
+        assert [path.name for path in snapshot_path.parent.iterdir()] == ["snapshot.db"]
+        connection.execute("DETACH DATABASE previous")
+    finally:
+        connection.close()
+
+    assert snapshot_path.read_bytes() == content
+
+
+def test_clone_database_keeps_carried_over_tables_and_resets_the_rest(tmp_path):
+    previous_path = tmp_path / "previous.db"
+    previous = sqlite3.connect(previous_path)
+    previous.row_factory = dict_row_factory
+    try:
+        cursor = previous.cursor()
+        create_tables(cursor)
+        # Simulate a previous database that predates the PID cache table.
+        cursor.execute("DROP TABLE address_iri_pid_map")
+        cursor.execute(
+            "INSERT INTO metadata (start_time) VALUES ('2026-04-22T12:00:00+1000')"
+        )
+        cursor.execute(
+            "INSERT INTO lf_road_id_map (iri) VALUES ('https://example.com/road/1')"
+        )
+        cursor.execute(
+            """
+            INSERT INTO lf_geocode_sp_survey_point (
+                geocode_id, geocode_type, address_pid, site_id, centoid_lat, centoid_lon
+            ) VALUES ('geo-1', 'PC', '100', 'site-1', -27.0, 153.0)
+            """
+        )
+        cursor.execute(
+            "INSERT INTO lf_parcel (parcel_id, plan_no, lot_no) VALUES ('1', 'SP1', '1')"
+        )
+        cursor.execute("CREATE INDEX idx_lf_parcel_plan_lot ON lf_parcel(plan_no)")
+        previous.commit()
+    finally:
+        previous.close()
+
+    connection = sqlite3.connect(":memory:")
+    connection.row_factory = dict_row_factory
+    try:
+        cursor = connection.cursor()
+        clone_database(str(previous_path), connection)
+        assert metadata_read_start_time(cursor).isoformat() == (
+            "2026-04-22T12:00:00+10:00"
+        )
+
+        reset_rebuilt_tables(cursor)
+
+        assert cursor.execute("SELECT iri FROM lf_road_id_map").fetchall() == [
+            {"iri": "https://example.com/road/1"}
+        ]
+        assert cursor.execute(
+            "SELECT geocode_id, site_id FROM lf_geocode_sp_survey_point"
+        ).fetchall() == [{"geocode_id": "geo-1", "site_id": "site-1"}]
+        assert cursor.execute("SELECT * FROM metadata").fetchall() == []
+        assert cursor.execute("SELECT * FROM lf_parcel").fetchall() == []
+        assert cursor.execute("SELECT * FROM address_iri_pid_map").fetchall() == []
+    finally:
+        connection.close()
+
+
+def test_clone_database_rewrites_sources_with_another_page_size(tmp_path):
+    previous_path = tmp_path / "previous.db"
+    previous = sqlite3.connect(previous_path)
+    try:
+        previous.execute("PRAGMA page_size = 4096")
+        previous.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+        previous.execute("INSERT INTO test (id) VALUES (1)")
+        previous.commit()
+    finally:
+        previous.close()
+
+    connection = open_build_connection()
+    try:
+        clone_database(str(previous_path), connection)
+
+        assert connection.execute("PRAGMA page_size").fetchone() == (PAGE_SIZE,)
+        assert connection.execute("SELECT id FROM test").fetchall() == [(1,)]
+    finally:
+        connection.close()
+    assert list(tmp_path.iterdir()) == [previous_path]
@@ -0,0 +1,95 @@
+import json
+import sqlite3
+import threading
+
+import httpx
+import pytest
+
+from address_etl import timeline as timeline_module
+from address_etl.run_stats import RunStats, RunStatsConnection, run_stats
+from address_etl.timeline import timeline
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    monkeypatch.setattr(timeline_module.settings, "trace_timeline", True)
+    monkeypatch.setattr(timeline, "events", [])
+    monkeypatch.setattr(timeline, "threads", {})
+    return timeline
+
+
+def spans(recording):
+    return [
+        (event["cat"], event["name"])
+        for event in recording.to_dict()["traceEvents"]
+        if event["ph"] == "X"
+    ]
+
+
+def test_timeline_records_stage_sqlite_and_http_spans(recording):
+    connection = sqlite3.connect(":memory:", factory=RunStatsConnection)
+    connection.execute("CREATE TABLE t (a)")
+    client = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, text="ok")),
+        event_hooks={
+            "request": [recording.http_request_started],
+            "response": [
+                run_stats.record_http_response,
+                recording.http_response_received,
+            ],
+        },
+    )
+
+    with RunStats().stage("road"):
+        client.get("http://example.com/sparql?query=1")
+        connection.cursor().executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+        connection.commit()
+
+    assert spans(recording) == [
+        ("http", "GET example.com"),
+        ("sqlite", "executemany"),
+        ("sqlite", "commit"),
+        ("stage", "road"),
+    ]
+    http, executemany, _, stage = recording.events
+    assert http["args"] == {"url": "http://example.com/sparql", "status": 200}
+    assert executemany["args"] == {"sql": "INSERT INTO t VALUES (?)", "rows": 2}
+    assert stage["ts"] <= http["ts"]
+    assert stage["ts"] + stage["dur"] >= executemany["ts"] + executemany["dur"]
+
+
+def test_timeline_puts_spans_on_thread_tracks(recording):
+    def transfer():
+        with recording.span("UploadPart", "s3"):
+            pass
+
+    with recording.span("upload", "s3", key="pls.db"):
+        thread = threading.Thread(target=transfer, name="transfer-worker")
+        thread.start()
+        thread.join()
+
+    trace = json.loads(json.dumps(recording.to_dict()))
+    thread_names = {
+        event["tid"]: event["args"]["name"]
+        for event in trace["traceEvents"]
+        if event["name"] == "thread_name"
+    }
+    tracks = {
+        event["name"]: thread_names[event["tid"]]
+        for event in trace["traceEvents"]
+        if event["ph"] == "X"
+    }
+    assert tracks == {
+        "UploadPart": "transfer-worker",
+        "upload": threading.current_thread().name,
+    }
+
+
+def test_timeline_records_nothing_when_disabled(monkeypatch):
+    monkeypatch.setattr(timeline_module.settings, "trace_timeline", False)
+    monkeypatch.setattr(timeline, "events", [])
+
+    with timeline.span("road", "stage"):
+        pass
+
+    assert timeline.events == []